@@ -0,0 +1,80 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+
+# The chatbot modules import each other as top-level modules, like streamlit does when running the app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "streamlit_rag_chatbot"))
+from vector_backends import LocalIndex
+from ann_index import IVFIndex
+
+def synthetic_vectors(count, dimension=768, clusters=200, seed=0):
+    """Generate clustered unit vectors, roughly like sentence embeddings of a topical corpus."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=count)
+    vectors = centers[labels] + rng.normal(scale=0.6, size=(count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def fill(index, vectors, sessions, batch_size=10000):
+    for start in range(0, len(vectors), batch_size):
+        index.upsert([
+            {"id": str(i), "values": vectors[i], "metadata": {"session_id": f"session-{i % sessions}"}}
+            for i in range(start, min(start + batch_size, len(vectors)))
+        ])
+
+def timed_queries(index, queries, k, **kwargs):
+    start = time.perf_counter()
+    results = [index.query(query, k=k, filter={"session_id": {"$ne": "session-0"}}, **kwargs)[0] for query in queries]
+    return results, (time.perf_counter() - start) / len(queries)
+
+def run(size, dimension, nprobes, queries_count, k, sessions):
+    vectors = synthetic_vectors(size + queries_count, dimension)
+    data, queries = vectors[:size], vectors[size:]
+
+    with tempfile.TemporaryDirectory() as directory:
+        exact = LocalIndex(os.path.join(directory, "exact"))
+        fill(exact, data, sessions)
+        truth, exact_latency = timed_queries(exact, queries, k)
+        del exact
+
+        ivf = IVFIndex(os.path.join(directory, "ivf"), min_train_size=min(1000, size))
+        start = time.perf_counter()
+        fill(ivf, data, sessions)
+        ivf.train()
+        build_seconds = time.perf_counter() - start
+
+        for nprobe in nprobes:
+            approximate, latency = timed_queries(ivf, queries, k, nprobe=nprobe)
+            recall = np.mean([len({m[0] for m in a} & {m[0] for m in t}) / max(1, len(t)) for a, t in zip(approximate, truth)])
+            yield {
+                "size": size,
+                "dimension": dimension,
+                "nlist": len(ivf._centroids),
+                "nprobe": nprobe,
+                "recall_at_k": round(float(recall), 4),
+                "k": k,
+                "exact_ms": round(exact_latency * 1000, 3),
+                "ivf_ms": round(latency * 1000, 3),
+                "build_s": round(build_seconds, 2)
+            }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall and latency of the IVF index against exact search on synthetic vectors.")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma separated index sizes (1M at 768 dims needs about 6 GB of RAM and disk)")
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--nprobes", default="1,4,8,16,64")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--sessions", type=int, default=1000, help="Number of distinct session ids used for the $ne pre-filter")
+    parser.add_argument("--output", help="JSON lines file to append results to (defaults to stdout)")
+    args = parser.parse_args()
+
+    output = open(args.output, "a") if args.output else sys.stdout
+    for size in (int(size) for size in args.sizes.split(",")):
+        for result in run(size, args.dimension, [int(n) for n in args.nprobes.split(",")], args.queries, args.k, args.sessions):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
@@ -0,0 +1,68 @@
+import io
+import random
+from datetime import datetime, timedelta
+
+topics = {
+    "microphenomenology": ["interview", "experience", "lived", "attention", "gesture", "evocation", "description", "moment"],
+    "art": ["installation", "performance", "audience", "artist", "sound", "material", "studio", "exhibition"],
+    "science": ["experiment", "measurement", "physics", "data", "hypothesis", "laboratory", "method", "model"],
+    "reflection": ["writing", "notes", "diary", "memory", "practice", "collaboration", "dialogue", "listening"],
+}
+fillers = ["yeah", "so", "I", "think", "that", "the", "we", "were", "about", "really", "and", "mm-hm", "maybe", "like"]
+speakers = ["Speaker 1", "Speaker 2", "Speaker 3", "Speaker 4", "Speaker 5"]
+
+def utterance(rng, topic, length=None):
+    """Generate one transcript utterance mixing filler words with words of a topic."""
+    words = topics[topic]
+    return " ".join(rng.choice(words) if rng.random() < 0.35 else rng.choice(fillers) for _ in range(length or rng.randint(3, 60)))
+
+def synthetic_meetings(count, turns=300, seed=0, start=datetime(2021, 5, 28)):
+    """Generate count reformatted transcripts as (filename, csv text) pairs, one meeting per week."""
+    rng = random.Random(seed)
+    meetings = []
+    for number in range(count):
+        date = start + timedelta(days=7 * number)
+        topic = rng.choice(list(topics))
+        lines = ["speaker_name;date_time;transcript_text"]
+        for turn in range(turns):
+            timestamp = (date + timedelta(seconds=turn * 7)).strftime("%a %b %d %H:%M:%S %Y ")
+            lines.append(f"{rng.choice(speakers)};{timestamp};{utterance(rng, topic)}")
+        meetings.append((f"{date:%Y-%m-%d}_meeting_rf.csv", "\n".join(lines)))
+    return meetings
+
+def transcript_windows(meetings, turns_per_window=8):
+    """Split synthetic transcripts into speaker-turn windows shaped like the ones ingest.py stores: (id, text, metadata)."""
+    windows = []
+    for filename, content in meetings:
+        rows = [line.split(";", 2) for line in content.splitlines()[1:]]
+        for start in range(0, len(rows), turns_per_window):
+            window = rows[start:start + turns_per_window]
+            window_speakers = list(dict.fromkeys(row[0] for row in window))
+            windows.append((f"{filename}-{start // turns_per_window}", "\n".join(f"{row[0]}: {row[2]}" for row in window), {
+                "speakers": window_speakers,
+                "speaker_name": ", ".join(window_speakers),
+                "start_time": window[0][1],
+                "end_time": window[-1][1],
+                "date_time": window[0][1],
+                "date": filename[:10],
+                "source": filename,
+            }))
+    return windows
+
+def synthetic_questions(count, seed=0):
+    """Generate user questions about the topics of the synthetic corpus."""
+    rng = random.Random(seed)
+    templates = ["What did the group say about {}?", "How is {} connected to {}?", "When was {} discussed?", "Who talked about {} and {}?"]
+    questions = []
+    for _ in range(count):
+        topic = rng.choice(list(topics))
+        template = rng.choice(templates)
+        questions.append(template.format(*(rng.choice(topics[topic]) for _ in range(template.count("{}")))))
+    return questions
+
+class UploadedFile(io.BytesIO):
+    """An in-memory file with a name, like the files Streamlit's file uploader returns."""
+
+    def __init__(self, name, content):
+        super().__init__(content.encode("utf-8"))
+        self.name = name
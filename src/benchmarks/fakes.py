@@ -0,0 +1,204 @@
+import os
+import time
+import random
+import hashlib
+import tempfile
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from vector_backends import LocalIndex
+
+class InjectedError(ConnectionError):
+    """A transient error raised on purpose by a stand-in, to exercise retries and error handling."""
+
+class Latency:
+    """Simulated service latency: a fixed delay plus uniform jitter, failing with probability error_rate."""
+
+    def __init__(self, seconds=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.seconds = seconds
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self, what="request"):
+        with self._lock:
+            delay = self.seconds + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise InjectedError(f"Injected {what} failure")
+
+class FakeIndex:
+    """
+    An in-process stand-in for a Pinecone index handle, backed by an exact LocalIndex.
+
+    Supports the calls the project makes: query, upsert (including async_req), fetch, list, delete and
+    describe_index_stats, each delayed and failed according to its Latency.
+    """
+
+    def __init__(self, path, latency=None, dimension=None):
+        self.index = LocalIndex(path, dimension=dimension)
+        self.latency = latency or Latency()
+        self.requests = 0
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="fake-index")
+
+    def query(self, vector, top_k=10, filter=None, include_metadata=False, **kwargs):
+        self._request("query")
+        matches = self.index.query(vector, k=top_k, filter=filter)[0]
+        return SimpleNamespace(matches=[
+            SimpleNamespace(id=vector_id, score=score, metadata=dict(metadata) if include_metadata else None)
+            for vector_id, score, metadata in matches
+        ])
+
+    def upsert(self, vectors, async_req=False, **kwargs):
+        if async_req:
+            future = self._executor.submit(self.upsert, vectors)
+            return SimpleNamespace(get=future.result)
+        self._request("upsert")
+        self.index.upsert([
+            vector if isinstance(vector, dict) else {"id": vector[0], "values": vector[1], "metadata": vector[2] if len(vector) > 2 else {}}
+            for vector in vectors
+        ])
+        return SimpleNamespace(upserted_count=len(vectors))
+
+    def fetch(self, ids, **kwargs):
+        self._request("fetch")
+        with self.index._lock:
+            rows = [(vector_id, self.index._positions.get(vector_id)) for vector_id in ids]
+            return SimpleNamespace(vectors={
+                vector_id: SimpleNamespace(id=vector_id, values=self.index._matrix[row].tolist(), metadata=dict(self.index._metadata[row]))
+                for vector_id, row in rows if row is not None
+            })
+
+    def list(self, prefix=None, limit=100, **kwargs):
+        self._request("list")
+        ids = [vector_id for vector_id in self.index.ids_where(None) if prefix is None or vector_id.startswith(prefix)]
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def delete(self, ids=None, filter=None, delete_all=False, **kwargs):
+        self._request("delete")
+        if delete_all:
+            ids = self.index.ids_where(None)
+        elif filter is not None:
+            ids = self.index.ids_where(filter)
+        self.index.delete(ids or [])
+
+    def describe_index_stats(self, **kwargs):
+        self._request("describe_index_stats")
+        return SimpleNamespace(total_vector_count=len(self.index), dimension=self.index.dimension)
+
+    def _request(self, what):
+        self.requests += 1
+        self.latency.wait(what)
+
+class FakeRegistry:
+    """A stand-in for the PineconeRegistry handing out FakeIndexes, all with the same latency."""
+
+    def __init__(self, latency=None, directory=None):
+        self.latency = latency or Latency()
+        self.directory = directory or tempfile.mkdtemp(prefix="eer-bench-")
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get_index(self, index_name, api_key=None):
+        with self._lock:
+            if index_name not in self._indexes:
+                self._indexes[index_name] = FakeIndex(os.path.join(self.directory, index_name), self.latency)
+            return self._indexes[index_name]
+
+    def get_client(self, api_key=None):
+        return SimpleNamespace(Index=lambda index_name, **kwargs: self.get_index(index_name))
+
+    def check_health(self):
+        return {name: True for name in self._indexes}
+
+    def reset(self):
+        with self._lock:
+            self._indexes.clear()
+
+    def requests(self):
+        return sum(index.requests for index in self._indexes.values())
+
+class FakeLLM:
+    """
+    A stand-in for HuggingFaceEndpoint: waits its latency before the first token, then seconds_per_token per token.
+
+    invoke returns the whole answer and stream yields it token by token. Calls and prompt/response token
+    estimates are counted.
+    """
+
+    words = ["the", "project", "explores", "art", "and", "science", "through", "experience", "reflection", "meetings", "participants", "discussed"]
+
+    def __init__(self, latency=None, seconds_per_token=0.0, response_tokens=150, seed=0):
+        self.latency = latency or Latency()
+        self.seconds_per_token = seconds_per_token
+        self.response_tokens = response_tokens
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.max_prompt_tokens = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt, **kwargs):
+        tokens = self._start(prompt)
+        if self.seconds_per_token:
+            time.sleep(self.seconds_per_token * len(tokens))
+        return "".join(tokens)
+
+    def stream(self, prompt, **kwargs):
+        for token in self._start(prompt):
+            if self.seconds_per_token:
+                time.sleep(self.seconds_per_token)
+            yield token
+
+    def _start(self, prompt):
+        with self._lock:
+            self.calls += 1
+            prompt_tokens = len(prompt) // 4 + 1
+            self.prompt_tokens += prompt_tokens
+            self.max_prompt_tokens = max(self.max_prompt_tokens, prompt_tokens)
+            tokens = [" " + self._random.choice(self.words) for _ in range(self.response_tokens)]
+        self.latency.wait("LLM")
+        return tokens
+
+class FakeEmbeddings:
+    """
+    Deterministic bag-of-words embeddings: every word maps to a fixed random unit vector, so texts sharing words
+    are similar, like real sentence embeddings of a topical corpus. Each call waits latency.
+    """
+
+    def __init__(self, dimension=768, latency=None):
+        self.dimension = dimension
+        self.latency = latency or Latency()
+        self.calls = 0
+        self._words = {}
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.latency.wait("embedding")
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in text.lower().split():
+            vector += self._word(word.strip(".,;:!?\"'"))
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _word(self, word):
+        with self._lock:
+            vector = self._words.get(word)
+            if vector is None:
+                seed = int.from_bytes(hashlib.md5(word.encode("utf-8")).digest()[:8], "little")
+                vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+                self._words[word] = vector
+            return vector
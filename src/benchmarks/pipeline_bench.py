@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# The chatbot and upserting modules import each other as top-level modules, like streamlit does when running the apps
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, "..", "upserting_transcripts"))
+sys.path.insert(0, os.path.join(here, "..", "streamlit_rag_chatbot"))
+
+# Benchmarks run offline: no tokenizer download, no response cache unless asked for, no stamp files shared with the apps
+os.environ.setdefault("repo_id", "")
+os.environ.setdefault("RESPONSE_CACHE_SIZE", "0")
+os.environ.setdefault("SUMMARIES_STAMP_PATH", os.path.join(tempfile.gettempdir(), "eer-bench-summaries.stamp"))
+os.environ.setdefault("TRANSCRIPTS_STAMP_PATH", os.path.join(tempfile.gettempdir(), "eer-bench-transcripts.stamp"))
+
+from fakes import Latency, FakeRegistry, FakeLLM, FakeEmbeddings
+from corpus import synthetic_meetings, transcript_windows, synthetic_questions, UploadedFile
+
+scenarios = ["single_turn", "concurrent_sessions", "long_history", "bulk_ingest", "summary_lookup"]
+
+def latency_stats(seconds):
+    """Summarize a list of latencies in milliseconds."""
+    values = np.asarray(seconds) * 1000
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 2),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=here, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class Environment:
+    """The stand-ins shared by one benchmark run, and the chatbot wired to them."""
+
+    def __init__(self, args):
+        self.args = args
+        self.registry = FakeRegistry(Latency(args.pinecone_latency, args.pinecone_jitter, args.pinecone_error_rate, seed=args.seed))
+        self.llm = FakeLLM(Latency(args.llm_latency, args.llm_jitter, args.llm_error_rate, seed=args.seed), seconds_per_token=args.llm_token_latency, response_tokens=args.response_tokens, seed=args.seed)
+        self.embeddings = FakeEmbeddings(args.dimension, Latency(args.embedding_latency, seed=args.seed))
+
+        # Seed the transcripts index with the synthetic corpus
+        self.meetings = synthetic_meetings(args.meetings, turns=args.meeting_turns, seed=args.seed)
+        windows = transcript_windows(self.meetings)
+        vectors = self.embeddings.embed_documents([text for _, text, _ in windows])
+        self.registry.get_index("eer-transcripts-pdfs").index.upsert([
+            {"id": vector_id, "values": vector, "metadata": {**metadata, "text": text}}
+            for (vector_id, text, metadata), vector in zip(windows, vectors)
+        ])
+
+        import main
+        from vector_backends import PineconeBackend
+        # The LLM endpoint is created inside chatbot.__init__, so the module's constructor is swapped for the stand-in
+        main.HuggingFaceHub = lambda **kwargs: self.llm
+        self.main = main
+        self.backend = PineconeBackend(self.registry)
+
+    def bot(self):
+        return self.main.chatbot(embeddings=self.embeddings, backend=self.backend)
+
+    def turn(self, bot, question, session_id, chat_history=None):
+        start = time.perf_counter()
+        result = bot.pipeline(question, "bench", session_id, chat_history=chat_history, mode=self.args.mode)
+        return time.perf_counter() - start, result
+
+def bench_single_turn(env, args):
+    """Latency of single turns, each in a new session."""
+    bot = env.bot()
+    latencies = [env.turn(bot, question, f"single-{i}")[0] for i, question in enumerate(synthetic_questions(args.turns, seed=args.seed))]
+    return latency_stats(latencies)
+
+def bench_concurrent_sessions(env, args):
+    """Latency and throughput of concurrent sessions, each asking args.turns questions with a growing history."""
+    def session(number):
+        bot = env.bot()
+        history, latencies = [], []
+        for question in synthetic_questions(args.turns, seed=args.seed + number):
+            seconds, result = env.turn(bot, question, f"concurrent-{number}", chat_history=list(history))
+            history.append((question, result["ai_output"]))
+            latencies.append(seconds)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        latencies = [seconds for session_latencies in executor.map(session, range(args.sessions)) for seconds in session_latencies]
+    elapsed = time.perf_counter() - start
+    return {"sessions": args.sessions, "turns_per_second": round(len(latencies) / elapsed, 2), **latency_stats(latencies)}
+
+def bench_long_history(env, args):
+    """Latency and prompt size of turns in a session that already has args.history turns, against an empty history."""
+    bot = env.bot()
+    questions = synthetic_questions(args.turns + args.history, seed=args.seed)
+    answer = " ".join(["the group discussed art and science"] * 40)
+    history = [(question, answer) for question in questions[:args.history]]
+
+    results = {}
+    for label, turn_history in (("empty", []), ("long", history)):
+        latencies, prompt_tokens = [], []
+        for i, question in enumerate(questions[args.history:]):
+            calls, tokens = env.llm.calls, env.llm.prompt_tokens
+            latencies.append(env.turn(bot, question, f"history-{label}-{i}", chat_history=turn_history)[0])
+            prompt_tokens.append((env.llm.prompt_tokens - tokens) / max(1, env.llm.calls - calls))
+        results[label] = {**latency_stats(latencies), "mean_prompt_tokens": round(float(np.mean(prompt_tokens)), 1)}
+    return {
+        "history_turns": args.history,
+        "empty": results["empty"],
+        "long": results["long"],
+        "latency_ratio": round(results["long"]["mean_ms"] / max(results["empty"]["mean_ms"], 1e-9), 3),
+    }
+
+def bench_bulk_ingest(env, args):
+    """Throughput of summarizing and upserting the synthetic transcripts with TranscriptProcessor."""
+    import a2t
+    # Like the chatbot's endpoint, the processor's LLM and Pinecone client are created in its constructor
+    a2t.HuggingFaceHub = lambda **kwargs: env.llm
+    a2t.pc = lambda **kwargs: env.registry.get_client()
+
+    with tempfile.TemporaryDirectory() as directory:
+        processor = a2t.TranscriptProcessor(embeddings=env.embeddings, requests_per_minute=args.requests_per_minute, summary_cache_path=os.path.join(directory, "summaries.json"))
+        files = [UploadedFile(filename, content) for filename, content in env.meetings]
+
+        calls = env.llm.calls
+        start = time.perf_counter()
+        data = processor.process_transcripts(files)
+        summarize_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        failures = processor.upsert_summaries_to_pinecone(data)
+        upsert_seconds = time.perf_counter() - start
+
+    return {
+        "files": len(files),
+        "turns_per_file": args.meeting_turns,
+        "summarize_s": round(summarize_seconds, 3),
+        "upsert_s": round(upsert_seconds, 3),
+        "files_per_second": round(len(files) / (summarize_seconds + upsert_seconds), 2),
+        "llm_calls": env.llm.calls - calls,
+        "failed_files": sum(1 for result in data.values() if result.get("error")),
+        "failed_batches": len(failures),
+    }
+
+def bench_summary_lookup(env, args):
+    """Latency of meeting summary lookups: cold (fetched from the index) and warm (served locally), and the date catalog."""
+    from summaries import SummaryIndex
+    index = env.registry.get_index("eer-meetings-summaries")
+    dates = [filename[:10] for filename, _ in env.meetings]
+    index.index.upsert([
+        {"id": f"{int(time.mktime(time.strptime(date, '%Y-%m-%d')))}", "values": env.embeddings.embed_query(f"summary of {date}"), "metadata": {"date": date, "summary": f"Summary of the meeting on {date}.", "speakers": ["Speaker 1"], "text": date}}
+        for date in dates
+    ])
+
+    with tempfile.TemporaryDirectory() as directory:
+        summary_index = SummaryIndex(backend=env.backend, dimension=args.dimension, stamp_path=os.path.join(directory, "stamp"))
+        cold = []
+        for date in dates:
+            start = time.perf_counter()
+            summary_index.get(date)
+            cold.append(time.perf_counter() - start)
+        warm = []
+        for _ in range(args.repeat):
+            for date in dates:
+                start = time.perf_counter()
+                summary_index.get(date)
+                warm.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            summary_index.dates()
+        catalog_seconds = (time.perf_counter() - start) / args.repeat
+
+    return {"summaries": len(dates), "cold": latency_stats(cold), "warm": latency_stats(warm), "dates_ms": round(catalog_seconds * 1000, 4)}
+
+def run(args):
+    env = Environment(args)
+    for name in args.scenarios.split(","):
+        calls, requests = env.llm.calls, env.registry.requests()
+        start = time.perf_counter()
+        result = globals()[f"bench_{name}"](env, args)
+        yield {
+            "scenario": name,
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "mode": args.mode,
+            "llm_latency": args.llm_latency,
+            "llm_error_rate": args.llm_error_rate,
+            "pinecone_latency": args.pinecone_latency,
+            "pinecone_error_rate": args.pinecone_error_rate,
+            "seconds": round(time.perf_counter() - start, 3),
+            "llm_calls": env.llm.calls - calls,
+            "pinecone_requests": env.registry.requests() - requests,
+            **result,
+        }
+
+def compare(baseline_path, results):
+    """Print, per scenario, how this run's mean and p95 latencies compare to the last matching baseline result."""
+    baseline = {}
+    with open(baseline_path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                baseline[row["scenario"]] = row
+    for row in results:
+        before = baseline.get(row["scenario"])
+        if before is None:
+            continue
+        for key in ("mean_ms", "p95_ms", "turns_per_second", "files_per_second"):
+            if key in row and key in before and before[key]:
+                print(f"{row['scenario']} {key}: {before[key]} -> {row[key]} ({row[key] / before[key]:.2f}x)", file=sys.stderr)
+
+def build_parser():
+    """Return the command line parser, whose defaults are the full-size benchmark."""
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the chatbot pipeline and transcript ingestion against Pinecone and LLM stand-ins.")
+    parser.add_argument("--scenarios", default=",".join(scenarios), help=f"Comma separated scenarios out of {', '.join(scenarios)}")
+    parser.add_argument("--mode", default="standard", choices=["standard", "fast"], help="Pipeline mode")
+    parser.add_argument("--turns", type=int, default=20, help="Turns per scenario (per session for concurrent_sessions)")
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent sessions")
+    parser.add_argument("--history", type=int, default=50, help="Prior turns in the long_history scenario")
+    parser.add_argument("--meetings", type=int, default=20, help="Synthetic meetings in the corpus")
+    parser.add_argument("--meeting-turns", type=int, default=300, help="Speaker turns per synthetic meeting")
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--repeat", type=int, default=10, help="Repetitions of the warm summary lookups")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds before the first LLM token")
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--llm-token-latency", type=float, default=0.0, help="Seconds per generated token")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Probability of an LLM call failing")
+    parser.add_argument("--response-tokens", type=int, default=150)
+    parser.add_argument("--pinecone-latency", type=float, default=0.05, help="Seconds per Pinecone request")
+    parser.add_argument("--pinecone-jitter", type=float, default=0.02)
+    parser.add_argument("--pinecone-error-rate", type=float, default=0.0, help="Probability of a Pinecone request failing")
+    parser.add_argument("--embedding-latency", type=float, default=0.01, help="Seconds per embedding call")
+    parser.add_argument("--requests-per-minute", type=int, default=0, help="LLM rate limit of the bulk ingest (0 for none)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON lines file to append results to (defaults to stdout)")
+    parser.add_argument("--baseline", help="JSON lines file of an earlier run to compare against")
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+
+    output = open(args.output, "a") if args.output else sys.stdout
+    results = []
+    for result in run(args):
+        results.append(result)
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+    if args.baseline:
+        compare(args.baseline, results)
@@ -1,56 +1,167 @@
-
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 
-def datachunk():
-    transcripts_folder = os.path.join("data", "reformatted_transcripts")
-    pdf_folder = os.path.join("data", "EER-site-pages-pdf")
+transcripts_folder = os.path.join("data", "reformatted_transcripts")
+pdf_folder = os.path.join("data", "EER-site-pages-pdf")
 
-    print("Loading files...")
+text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=0, length_function=len)
 
-    csv_files = [file for file in os.listdir(transcripts_folder) if file.endswith('.csv')]
-    pdf_files = [file for file in os.listdir(pdf_folder) if file.endswith('.pdf')]
+# Transcript turns are merged into windows of about this many tokens, repeating this many turns between windows
+transcript_window_tokens = 300
+transcript_window_overlap = 1
 
-    documents = []
+def count_tokens(text):
+    """Estimate the number of tokens in a text (roughly four characters per token)."""
+    return len(text) // 4 + 1
 
-    # Extract text documents and add metadata from CSV files
-    for csv_file in csv_files:
-        try:
-            transcripts_df = pd.read_csv(os.path.join(transcripts_folder, csv_file), delimiter=';')
-        except FileNotFoundError:
-            print(f"Error: The file {csv_file} was not found.")
-            continue
+def list_source_files():
+    """Return the paths of all transcript CSV and site PDF files, in a stable order."""
+    csv_files = [os.path.join(transcripts_folder, file) for file in sorted(os.listdir(transcripts_folder)) if file.endswith('.csv')]
+    pdf_files = [os.path.join(pdf_folder, file) for file in sorted(os.listdir(pdf_folder)) if file.endswith('.pdf')]
+    return csv_files + pdf_files
 
-        for index, row in transcripts_df.iterrows():
-            document = Document(
-                page_content=row["transcript_text"],
+def iter_csv_documents(path, rows_per_read=1000):
+    """Lazily yield one Document per transcript row of a reformatted transcript CSV file, reading it in blocks of rows."""
+    csv_file = os.path.basename(path)
+    for transcripts_df in pd.read_csv(path, delimiter=';', chunksize=rows_per_read):
+        transcripts_df = transcripts_df.dropna(subset=["transcript_text"])
+        for text, speaker_name, date_time in zip(transcripts_df["transcript_text"].astype(str), transcripts_df["speaker_name"], transcripts_df["date_time"]):
+            yield Document(
+                page_content=text,
                 metadata={
-                    "speaker_name": row["speaker_name"],
-                    "date_time": row["date_time"],
+                    "speaker_name": speaker_name,
+                    "date_time": date_time,
+                    "date": csv_file[:10],
                     "source": csv_file
                 }
             )
-            documents.append(document)
 
-    print("CSV files loaded...")
+def turn_window(turns):
+    """Merge consecutive turn Documents into one chunk that keeps its speakers and start/end timestamps as metadata."""
+    speakers = list(dict.fromkeys(str(turn.metadata["speaker_name"]) for turn in turns))
+    first, last = turns[0].metadata, turns[-1].metadata
+    return Document(
+        page_content="\n".join(f"{turn.metadata['speaker_name']}: {turn.page_content}" for turn in turns),
+        metadata={
+            "speakers": speakers,
+            "speaker_name": ", ".join(speakers),
+            "start_time": first["date_time"],
+            "end_time": last["date_time"],
+            "date_time": first["date_time"],
+            "date": first["date"],
+            "source": first["source"]
+        }
+    )
+
+def iter_turn_windows(turns, token_budget=None, overlap=None):
+    """
+    Merge consecutive speaker turns into windows of up to token_budget tokens.
+
+    The last overlap turns of a window are repeated at the start of the next one. A single turn longer than the
+    budget is split on its own, so short utterances no longer become vectors of their own.
+    """
+    token_budget = token_budget or transcript_window_tokens
+    overlap = transcript_window_overlap if overlap is None else overlap
+    window, window_tokens = [], 0
+
+    for turn in turns:
+        tokens = count_tokens(turn.page_content)
+        if tokens > token_budget:
+            if window:
+                yield turn_window(window)
+                window, window_tokens = [], 0
+            for piece in text_splitter.split_documents([turn]):
+                yield turn_window([piece])
+            continue
+
+        if window and window_tokens + tokens > token_budget:
+            yield turn_window(window)
+            window = window[-overlap:] if overlap else []
+            window_tokens = sum(count_tokens(kept.page_content) for kept in window)
+            if window_tokens + tokens > token_budget:
+                window, window_tokens = [], 0
+
+        window.append(turn)
+        window_tokens += tokens
+
+    if window:
+        yield turn_window(window)
+
+def iter_file_chunks(path):
+    """Lazily load a single CSV or PDF file and yield its chunks: speaker-turn windows for transcripts, split pages for PDFs."""
+    if path.endswith('.csv'):
+        yield from iter_turn_windows(iter_csv_documents(path))
+        return
 
-    # Load text documents from .pdf files (keeping as they are)
-    for pdf_file in pdf_files:
-        loader = PyPDFLoader(os.path.join(pdf_folder, pdf_file))
-        doc_content = loader.load()
-        documents.extend(doc_content)
+    documents = PyPDFLoader(path).lazy_load()
 
-    print("PDF files loaded...")
+    for doc in documents:
+        if isinstance(doc.page_content, str) and doc.page_content:
+            yield from text_splitter.split_documents([doc])
+
+def chunk_file(path):
+    """Load a single CSV or PDF file and split it into chunks."""
+    return list(iter_file_chunks(path))
+
+def timed_chunk_file(path):
+    """Chunk a single file and return its path, its chunks and the seconds it took."""
+    start = time.perf_counter()
+    chunks = chunk_file(path)
+    return path, chunks, time.perf_counter() - start
+
+def iter_parallel_file_chunks(paths, workers=None):
+    """
+    Chunk files across a process pool and yield (path, chunks, seconds) per file, in input order.
+
+    At most two files per worker are in flight, so results are merged deterministically without buffering the corpus.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for path in paths:
+            pending.append((path, executor.submit(timed_chunk_file, path)))
+            if len(pending) >= workers * 2:
+                yield _result(*pending.popleft())
+        while pending:
+            yield _result(*pending.popleft())
+
+def _result(path, future):
+    try:
+        return future.result()
+    except FileNotFoundError:
+        print(f"Error: The file {path} was not found.")
+        return path, [], 0.0
+
+def iter_chunks(workers=1):
+    """
+    Lazily yield the chunks of every source file, file by file, so the corpus is never held in memory.
+
+    With more than one worker, files are parsed and split in a process pool and per-file timings are printed.
+    """
+    if workers != 1:
+        for path, chunks, seconds in iter_parallel_file_chunks(list_source_files(), workers):
+            print(f"{path}: {len(chunks)} chunks in {seconds:.2f}s")
+            yield from chunks
+        return
+
+    for path in list_source_files():
+        try:
+            yield from iter_file_chunks(path)
+        except FileNotFoundError:
+            print(f"Error: The file {path} was not found.")
+            continue
+
+def datachunk(workers=1):
+    print("Loading files...")
 
-    # Split text documents into chunks
-    text_documents = [doc for doc in documents if isinstance(doc, Document) and doc.page_content]
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=0, length_function=len)
-    split_docs = text_splitter.split_documents(text_documents)
+    docs = list(iter_chunks(workers))
 
-    # Combine split text documents with PDF documents
-    docs = split_docs + [doc for doc in documents if not isinstance(doc, Document)]
+    print("Files loaded and split...")
 
-    return docs
\ No newline at end of file
+    return docs
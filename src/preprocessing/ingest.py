@@ -0,0 +1,183 @@
+import os
+import json
+import hashlib
+import argparse
+import queue
+import tempfile
+import threading
+from pathlib import Path
+from itertools import islice
+from dotenv import load_dotenv
+from langchain_huggingface import HuggingFaceEmbeddings
+from pinecone import Pinecone as pc
+from data_chunking import list_source_files, iter_file_chunks, iter_parallel_file_chunks
+
+manifest_path = os.path.join("data", "ingest_manifest.json")
+
+# File touched after every ingest that changed the index; the chatbot app watches it to drop its cached answers
+TRANSCRIPTS_STAMP_PATH = os.getenv("TRANSCRIPTS_STAMP_PATH", os.path.join(tempfile.gettempdir(), "eer-transcripts-pdfs.stamp"))
+
+def file_hash(path):
+    """Return the SHA-256 hash of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id(path, number):
+    """Return the stable vector id of the nth chunk of a file."""
+    return f"{hashlib.sha1(path.replace(os.sep, '/').encode('utf-8')).hexdigest()[:16]}-{number}"
+
+def chunk_metadata(doc):
+    """Return Pinecone-safe metadata for a chunk, including its text."""
+    metadata = {key: value for key, value in doc.metadata.items() if isinstance(value, (str, int, float, bool, list)) and value == value}
+    metadata["text"] = doc.page_content
+    return metadata
+
+def load_manifest(path=manifest_path):
+    """Load the ingestion manifest, or an empty one if none exists yet."""
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"files": {}, "pending": {}}
+
+def save_manifest(manifest, path=manifest_path):
+    """Atomically write the ingestion manifest."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def bounded_batches(items, batch_size, max_pending=4):
+    """
+    Yield lists of batch_size items, produced by a background thread that blocks once max_pending batches wait.
+
+    This keeps chunking ahead of embedding without letting it run arbitrarily far ahead, so memory stays flat.
+    """
+    batches = queue.Queue(maxsize=max_pending)
+    done = object()
+    errors = []
+
+    def produce():
+        try:
+            iterator = iter(items)
+            while True:
+                batch = list(islice(iterator, batch_size))
+                if not batch:
+                    break
+                batches.put(batch)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            batches.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        batch = batches.get()
+        if batch is done:
+            break
+        yield batch
+    if errors:
+        raise errors[0]
+
+def ingest_file(path, digest, index, embeddings, manifest, batch_size=100, max_pending=4, chunks=None):
+    """
+    Stream, embed and upsert the chunks of one file, recording each committed batch in the manifest so a crash resumes after it.
+
+    chunks may hold the file's chunks if they were already produced elsewhere, e.g. by a process pool.
+    Returns the ids of all chunks of the file.
+    """
+    pending = manifest["pending"].get(path)
+    if pending is None or pending["hash"] != digest:
+        pending = {"hash": digest, "committed": 0}
+        manifest["pending"][path] = pending
+
+    # Chunk order is deterministic, so already committed chunks are skipped by position
+    committed = pending["committed"]
+    chunks = islice(iter_file_chunks(path) if chunks is None else chunks, committed, None)
+
+    start = committed
+    for batch in bounded_batches(chunks, batch_size, max_pending):
+        ids = [chunk_id(path, number) for number in range(start, start + len(batch))]
+        vectors = embeddings.embed_documents([doc.page_content for doc in batch])
+        index.upsert(vectors=[
+            {"id": vector_id, "values": vector, "metadata": chunk_metadata(doc)}
+            for vector_id, vector, doc in zip(ids, vectors, batch)
+        ])
+        start += len(batch)
+        pending["committed"] = start
+        save_manifest(manifest)
+
+    return [chunk_id(path, number) for number in range(start)]
+
+def delete_ids(index, ids, batch_size=1000):
+    """Delete vectors by id in batches."""
+    for start in range(0, len(ids), batch_size):
+        index.delete(ids=ids[start:start + batch_size])
+
+def ingest(index_name="eer-transcripts-pdfs", batch_size=100, dry_run=False, workers=1, reset=False):
+    """
+    Incrementally sync the vector index with the files under data/.
+
+    Only new or changed files are re-chunked, re-embedded and upserted, and vectors of removed files (or of chunks
+    a changed file no longer has) are deleted. Progress is committed to the manifest after every batch.
+    With more than one worker, changed files are parsed and split ahead of time in a process pool.
+
+    Vectors the manifest does not know about, such as the random-id vectors of the old notebook pipeline, would
+    never be deleted and would be retrieved next to their re-ingested copies. So a first run without a manifest
+    refuses to touch a non-empty index unless reset is set, which deletes every vector and ingests all files anew.
+    """
+    load_dotenv()
+    first_run = not os.path.exists(manifest_path)
+    manifest = {"files": {}, "pending": {}} if reset else load_manifest()
+    files = {path: file_hash(path) for path in list_source_files()}
+
+    changed = [path for path, digest in files.items() if manifest["files"].get(path, {}).get("hash") != digest]
+    removed = [path for path in manifest["files"] if path not in files]
+    print(f"{len(files)} files, {len(changed)} new or changed, {len(removed)} removed" + (f", deleting every vector in {index_name} first" if reset else ""))
+    if dry_run or not (changed or removed or reset):
+        return
+
+    index = pc(api_key=os.getenv('PINECONE_API_KEY')).Index(index_name)
+    if reset:
+        index.delete(delete_all=True)
+        save_manifest(manifest)
+        print(f"Deleted every vector in {index_name}")
+    elif first_run and index.describe_index_stats().total_vector_count:
+        raise SystemExit(f"{index_name} already holds vectors not recorded in {manifest_path}; rerun with --reset to replace them")
+    embeddings = HuggingFaceEmbeddings()
+
+    for path in removed:
+        delete_ids(index, manifest["files"][path]["chunk_ids"])
+        del manifest["files"][path]
+        manifest["pending"].pop(path, None)
+        save_manifest(manifest)
+        print(f"Removed {path}")
+
+    if workers != 1:
+        prepared = ((path, chunks) for path, chunks, seconds in iter_parallel_file_chunks(changed, workers))
+    else:
+        prepared = ((path, None) for path in changed)
+
+    for path, chunks in prepared:
+        ids = ingest_file(path, files[path], index, embeddings, manifest, batch_size=batch_size, chunks=chunks)
+        stale_ids = sorted(set(manifest["files"].get(path, {}).get("chunk_ids", [])) - set(ids))
+        delete_ids(index, stale_ids)
+        manifest["files"][path] = {"hash": files[path], "chunk_ids": ids}
+        manifest["pending"].pop(path, None)
+        save_manifest(manifest)
+        print(f"Ingested {path}: {len(ids)} chunks")
+
+    # Let every chatbot process know its cached answers may be stale
+    Path(TRANSCRIPTS_STAMP_PATH).touch()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally ingest transcripts and PDFs into Pinecone.")
+    parser.add_argument("--index", default="eer-transcripts-pdfs", help="Name of the Pinecone index")
+    parser.add_argument("--batch-size", type=int, default=100, help="Chunks embedded and upserted per batch")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which files would be ingested")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to parse and split files (0 for one per CPU)")
+    parser.add_argument("--reset", action="store_true", help="Delete every vector in the index and ingest all files anew")
+    args = parser.parse_args()
+    ingest(index_name=args.index, batch_size=args.batch_size, dry_run=args.dry_run, workers=args.workers or None, reset=args.reset)
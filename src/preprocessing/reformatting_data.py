@@ -1,52 +1,128 @@
 import os
+import time
+import random
+import argparse
 from datetime import datetime
-import sys
+from concurrent.futures import ProcessPoolExecutor
 
 input_folder = "data/raw_transcripts"
 output_folder = "data/reformatted_transcripts"
 
-# Create the output folder if it doesn't exist
-os.makedirs(output_folder, exist_ok=True)
+header = "speaker_name;date_time;transcript_text"
 
-# Function to process each file
-def process_file(filename):
-    with open(os.path.join(input_folder, filename), 'r') as file:
-        lines = file.readlines()
+# Function to reformat the lines of one raw transcript in a single pass
+def reformat_lines(lines, date):
+    """
+    Turn raw "name  timestamp" lines, each followed by its utterance line, into "name;date time;text" rows.
 
+    Each speaker line is paired with the line right after it by position, so the pass is linear and repeated
+    speaker/timestamp lines are paired correctly.
+    """
     reformatted_lines = []
-    for line in lines:
+    for i, line in enumerate(lines):
         parts = line.strip().split('  ')
-        if len(parts) == 2:
-            name, timestamp = parts
-            date = filename[:10]
-            # Splitting timestamp to handle different formats
-            time_parts = timestamp.split(':')
-            if len(time_parts) == 2:
-                # If format is mm:ss
-                timestamp = f"00:{timestamp}"
-            elif len(time_parts) == 3:
-                # If format is hh:mm:ss
-                timestamp = timestamp
-            else:
-                # Invalid format, skipping this line
-                continue
-            try:
-                timestamp_with_date = datetime.strptime(f"{date} {timestamp}", "%Y-%m-%d %H:%M:%S").strftime("%a %b %d %H:%M:%S %Y %z")
-                reformatted_lines.append(f"{name};{timestamp_with_date};{lines[lines.index(line)+1].strip()}")
-            except ValueError:
-                # Skip the line if timestamp parsing fails
-                continue
+        if len(parts) != 2:
+            continue
+        name, timestamp = parts
+        # Splitting timestamp to handle different formats
+        time_parts = timestamp.split(':')
+        if len(time_parts) == 2:
+            # If format is mm:ss
+            timestamp = f"00:{timestamp}"
+        elif len(time_parts) != 3:
+            # Invalid format, skipping this line
+            continue
+        try:
+            timestamp_with_date = datetime.strptime(f"{date} {timestamp}", "%Y-%m-%d %H:%M:%S").strftime("%a %b %d %H:%M:%S %Y %z")
+        except ValueError:
+            # Skip the line if timestamp parsing fails
+            continue
+        text = lines[i + 1].strip() if i + 1 < len(lines) else ""
+        reformatted_lines.append(f"{name};{timestamp_with_date};{text}")
 
     return reformatted_lines
 
-# Process each file in the input folder
-for filename in os.listdir(input_folder):
-    if filename.endswith(".txt"):
-        # Add header to the reformatted lines
-        header = "speaker_name;date_time;transcript_text"
-        reformatted_lines = process_file(filename)
-        reformatted_lines.insert(0, header)
-
-        output_filename = os.path.splitext(filename)[0] + "_rf.csv"
-        with open(os.path.join(output_folder, output_filename), 'w') as output_file:
-            output_file.write("\n".join(reformatted_lines))
+# Function to process each file
+def process_file(filename, input_folder=input_folder):
+    with open(os.path.join(input_folder, filename), 'r') as file:
+        lines = file.readlines()
+
+    return reformat_lines(lines, filename[:10])
+
+def output_path(filename, output_folder=output_folder):
+    return os.path.join(output_folder, os.path.splitext(filename)[0] + "_rf.csv")
+
+def reformat_file(filename, input_folder=input_folder, output_folder=output_folder, force=False):
+    """
+    Reformat one raw transcript into its CSV, skipping it if the output is up to date.
+
+    Returns "skipped" if the output is newer than the input, "unchanged" if the content is identical, else "written".
+    """
+    source = os.path.join(input_folder, filename)
+    target = output_path(filename, output_folder)
+    if not force and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+        return "skipped"
+
+    content = "\n".join([header] + process_file(filename, input_folder))
+    if os.path.exists(target):
+        with open(target, 'r') as existing:
+            if existing.read() == content:
+                os.utime(target)
+                return "unchanged"
+
+    with open(target, 'w') as output_file:
+        output_file.write(content)
+    return "written"
+
+def reformat_folder(input_folder=input_folder, output_folder=output_folder, workers=None, force=False):
+    """Reformat every raw transcript in input_folder across a process pool and return each file's status."""
+    # Create the output folder if it doesn't exist
+    os.makedirs(output_folder, exist_ok=True)
+
+    filenames = sorted(filename for filename in os.listdir(input_folder) if filename.endswith(".txt"))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        statuses = executor.map(reformat_file, filenames, [input_folder] * len(filenames), [output_folder] * len(filenames), [force] * len(filenames))
+        return dict(zip(filenames, statuses))
+
+def synthetic_transcript(turns, seed=0):
+    """Generate the lines of a synthetic raw transcript with the given number of speaker turns."""
+    rng = random.Random(seed)
+    speakers = ["Speaker 1", "Speaker 2", "Speaker 3", "Speaker 4"]
+    lines = []
+    for turn in range(turns):
+        seconds = turn * 7
+        lines.append(f"{rng.choice(speakers)}  {seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}\n")
+        lines.append(" ".join(rng.choice(["yeah", "so", "the", "experience", "art", "science", "mm-hm"]) for _ in range(rng.randint(1, 40))) + "\n")
+        lines.append("\n")
+    return lines
+
+def benchmark(turns=5000, repeat=5):
+    """Time reformat_lines on a synthetic transcript and print the best run."""
+    lines = synthetic_transcript(turns)
+    best = min(_timed(reformat_lines, lines, "2024-01-30") for _ in range(repeat))
+    print(f"{len(lines)} lines ({turns} turns): best of {repeat} runs {best * 1000:.1f} ms, {len(lines) / best:,.0f} lines/s")
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reformat raw transcripts into speaker_name;date_time;transcript_text CSV files.")
+    parser.add_argument("--input", default=input_folder, help="Folder with raw .txt transcripts")
+    parser.add_argument("--output", default=output_folder, help="Folder for the reformatted .csv transcripts")
+    parser.add_argument("--workers", type=int, default=None, help="Number of processes (defaults to one per CPU)")
+    parser.add_argument("--force", action="store_true", help="Rewrite outputs even if they are up to date")
+    parser.add_argument("--benchmark", type=int, metavar="TURNS", help="Benchmark the parser on a synthetic transcript with this many turns instead")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+        return
+
+    statuses = reformat_folder(args.input, args.output, workers=args.workers, force=args.force)
+    for status in ("written", "unchanged", "skipped"):
+        print(f"{status}: {sum(1 for value in statuses.values() if value == status)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import os
+import logging
+import numpy as np
+from vector_backends import LocalIndex, normalize
+
+# Set up logging for the ANN index
+logger = logging.getLogger(__name__)
+
+
+class IVFIndex(LocalIndex):
+    """
+    A LocalIndex with an inverted-file (IVF) approximate nearest-neighbour search.
+
+    Vectors are assigned to the nearest of nlist centroids trained by spherical k-means, and each list keeps the
+    rows assigned to it. A query scores the centroids, takes the rows of the nprobe best lists, keeps those that
+    pass the metadata pre-filter and rescores only them exactly, so no step of a query touches every row. nprobe is the recall/latency knob: nprobe equal to nlist is an exact search. Inserts are assigned
+    incrementally; the centroids are retrained once the index has grown retrain_factor times since the last
+    training. Until min_train_size vectors exist, queries fall back to exact search.
+
+    Attributes:
+        nprobe (int): Number of inverted lists scanned per query.
+        nlist (int): Number of inverted lists, or None to pick about sqrt(n) at training time.
+        min_train_size (int): Number of vectors needed before the centroids are trained.
+        retrain_factor (float): Growth factor since the last training that triggers retraining.
+    """
+
+    def __init__(self, path, dimension=None, indexed_fields=("session_id", "kind"), nprobe=8, nlist=None, min_train_size=1000, retrain_factor=4.0):
+        """
+        Opens the index stored in path, or prepares an empty one.
+
+        Args:
+            path (str): Directory holding the index files.
+            dimension (int, optional): Dimension of the vectors. Defaults to the stored one or the first upsert's.
+            indexed_fields (tuple, optional): Metadata fields to keep as filter columns. Defaults to ("session_id", "kind").
+            nprobe (int, optional): Number of inverted lists scanned per query. Defaults to 8.
+            nlist (int, optional): Number of inverted lists. Defaults to None (about sqrt(n), at most 4096).
+            min_train_size (int, optional): Vectors needed before training. Defaults to 1000.
+            retrain_factor (float, optional): Growth factor that triggers retraining. Defaults to 4.0.
+        """
+        self.nprobe = nprobe
+        self.nlist = nlist
+        self.min_train_size = min_train_size
+        self.retrain_factor = retrain_factor
+        self._centroids = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._lists = []
+        self._slots = np.zeros(0, dtype=np.int64)
+        self._trained_size = 0
+        super().__init__(path, dimension=dimension, indexed_fields=indexed_fields)
+
+        ivf_path = self._ivf_path()
+        if os.path.exists(ivf_path) and self._matrix is not None:
+            stored = np.load(ivf_path)
+            self._centroids = stored["centroids"]
+            self._trained_size = int(stored["trained_size"])
+            if self._replayed:
+                # Logged changes moved rows since the assignments were saved
+                self._assign()
+            else:
+                self._assignments = np.full(self._matrix.shape[0], -1, dtype=np.int32)
+                self._assignments[:len(self._ids)] = stored["assignments"][:len(self._ids)]
+                self._build_lists()
+
+    def train(self, sample_size=100000, iterations=10, seed=0):
+        """
+        Trains the centroids on a sample of the stored vectors and reassigns every vector.
+
+        Args:
+            sample_size (int, optional): Maximum number of vectors used for training. Defaults to 100000.
+            iterations (int, optional): Number of k-means iterations. Defaults to 10.
+            seed (int, optional): Random seed for sampling and initialization. Defaults to 0.
+        """
+        with self._lock:
+            count = len(self._ids)
+            if count == 0:
+                return
+            nlist = min(self.nlist or max(1, min(4096, int(np.sqrt(count)))), count)
+            rng = np.random.default_rng(seed)
+            sample = np.asarray(self._matrix[np.sort(rng.choice(count, size=min(sample_size, count), replace=False))])
+
+            centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+            for _ in range(iterations):
+                labels = self._nearest(sample, centroids)
+                order = np.argsort(labels, kind="stable")
+                present, starts = np.unique(labels[order], return_index=True)
+                sums = centroids.copy()
+                sums[present] = np.add.reduceat(sample[order], starts, axis=0)
+                centroids = normalize(sums)
+
+            self._centroids = centroids
+            self._assign()
+            self._trained_size = count
+            # The log cannot hold new centroids, so the next persist() saves in full
+            self._stale = True
+            logger.info("Trained IVF index %s with %d lists on %d vectors", self.path, nlist, count)
+
+    def query(self, vectors, k=5, filter=None, nprobe=None):
+        """
+        Returns the approximate top-k matches for one or more query vectors.
+
+        Args:
+            vectors (list): One query vector, or a list of query vectors.
+            k (int, optional): The number of matches per query. Defaults to 5.
+            filter (dict, optional): A Pinecone-style metadata filter applied before ranking. Defaults to None.
+            nprobe (int, optional): Lists scanned for this query. Defaults to the index's nprobe.
+
+        Returns:
+            list: Per query, a list of (id, score, metadata) tuples, best first.
+        """
+        with self._lock:
+            if self._centroids is None:
+                return super().query(vectors, k=k, filter=filter)
+
+            queries = normalize(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+            nprobe = min(nprobe or self.nprobe, len(self._centroids))
+            probes = np.argpartition(-(queries @ self._centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+
+            results = []
+            for query, query_probes in zip(queries, probes):
+                candidates = np.fromiter((row for probe in query_probes for row in self._lists[probe]), dtype=np.int64)
+                candidates = self._filter_rows(filter, candidates)
+                if len(candidates) == 0:
+                    results.append([])
+                    continue
+                scores = np.asarray(self._matrix[candidates]) @ query
+                results.append(self._top_k(scores, candidates, k))
+            return results
+
+    def save(self):
+        """
+        Saves the vectors, metadata, centroids and list assignments.
+        """
+        with self._lock:
+            super().save()
+            if self._centroids is not None:
+                tmp_path = self._ivf_path() + ".tmp.npz"
+                np.savez(tmp_path, centroids=self._centroids, assignments=self._assignments[:len(self._ids)], trained_size=self._trained_size)
+                os.replace(tmp_path, self._ivf_path())
+
+    def _on_rows_set(self, rows, values):
+        if len(self._assignments) < self._matrix.shape[0]:
+            grown = np.full(self._matrix.shape[0], -1, dtype=np.int32)
+            grown[:len(self._assignments)] = self._assignments
+            self._assignments = grown
+            slots = np.zeros(self._matrix.shape[0], dtype=np.int64)
+            slots[:len(self._slots)] = self._slots
+            self._slots = slots
+
+        count = len(self._ids)
+        if self._centroids is None:
+            if count >= self.min_train_size:
+                self.train()
+        elif count >= self._trained_size * self.retrain_factor:
+            self.train()
+        else:
+            for row, assignment in zip(rows.tolist(), self._nearest(values, self._centroids).tolist()):
+                # A replaced vector may move to another list
+                self._unlist(row)
+                self._assignments[row] = assignment
+                self._slots[row] = len(self._lists[assignment])
+                self._lists[assignment].append(row)
+
+    def _on_row_deleted(self, row):
+        self._unlist(row)
+
+    def _on_row_moved(self, source, target):
+        if self._centroids is None:
+            return
+        assignment = self._assignments[source]
+        self._assignments[target], self._assignments[source] = assignment, -1
+        if assignment >= 0:
+            self._slots[target] = self._slots[source]
+            self._lists[assignment][self._slots[target]] = target
+
+    def _unlist(self, row):
+        """
+        Removes a row from its inverted list by moving the list's last row into its slot.
+        """
+        if self._centroids is None or self._assignments[row] < 0:
+            return
+        assignment = self._assignments[row]
+        rows, slot = self._lists[assignment], self._slots[row]
+        last = rows.pop()
+        if last != row:
+            rows[slot] = last
+            self._slots[last] = slot
+        self._assignments[row] = -1
+
+    def _assign(self):
+        count = len(self._ids)
+        self._assignments = np.full(self._matrix.shape[0], -1, dtype=np.int32)
+        for start in range(0, count, 65536):
+            self._assignments[start:min(start + 65536, count)] = self._nearest(np.asarray(self._matrix[start:min(start + 65536, count)]), self._centroids)
+        self._build_lists()
+
+    def _build_lists(self):
+        count = len(self._ids)
+        order = np.argsort(self._assignments[:count], kind="stable")
+        bounds = np.searchsorted(self._assignments[:count][order], np.arange(len(self._centroids) + 1))
+        self._lists = [order[bounds[i]:bounds[i + 1]].tolist() for i in range(len(self._centroids))]
+        self._slots = np.zeros(self._matrix.shape[0], dtype=np.int64)
+        for rows in self._lists:
+            self._slots[rows] = np.arange(len(rows))
+
+    @staticmethod
+    def _nearest(vectors, centroids):
+        return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+    def _ivf_path(self):
+        return os.path.join(self.path, "ivf.npz")
@@ -0,0 +1,119 @@
+import os
+import queue
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+# Set up logging for background work
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """
+    A bounded queue of write tasks drained by background worker threads.
+
+    Tasks are fire-and-forget: failures are logged, not raised. When the queue is full the task runs inline in
+    the caller's thread, so a slow store applies backpressure instead of dropping writes.
+
+    Attributes:
+        maxsize (int): Maximum number of pending tasks.
+        workers (int): Number of worker threads draining the queue.
+    """
+
+    def __init__(self, maxsize=100, workers=2):
+        """
+        Initializes the queue and starts its workers.
+
+        Args:
+            maxsize (int, optional): Maximum number of pending tasks. Defaults to 100.
+            workers (int, optional): Number of worker threads. Defaults to 2.
+        """
+        self.maxsize = maxsize
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=maxsize)
+        for i in range(workers):
+            threading.Thread(target=self._run, name=f"write-behind-{i}", daemon=True).start()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Schedules a task to run in the background.
+
+        Args:
+            fn (callable): The task to run.
+            *args: Positional arguments for the task.
+            **kwargs: Keyword arguments for the task.
+        """
+        try:
+            self._queue.put_nowait((fn, args, kwargs))
+        except queue.Full:
+            logger.warning("Write-behind queue is full, running %s inline", getattr(fn, "__name__", fn))
+            self._call(fn, args, kwargs)
+
+    def flush(self):
+        """
+        Blocks until every queued task has finished.
+        """
+        self._queue.join()
+
+    def qsize(self):
+        """
+        Returns the number of pending tasks.
+
+        Returns:
+            int: Pending task count.
+        """
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            fn, args, kwargs = self._queue.get()
+            try:
+                self._call(fn, args, kwargs)
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _call(fn, args, kwargs):
+        try:
+            fn(*args, **kwargs)
+        except Exception as e:
+            logger.error("Background task %s failed: %s", getattr(fn, "__name__", fn), e)
+
+
+_write_behind = None
+_executor = None
+_lock = threading.Lock()
+
+
+def get_write_behind_queue():
+    """
+    Returns the process-wide write-behind queue.
+
+    Returns:
+        WriteBehindQueue: The shared queue.
+    """
+    global _write_behind
+    with _lock:
+        if _write_behind is None:
+            _write_behind = WriteBehindQueue(
+                maxsize=int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "100")),
+                workers=int(os.getenv("WRITE_BEHIND_WORKERS", "2"))
+            )
+        return _write_behind
+
+
+def get_executor():
+    """
+    Returns the process-wide thread pool used to run independent pipeline stages in parallel.
+
+    Returns:
+        ThreadPoolExecutor: The shared executor.
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("PIPELINE_WORKERS", "16")),
+                thread_name_prefix="pipeline"
+            )
+        return _executor
@@ -0,0 +1,143 @@
+import os
+import time
+import threading
+import logging
+from pinecone import Pinecone as pc
+
+# Set up logging for the connection registry
+logger = logging.getLogger(__name__)
+
+
+class PineconeRegistry:
+    """
+    A process-wide registry of Pinecone clients and index handles.
+
+    Clients are keyed by API key and index handles by (API key, index name), so every chatbot session in the
+    process reuses the same HTTP connection pool instead of paying TLS setup and index describe round-trips per call.
+
+    Attributes:
+        pool_threads (int): Number of threads each index handle uses for parallel requests.
+        connection_pool_maxsize (int): Maximum number of keep-alive HTTP connections per index handle.
+        health_check_interval (float): Seconds after which a handle is pinged again before being reused.
+    """
+
+    def __init__(self, pool_threads=None, connection_pool_maxsize=None, health_check_interval=None):
+        """
+        Initializes an empty registry.
+
+        Args:
+            pool_threads (int, optional): Threads per index handle. Defaults to the PINECONE_POOL_THREADS env var or 4.
+            connection_pool_maxsize (int, optional): Keep-alive connections per index handle. Defaults to the PINECONE_POOL_MAXSIZE env var or 16.
+            health_check_interval (float, optional): Seconds between health checks. Defaults to the PINECONE_HEALTH_CHECK_INTERVAL env var or 300.
+        """
+        self.pool_threads = pool_threads or int(os.getenv("PINECONE_POOL_THREADS", "4"))
+        self.connection_pool_maxsize = connection_pool_maxsize or int(os.getenv("PINECONE_POOL_MAXSIZE", "16"))
+        self.health_check_interval = health_check_interval if health_check_interval is not None else float(os.getenv("PINECONE_HEALTH_CHECK_INTERVAL", "300"))
+
+        self._lock = threading.RLock()
+        self._clients = {}
+        self._indexes = {}
+        self._last_checked = {}
+
+    def get_client(self, api_key=None):
+        """
+        Returns the shared Pinecone client for an API key, creating it on first use.
+
+        Args:
+            api_key (str, optional): Pinecone API key. Defaults to the PINECONE_API_KEY env var.
+
+        Returns:
+            pinecone.Pinecone: The shared client.
+        """
+        api_key = api_key or os.getenv('PINECONE_API_KEY')
+        with self._lock:
+            client = self._clients.get(api_key)
+            if client is None:
+                client = pc(api_key=api_key, pool_threads=self.pool_threads)
+                # Index() copies the client's openapi_config and ignores a connection_pool_maxsize kwarg
+                client.openapi_config.connection_pool_maxsize = self.connection_pool_maxsize
+                self._clients[api_key] = client
+            return client
+
+    def get_index(self, index_name, api_key=None):
+        """
+        Returns the shared index handle for an index, creating or reconnecting it if needed.
+
+        Args:
+            index_name (str): The name of the Pinecone index.
+            api_key (str, optional): Pinecone API key. Defaults to the PINECONE_API_KEY env var.
+
+        Returns:
+            pinecone.Index: The shared index handle.
+        """
+        key = (api_key or os.getenv('PINECONE_API_KEY'), index_name)
+        with self._lock:
+            index = self._indexes.get(key)
+            check = index is not None and self._is_stale(key)
+            if check:
+                # Claim the check, so concurrent callers keep using the handle instead of pinging too
+                self._last_checked[key] = time.monotonic()
+        # The ping is a network round trip, so it runs outside the lock that every session goes through
+        if check and not self._ping(key, index):
+            index = None
+        if index is not None:
+            return index
+
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = self.get_client(key[0]).Index(index_name, pool_threads=self.pool_threads)
+                self._indexes[key] = index
+                self._last_checked[key] = time.monotonic()
+                logger.info("Opened pooled Pinecone handle for index: %s", index_name)
+            return index
+
+    def check_health(self):
+        """
+        Pings every open index handle and drops the ones that fail, so they are reopened on next use.
+
+        Returns:
+            dict: Mapping of index name to whether its handle is healthy.
+        """
+        with self._lock:
+            handles = list(self._indexes.items())
+        return {key[1]: self._ping(key, index) for key, index in handles}
+
+    def reset(self):
+        """
+        Drops all pooled clients and handles.
+        """
+        with self._lock:
+            self._clients.clear()
+            self._indexes.clear()
+            self._last_checked.clear()
+
+    def _is_stale(self, key):
+        return time.monotonic() - self._last_checked.get(key, 0) > self.health_check_interval
+
+    def _ping(self, key, index):
+        try:
+            index.describe_index_stats()
+            self._last_checked[key] = time.monotonic()
+            return True
+        except Exception as e:
+            logger.warning("Health check failed for Pinecone index %s: %s", key[1], e)
+            with self._lock:
+                if self._indexes.get(key) is index:
+                    del self._indexes[key]
+                    self._last_checked.pop(key, None)
+            return False
+
+
+# Shared registry used by every chatbot session in this process
+registry = PineconeRegistry()
+
+
+def get_registry():
+    """
+    Returns the process-wide Pinecone registry.
+
+    Returns:
+        PineconeRegistry: The shared registry.
+    """
+    return registry
@@ -0,0 +1,218 @@
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+import tracing
+
+# Set up logging for the LLM dispatcher
+logger = logging.getLogger(__name__)
+
+
+class DispatcherOverloaded(Exception):
+    """
+    Raised when an LLM call is shed because the dispatcher's queue is full or the call waited too long.
+    """
+
+
+class _Flight:
+    """
+    The result of an in-flight call, shared with the callers that asked for the same prompt meanwhile.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class LLMDispatcher:
+    """
+    A process-wide gate in front of the shared LLM endpoint.
+
+    At most max_in_flight calls run at once. Further calls wait in per-session FIFO queues served round-robin, so
+    a session issuing many calls cannot starve the others. Calls for a prompt that is already in flight do not
+    queue at all: they wait for that call and share its result (single-flight). Once max_queue calls are waiting,
+    or a call has waited max_wait seconds, calls are shed with DispatcherOverloaded, so a burst gets fast errors
+    for its excess instead of timeouts for everyone.
+
+    Attributes:
+        max_in_flight (int): Maximum number of concurrent calls.
+        max_queue (int): Maximum number of waiting calls.
+        max_wait (float): Seconds a call may wait for a slot.
+    """
+
+    def __init__(self, max_in_flight=4, max_queue=64, max_wait=60.0):
+        """
+        Initializes an idle dispatcher.
+
+        Args:
+            max_in_flight (int, optional): Maximum number of concurrent calls. Defaults to 4.
+            max_queue (int, optional): Maximum number of waiting calls. Defaults to 64.
+            max_wait (float, optional): Seconds a call may wait for a slot. Defaults to 60.
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._queues = OrderedDict()
+        self._flights = {}
+        self._in_flight = 0
+        self._waiting = 0
+        self._calls = 0
+        self._shared = 0
+        self._shed = 0
+        self._wait_seconds = 0.0
+
+    def call(self, key, fn, session=None):
+        """
+        Runs fn within the concurrency limit, or joins the identical call already in flight.
+
+        Args:
+            key (str): Identifies the call, e.g. the endpoint and the prompt; calls with equal keys share a result.
+            fn (callable): The call.
+            session (str, optional): The calling session, for fair queueing. Defaults to None.
+
+        Returns:
+            The result of fn.
+
+        Raises:
+            DispatcherOverloaded: If the call was shed.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self._shared += 1
+        if not leader:
+            with tracing.span("llm_shared"):
+                return flight.wait()
+
+        try:
+            with self.slot(session):
+                flight.result = fn()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    @contextmanager
+    def slot(self, session=None):
+        """
+        Holds one of the max_in_flight slots, waiting for it in the session's queue if necessary.
+
+        Args:
+            session (str, optional): The calling session, for fair queueing. Defaults to None.
+
+        Raises:
+            DispatcherOverloaded: If the call was shed.
+        """
+        self._acquire(session)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self):
+        """
+        Returns the dispatcher's load and counters.
+
+        Returns:
+            dict: in_flight, queue_depth, calls, shared (joined in-flight calls), shed and mean wait_seconds.
+        """
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "queue_depth": self._waiting,
+                "calls": self._calls,
+                "shared": self._shared,
+                "shed": self._shed,
+                "wait_seconds": self._wait_seconds / self._calls if self._calls else 0.0,
+            }
+
+    def _acquire(self, session):
+        started = time.perf_counter()
+        with self._lock:
+            if self._in_flight < self.max_in_flight and not self._waiting:
+                self._in_flight += 1
+                self._calls += 1
+                ticket = None
+            elif self._waiting >= self.max_queue:
+                self._shed += 1
+                raise DispatcherOverloaded(f"LLM queue is full ({self._waiting} calls waiting)")
+            else:
+                ticket = threading.Event()
+                self._queues.setdefault(session, deque()).append(ticket)
+                self._waiting += 1
+        if ticket is None:
+            tracing.get_tracer().observe("llm_queue_wait", 0.0)
+            return
+
+        with tracing.span("llm_queue") as queue_span:
+            if not ticket.wait(self.max_wait):
+                with self._lock:
+                    # The slot may have been handed over between the timeout and taking the lock
+                    if not ticket.is_set():
+                        queue = self._queues[session]
+                        queue.remove(ticket)
+                        if not queue:
+                            del self._queues[session]
+                        self._waiting -= 1
+                        self._shed += 1
+                        queue_span.set(errors=1)
+                        raise DispatcherOverloaded(f"Waited {self.max_wait:g}s for an LLM slot")
+            waited = time.perf_counter() - started
+            with self._lock:
+                self._calls += 1
+                self._wait_seconds += waited
+        tracing.get_tracer().observe("llm_queue_wait", waited)
+
+    def _release(self):
+        with self._lock:
+            if not self._waiting:
+                self._in_flight -= 1
+                return
+            # Hand the slot to the head of the next session's queue, then move that session to the back
+            session, queue = self._queues.popitem(last=False)
+            ticket = queue.popleft()
+            if queue:
+                self._queues[session] = queue
+            self._waiting -= 1
+            ticket.set()
+
+
+_dispatcher = None
+_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """
+    Returns the process-wide LLM dispatcher.
+
+    Configured by LLM_MAX_IN_FLIGHT, LLM_MAX_QUEUE and LLM_MAX_WAIT (seconds).
+
+    Returns:
+        LLMDispatcher: The shared dispatcher.
+    """
+    global _dispatcher
+    with _lock:
+        if _dispatcher is None:
+            _dispatcher = LLMDispatcher(
+                max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "4")),
+                max_queue=int(os.getenv("LLM_MAX_QUEUE", "64")),
+                max_wait=float(os.getenv("LLM_MAX_WAIT", "60"))
+            )
+        return _dispatcher
@@ -0,0 +1,208 @@
+import time
+import hashlib
+import sqlite3
+import threading
+import logging
+from array import array
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+
+# Set up logging for the embedding cache
+logger = logging.getLogger(__name__)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    A content-hash keyed embedding cache in front of another embedding model.
+
+    Vectors are kept in an in-memory LRU tier and, when a path is given, in an SQLite tier that survives restarts.
+    Texts are whitespace-normalized before hashing, so trivially different copies of the same text share an entry.
+    The SQLite tier runs in WAL mode and writes the misses of one embed_documents call, and the last-use times of
+    the disk hits since the previous write, in a single transaction under its own lock, so memory hits never wait
+    for disk I/O. Once it holds more than max_disk_entries vectors, the least recently used ones are deleted down
+    to nine tenths of that.
+
+    Attributes:
+        embeddings (Embeddings): The underlying embedding model.
+        max_entries (int): Maximum number of vectors kept in memory.
+        max_disk_entries (int): Maximum number of vectors kept in the SQLite tier.
+        hits (int): Number of texts served from memory.
+        disk_hits (int): Number of texts served from the SQLite tier.
+        misses (int): Number of texts sent to the underlying model.
+    """
+
+    def __init__(self, embeddings, max_entries=10000, path=None, namespace=None, max_disk_entries=100000):
+        """
+        Initializes the cache.
+
+        Args:
+            embeddings (Embeddings): The embedding model to cache.
+            max_entries (int, optional): Size bound of the in-memory tier. Defaults to 10000.
+            path (str, optional): Path of the SQLite file for the on-disk tier. Defaults to None (memory only).
+            namespace (str, optional): Prefix mixed into every key, e.g. the model name. Defaults to the model's model_name.
+            max_disk_entries (int, optional): Size bound of the SQLite tier. Defaults to 100000.
+        """
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.namespace = namespace or getattr(getattr(embeddings, "model", embeddings), "model_name", "")
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._touched = {}
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+            # Caches written before the size bound have no last-use column
+            if "used" not in [column[1] for column in self._db.execute("PRAGMA table_info(embeddings)")]:
+                self._db.execute("ALTER TABLE embeddings ADD COLUMN used REAL NOT NULL DEFAULT 0")
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_used ON embeddings (used)")
+            self._db.commit()
+            self._disk_entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def embed_documents(self, texts):
+        """
+        Embeds a list of texts, encoding only the ones not already cached.
+
+        Args:
+            texts (list): The texts to embed.
+
+        Returns:
+            list: One embedding vector per text.
+        """
+        keys = [self._key(text) for text in texts]
+        vectors = [self._get(key) for key in keys]
+
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], []).append(i)
+
+        if missing:
+            miss_keys = list(missing)
+            fresh = self.embeddings.embed_documents([texts[missing[key][0]] for key in miss_keys])
+            with self._lock:
+                self.misses += len(miss_keys)
+                for key, vector in zip(miss_keys, fresh):
+                    self._remember(key, vector)
+            self._store(list(zip(miss_keys, fresh)))
+            for key, vector in zip(miss_keys, fresh):
+                for i in missing[key]:
+                    vectors[i] = vector
+
+        return vectors
+
+    def embed_query(self, text):
+        """
+        Embeds a single query text.
+
+        Args:
+            text (str): The text to embed.
+
+        Returns:
+            list: The embedding vector.
+        """
+        return self.embed_documents([text])[0]
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: Hits, disk hits, misses, hit rate and current in-memory size.
+        """
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0,
+                "size": len(self._memory)
+            }
+
+    def clear(self):
+        """
+        Empties both cache tiers.
+        """
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+                self._touched.clear()
+                self._disk_entries = 0
+
+    def _key(self, text):
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"{self.namespace}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def _get(self, key):
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return vector
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            # Recorded with the next write instead of committing on a read
+            self._touched[key] = time.time()
+        vector = array("f", row[0]).tolist()
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, vector)
+        return vector
+
+    def _store(self, items):
+        """
+        Writes new vectors and pending last-use times to the SQLite tier in one transaction, evicting if over its bound.
+        """
+        if self._db is None:
+            return
+        now = time.time()
+        with self._db_lock:
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, used) VALUES (?, ?, ?)",
+                    [(key, array("f", vector).tobytes(), now) for key, vector in items]
+                )
+                self._db.executemany("UPDATE embeddings SET used = ? WHERE key = ?", [(used, key) for key, used in self._touched.items()])
+                self._disk_entries += len(items)
+                if self._disk_entries > self.max_disk_entries:
+                    self._evict()
+                self._db.commit()
+                self._touched.clear()
+            except sqlite3.Error as e:
+                self._db.rollback()
+                logger.warning("Error writing embeddings to disk cache: %s", e)
+
+    def _evict(self):
+        # Counted by inserts, which may have replaced rows, so recount before deleting
+        self._disk_entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._disk_entries - self.max_disk_entries
+        if excess <= 0:
+            return
+        # Evict a tenth more than needed, so the next batches do not each pay for an eviction
+        count = excess + self.max_disk_entries // 10
+        self._db.execute("DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY used LIMIT ?)", (count,))
+        self._disk_entries = max(0, self._disk_entries - count)
+        logger.info("Evicted %d least recently used embeddings from the disk cache", count)
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
@@ -0,0 +1,148 @@
+import os
+import time
+import queue
+import threading
+import logging
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface import HuggingFaceEmbeddings
+from embedding_cache import CachedEmbeddings
+
+# Set up logging for the embedding service
+logger = logging.getLogger(__name__)
+
+
+class _EmbeddingRequest:
+    """
+    A pending encode request waiting for the batching worker.
+    """
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class SharedEmbeddings(Embeddings):
+    """
+    A thread-safe embedding service that wraps a single sentence-transformers model for the whole process.
+
+    Concurrent embed calls are queued and coalesced by a background worker into one forward pass of up to
+    max_batch_size texts, waiting at most max_wait_ms for more requests to arrive.
+
+    Attributes:
+        model (HuggingFaceEmbeddings): The underlying embedding model.
+        max_batch_size (int): Maximum number of texts encoded in one forward pass.
+        max_wait_ms (float): Maximum time the worker waits to fill a batch.
+    """
+
+    def __init__(self, model=None, max_batch_size=32, max_wait_ms=5):
+        """
+        Initializes the service and starts its batching worker.
+
+        Args:
+            model (Embeddings, optional): The embedding model to share. Defaults to HuggingFaceEmbeddings().
+            max_batch_size (int, optional): Maximum texts per forward pass. Defaults to 32.
+            max_wait_ms (float, optional): Maximum time to wait for a batch to fill. Defaults to 5.
+        """
+        self.model = model or HuggingFaceEmbeddings()
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def embed_documents(self, texts):
+        """
+        Embeds a list of texts, sharing the forward pass with any concurrent callers.
+
+        Args:
+            texts (list): The texts to embed.
+
+        Returns:
+            list: One embedding vector per text.
+        """
+        if not texts:
+            return []
+        request = _EmbeddingRequest(list(texts))
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def embed_query(self, text):
+        """
+        Embeds a single query text.
+
+        Args:
+            text (str): The text to embed.
+
+        Returns:
+            list: The embedding vector.
+        """
+        return self.embed_documents([text])[0]
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].texts)
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            self._encode(batch)
+
+    def _encode(self, batch):
+        texts = [text for request in batch for text in request.texts]
+        try:
+            vectors = self.model.embed_documents(texts)
+        except Exception as e:
+            logger.error("Error embedding batch of %d texts: %s", len(texts), e)
+            for request in batch:
+                request.error = e
+                request.done.set()
+            return
+
+        offset = 0
+        for request in batch:
+            request.result = vectors[offset:offset + len(request.texts)]
+            offset += len(request.texts)
+            request.done.set()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service():
+    """
+    Returns the process-wide embedding service, loading the model on first use.
+
+    The service is fronted by a CachedEmbeddings LRU cache, which is backed by SQLite when EMBEDDING_CACHE_PATH is set,
+    holding at most EMBEDDING_DISK_CACHE_SIZE vectors there.
+
+    Returns:
+        CachedEmbeddings: The shared, cached embedding service.
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = CachedEmbeddings(
+                SharedEmbeddings(
+                    max_batch_size=int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32")),
+                    max_wait_ms=float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+                ),
+                max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+                path=os.getenv("EMBEDDING_CACHE_PATH"),
+                max_disk_entries=int(os.getenv("EMBEDDING_DISK_CACHE_SIZE", "100000"))
+            )
+            logger.info("Loaded shared embedding model")
+        return _service
@@ -0,0 +1,298 @@
+import os
+import time
+import atexit
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+import numpy as np
+from background import get_write_behind_queue
+from tracing import get_tracer
+
+# Set up logging for the interaction store
+logger = logging.getLogger(__name__)
+
+INTERACTION_INDEX = "eer-interaction-data"
+
+
+class InteractionStore:
+    """
+    Buffers chat turns and writes them to the interaction index in batches.
+
+    Every turn gets its own vector, with id "<session_id>#<turn>" where turn counts the session's turns, so
+    earlier turns of a session are no longer overwritten. Buffered turns are embedded with one embed_documents
+    call and upserted with one request, either once batch_size turns are waiting or every flush_interval seconds.
+    With session_rollups, each session also keeps a "<session_id>#session" vector holding the mean of its turn
+    embeddings and its recent questions, so past chats can be searched per session instead of per turn. With
+    retention_days, turns and rollups older than that are deleted every prune_interval seconds.
+
+    Turn counts and rollups are kept in memory for at most max_sessions sessions, each until it has been idle for
+    session_ttl seconds, and all of them are dropped when expired turns are pruned. A session coming back after
+    that continues from its stored turns, which are listed by id prefix when its next turn is flushed.
+
+    Metadata schema (kind is "turn" or "session"):
+        session_id, kind, turn, user_name, user_question, ai_output, date (ISO 8601), date_unix (seconds).
+
+    Attributes:
+        index_name (str): The name of the interaction index.
+        batch_size (int): Number of buffered turns that triggers a flush.
+        flush_interval (float): Maximum seconds a turn waits in the buffer.
+        session_rollups (bool): Whether to maintain one rollup vector per session.
+        retention_days (float): Age after which stored turns are deleted, or None to keep them forever.
+        prune_interval (float): Seconds between retention prunes.
+        max_field_chars (int): Maximum length of the question and answer stored in metadata.
+        max_sessions (int): Maximum number of sessions whose state is kept in memory.
+        session_ttl (float): Idle seconds after which a session's state is dropped from memory.
+    """
+
+    def __init__(self, embeddings, backend, index_name=INTERACTION_INDEX, batch_size=16, flush_interval=5.0, session_rollups=False, retention_days=None, prune_interval=86400, max_field_chars=4000, max_buffered=1000, max_sessions=1000, session_ttl=3600):
+        """
+        Initializes the store and starts its periodic flusher.
+
+        Args:
+            embeddings (Embeddings): Embedding model used for the turns.
+            backend (VectorBackend): Vector store holding the interaction index.
+            index_name (str, optional): The name of the interaction index. Defaults to "eer-interaction-data".
+            batch_size (int, optional): Number of buffered turns that triggers a flush. Defaults to 16.
+            flush_interval (float, optional): Maximum seconds a turn waits in the buffer. Defaults to 5.
+            session_rollups (bool, optional): Whether to maintain per-session rollup vectors. Defaults to False.
+            retention_days (float, optional): Age in days after which turns are deleted. Defaults to None (keep forever).
+            prune_interval (float, optional): Seconds between retention prunes. Defaults to 86400.
+            max_field_chars (int, optional): Maximum length of the stored question and answer. Defaults to 4000.
+            max_buffered (int, optional): Maximum turns kept for retry while the store is failing. Defaults to 1000.
+            max_sessions (int, optional): Maximum number of sessions kept in memory. Defaults to 1000.
+            session_ttl (float, optional): Idle seconds before a session is dropped from memory. Defaults to 3600.
+        """
+        self.embeddings = embeddings
+        self.backend = backend
+        self.index_name = index_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.session_rollups = session_rollups
+        self.retention_days = retention_days
+        self.prune_interval = prune_interval
+        self.max_field_chars = max_field_chars
+        self.max_buffered = max_buffered
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self._pending = []
+        # Session id to {"turns", "rollup", "seen"}, least recently used first; only touched under _flush_lock
+        self._sessions = OrderedDict()
+        self._last_prune = time.monotonic() - prune_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        threading.Thread(target=self._run, name="interaction-flusher", daemon=True).start()
+        atexit.register(self.flush)
+
+    def add_turn(self, user_input, ai_output, user_name, session_id):
+        """
+        Buffers one turn for the next batched write, which numbers it.
+
+        Args:
+            user_input (str): The user's input.
+            ai_output (str): The AI's response.
+            user_name (str): The name of the user.
+            session_id (str): The unique session identifier.
+        """
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            self._pending.append({
+                "id": None,
+                "text": f"{user_input}\n{ai_output}",
+                "metadata": {
+                    "session_id": session_id,
+                    "kind": "turn",
+                    "user_name": user_name,
+                    "user_question": user_input[:self.max_field_chars],
+                    "ai_output": ai_output[:self.max_field_chars],
+                    "date": now.isoformat(),
+                    "date_unix": int(now.timestamp())
+                }
+            })
+            full = len(self._pending) >= self.batch_size
+
+        if full:
+            get_write_behind_queue().submit(self.flush)
+
+    def flush(self):
+        """
+        Embeds and upserts every buffered turn, and prunes expired turns if a prune is due.
+
+        Turns whose write failed are put back in the buffer for the next flush, keeping at most max_buffered, along
+        with the turn numbers they were given.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+
+            if pending:
+                started = time.perf_counter()
+                try:
+                    self._number(pending)
+                    vectors = self.embeddings.embed_documents([record["text"] for record in pending])
+                    upserts = [
+                        {"id": record["id"], "values": vector, "metadata": record["metadata"]}
+                        for record, vector in zip(pending, vectors)
+                    ]
+                    states = {}
+                    if self.session_rollups:
+                        rollups, states = self._rollup_vectors(upserts)
+                        upserts.extend(rollups)
+                    self.backend.upsert(self.index_name, upserts)
+                    for session_id, rollup in states.items():
+                        self._sessions[session_id]["rollup"] = rollup
+                    self._evict_sessions()
+                    logger.info("Stored %d turns in %s", len(pending), self.index_name)
+                    get_tracer().observe("interaction_flush", time.perf_counter() - started, turns=len(pending))
+                except Exception as e:
+                    logger.error("Error storing %d turns, keeping them for the next flush: %s", len(pending), e)
+                    get_tracer().observe("interaction_flush", time.perf_counter() - started, errors=1)
+                    with self._lock:
+                        self._pending = (pending + self._pending)[-self.max_buffered:]
+
+            if self.retention_days is not None and time.monotonic() - self._last_prune >= self.prune_interval:
+                self._last_prune = time.monotonic()
+                self.prune()
+                # Rollups may cover pruned turns; sessions reload from what is left when they come back
+                self._sessions.clear()
+
+    def prune(self):
+        """
+        Deletes turns and session rollups older than retention_days.
+        """
+        if self.retention_days is None:
+            return
+        cutoff = int(time.time() - self.retention_days * 86400)
+        try:
+            self.backend.delete_where(self.index_name, {"date_unix": {"$lt": cutoff}})
+            logger.info("Pruned turns older than %s days from %s", self.retention_days, self.index_name)
+        except Exception as e:
+            logger.error("Error pruning %s: %s", self.index_name, e)
+
+    def _number(self, records):
+        """
+        Gives buffered turns that have none yet their turn number and vector id, continuing their sessions' counts.
+        """
+        for record in records:
+            metadata = record["metadata"]
+            session = self._session(metadata["session_id"], records)
+            if record["id"] is None:
+                session["turns"] += 1
+                metadata["turn"] = session["turns"]
+                record["id"] = f"{metadata['session_id']}#{metadata['turn']:04d}"
+
+    def _session(self, session_id, records):
+        """
+        Returns the in-memory state of a session, loading it from its stored turns if it is not in memory.
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            try:
+                stored = [
+                    vector for vector in self.backend.fetch_prefix(self.index_name, f"{session_id}#", filter={"session_id": {"$eq": session_id}})
+                    if vector["metadata"].get("session_id") == session_id and vector["metadata"].get("kind") == "turn"
+                ]
+            except Exception as e:
+                # Failing here would requeue the session's turns on every flush until they are dropped
+                logger.error("Could not load the stored turns of session %s, numbering its turns from zero: %s", session_id, e)
+                stored = []
+            stored.sort(key=lambda vector: vector["metadata"].get("turn", 0))
+            # Turns numbered by an earlier, failed flush are not stored yet but keep their numbers
+            with self._lock:
+                buffered = [record for record in records + self._pending if record["id"] is not None and record["metadata"]["session_id"] == session_id]
+            turns = max([vector["metadata"].get("turn", 0) for vector in stored] + [record["metadata"]["turn"] for record in buffered] + [0])
+            rollup = None
+            if self.session_rollups and stored:
+                rollup = {
+                    "sum": np.sum([np.asarray(vector["values"], dtype=np.float64) for vector in stored], axis=0),
+                    "turns": len(stored),
+                    "questions": [vector["metadata"].get("user_question", "")[:500] for vector in stored[-5:]]
+                }
+            session = {"turns": turns, "rollup": rollup}
+        session["seen"] = time.monotonic()
+        self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _evict_sessions(self):
+        """
+        Drops the state of sessions idle for session_ttl seconds, and of the least recently used ones beyond max_sessions.
+        """
+        cutoff = time.monotonic() - self.session_ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session["seen"] >= cutoff and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+
+    def _rollup_vectors(self, upserts):
+        """
+        Folds freshly embedded turns into their sessions' running means and returns one rollup vector per session,
+        along with the updated session states to keep once the write succeeded.
+        """
+        rollups, states = {}, {}
+        for vector in upserts:
+            metadata = vector["metadata"]
+            previous = states.get(metadata["session_id"]) or self._sessions[metadata["session_id"]]["rollup"] or {"sum": np.zeros(len(vector["values"])), "turns": 0, "questions": []}
+            state = states[metadata["session_id"]] = {
+                "sum": previous["sum"] + np.asarray(vector["values"], dtype=np.float64),
+                "turns": previous["turns"] + 1,
+                "questions": (previous["questions"] + [metadata["user_question"][:500]])[-5:]
+            }
+
+            rollups[metadata["session_id"]] = {
+                "id": f"{metadata['session_id']}#session",
+                "values": (state["sum"] / state["turns"]).tolist(),
+                "metadata": {
+                    **metadata,
+                    "kind": "session",
+                    "turn": state["turns"],
+                    "user_question": " | ".join(state["questions"])
+                }
+            }
+        return list(rollups.values()), states
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Interaction flush failed: %s", e)
+
+
+_store = None
+_lock = threading.Lock()
+
+
+def get_interaction_store(embeddings, backend):
+    """
+    Returns the process-wide interaction store, creating it on first use with the given embeddings and backend.
+
+    Configured by INTERACTION_BATCH_SIZE, INTERACTION_FLUSH_INTERVAL (seconds), INTERACTION_SESSION_ROLLUPS
+    ("1" to enable), INTERACTION_RETENTION_DAYS (unset to keep turns forever), INTERACTION_MAX_SESSIONS and
+    INTERACTION_SESSION_TTL (seconds).
+
+    Args:
+        embeddings (Embeddings): Embedding model used for the turns.
+        backend (VectorBackend): Vector store holding the interaction index.
+
+    Returns:
+        InteractionStore: The shared store.
+    """
+    global _store
+    with _lock:
+        if _store is None:
+            retention_days = os.getenv("INTERACTION_RETENTION_DAYS")
+            _store = InteractionStore(
+                embeddings,
+                backend,
+                batch_size=int(os.getenv("INTERACTION_BATCH_SIZE", "16")),
+                flush_interval=float(os.getenv("INTERACTION_FLUSH_INTERVAL", "5")),
+                session_rollups=os.getenv("INTERACTION_SESSION_ROLLUPS", "0") == "1",
+                retention_days=float(retention_days) if retention_days else None,
+                max_sessions=int(os.getenv("INTERACTION_MAX_SESSIONS", "1000")),
+                session_ttl=float(os.getenv("INTERACTION_SESSION_TTL", "3600"))
+            )
+        return _store
@@ -1,12 +1,19 @@
 import os
-from datetime import datetime, timezone
+import time
+import hashlib
 import logging
-from tenacity import retry, stop_after_attempt, wait_fixed
 from dotenv import load_dotenv
-from langchain_huggingface import HuggingFaceEmbeddings, HuggingFaceEndpoint as HuggingFaceHub
-from langchain_community.vectorstores.pinecone import Pinecone
-from pinecone import Pinecone as pc
-import pinecone
+from langchain_huggingface import HuggingFaceEndpoint as HuggingFaceHub
+from embedding_service import get_embedding_service
+from background import get_executor, get_write_behind_queue
+from summaries import get_summary_index, meeting_date
+from vector_backends import get_backend
+from interactions import INTERACTION_INDEX, get_interaction_store
+from response_cache import get_response_cache
+from prompt_budget import ConversationMemory, format_turn, get_token_counter
+from resilience import ResilientLLM, get_circuit_breaker, get_latency_tracker
+from dispatcher import get_dispatcher
+import tracing
 
 # Set up logging for the chatbot
 logger = logging.getLogger(__name__)
@@ -20,11 +27,21 @@ class chatbot:
         temperature (float): The temperature parameter for the language model.
         user_name (str): The name of the user interacting with the chatbot.
         session_id (str): A unique identifier for the user's session.
-        embeddings (HuggingFaceEmbeddings): Embedding generator for document vectors.
+        embeddings (Embeddings): Embedding generator for document vectors, shared across sessions by default.
+        backend (VectorBackend): Vector store used for retrieval and for storing interactions.
+        interactions (InteractionStore): Process-wide store batching the turns written to the interaction index.
+        granularity (str): Whether past chats are retrieved per "turn" or per "session" rollup.
+        response_cache (SemanticResponseCache): Process-wide cache of source data answers to similar questions, or None.
+        token_counter (TokenCounter): Counts tokens with the LLM's tokenizer.
+        max_prompt_tokens (int): Token budget of each prompt; retrieved context is truncated to fit it.
+        memory (ConversationMemory): Keeps each session's chat history within its token budget.
+        tracer (Tracer): Process-wide tracer recording per-stage timings, token counts, retries and cache hits.
         llm (HuggingFaceHub): HuggingFace language model endpoint.
+        resilient_llm (ResilientLLM): Calls the LLM with retries, the endpoint's shared circuit breaker and optional hedging to LLM_FALLBACK_REPO_ID.
+        dispatcher (LLMDispatcher): Process-wide limit on concurrent LLM calls, sharing the result of identical in-flight prompts.
     """
 
-    def __init__(self, temperature=0.8, prompt_sourcedata=None, prompt_conv=None, user_name=None, session_id=None):
+    def __init__(self, temperature=0.8, prompt_sourcedata=None, prompt_conv=None, user_name=None, session_id=None, embeddings=None, backend=None, granularity=None):
         """
         Initializes the chatbot instance with parameters and sets up embeddings and LLM.
 
@@ -34,27 +51,77 @@ class chatbot:
             prompt_conv (str, optional): Prompt template for conversational context.
             user_name (str, optional): Name of the user.
             session_id (str, optional): Unique session identifier.
+            embeddings (Embeddings, optional): Embedding model to use. Defaults to the process-wide shared embedding service.
+            backend (VectorBackend, optional): Vector store to use. Defaults to the one selected by the VECTOR_BACKEND env var.
+            granularity (str, optional): "turn" or "session" past chat retrieval. Defaults to the PAST_CHAT_GRANULARITY env var, else "turn".
         """
         load_dotenv()
-        self.embeddings = HuggingFaceEmbeddings()
+        self.embeddings = embeddings or get_embedding_service()
         self.index_name = "eer-transcripts-pdfs"
-        self.pinecone_instance = pc(api_key=os.getenv('PINECONE_API_KEY'), embeddings=self.embeddings)
+        self.backend = backend or get_backend()
+        self.interactions = get_interaction_store(self.embeddings, self.backend)
+        self.granularity = granularity or os.getenv("PAST_CHAT_GRANULARITY", "turn")
+        self.response_cache = get_response_cache()
 
         # Self-assign parameters
         self.user_name = user_name
         self.session_id = session_id
         self.temperature = temperature
 
-        # Instantiate the LLM
-        self.llm = HuggingFaceHub(
-            repo_id=os.getenv('repo_id'),
-            temperature=temperature,
+        # Instantiate the LLM, with an optional fallback endpoint used while the primary is down or slow
+        self.llm = self.create_llm(os.getenv('repo_id'))
+        fallback_repo_id = os.getenv("LLM_FALLBACK_REPO_ID")
+        self.resilient_llm = ResilientLLM(
+            self.llm,
+            fallback=self.create_llm(fallback_repo_id) if fallback_repo_id else None,
+            breaker=get_circuit_breaker(os.getenv('repo_id')),
+            latency=get_latency_tracker(os.getenv('repo_id')),
+            max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "4")),
+            base_delay=float(os.getenv("LLM_BACKOFF_BASE", "0.5")),
+            max_delay=float(os.getenv("LLM_BACKOFF_MAX", "20")),
+            hedge=os.getenv("LLM_HEDGE", "false").lower() in ("1", "true", "yes"),
+            latency_budget=float(os.getenv("LLM_LATENCY_BUDGET")) if os.getenv("LLM_LATENCY_BUDGET") else None
+        )
+        self.dispatcher = get_dispatcher()
+        self.prompt_sourcedata = prompt_sourcedata
+        self.prompt_conv = prompt_conv
+
+        # Prompt budgets
+        self.token_counter = get_token_counter(os.getenv('repo_id'))
+        self.max_prompt_tokens = int(os.getenv("PROMPT_MAX_TOKENS", "4000"))
+        summary_tokens = int(os.getenv("HISTORY_SUMMARY_TOKENS", "300"))
+        self.memory = ConversationMemory(
+            self.token_counter,
+            self.summarize_history,
+            window_turns=int(os.getenv("HISTORY_WINDOW_TURNS", "6")),
+            history_tokens=int(os.getenv("HISTORY_MAX_TOKENS", "1500")),
+            summary_tokens=summary_tokens,
+            fold_turns=int(os.getenv("HISTORY_FOLD_TURNS", "3")),
+            # Summary prompts stay within the prompt budget too, next to a summary of at most summary_tokens
+            fold_tokens=max(1, self.max_prompt_tokens - self.token_counter.count(self.default_prompt_history_summary("", [])) - summary_tokens)
+        )
+
+        # Instrumentation, with the caches and queues exported as gauges
+        self.tracer = tracing.get_tracer()
+        self.tracer.register_collector("chatbot", self.collect_metrics)
+
+    def create_llm(self, repo_id):
+        """
+        Creates a HuggingFace endpoint with the chatbot's sampling parameters.
+
+        Args:
+            repo_id (str): The model repository.
+
+        Returns:
+            HuggingFaceHub: The endpoint.
+        """
+        return HuggingFaceHub(
+            repo_id=repo_id,
+            temperature=self.temperature,
             top_p=0.8,
             top_k=50,
             huggingfacehub_api_token=os.getenv('HUGGINGFACE_API_KEY')
         )
-        self.prompt_sourcedata = prompt_sourcedata
-        self.prompt_conv = prompt_conv
 
     def default_prompt_sourcedata(self, chat_history, original_data, user_input, user_name):
         """
@@ -64,14 +131,15 @@ class chatbot:
             chat_history (str): The chat history so far.
             original_data (str): The relevant data retrieved from the database.
             user_input (str): The user's query.
-            user_name (str): The name of the user.
+            user_name (str): The name of the user, or None for an answer that may be served to other users from the response cache.
 
         Returns:
             str: The formatted prompt for sourced data queries.
         """
+        user = f'the user "{user_name}"' if user_name else "a user"
         return f"""You are a chatbot assistant, working for the Experimenting Experiencing Reflecting (EER) Project, a research endeavor investigating the connections between art and science.
     You have access to a collection of documents, including descriptions of research activities, meeting transcripts, and other relevant materials. Your main task is to help the user explore and reflect on the EER project. When possible, please cite source documents in your answer (calling the documents the transcript date, e.g. "2021-05-28", or website page after the "/"). 
-    You are now assisting the user "{user_name}" with their query: "{user_input}". Below is the relevant data from the EER group that was retrieved from the database for this query: "{original_data}". Based on this data, provide a concise answer to the user’s question in maximum 2 paragraphs. The previous chat history for this session so far is: {chat_history} Your response:"""
+    You are now assisting {user} with their query: "{user_input}". Below is the relevant data from the EER group that was retrieved from the database for this query: "{original_data}". Based on this data, provide a concise answer to the user’s question in maximum 2 paragraphs. The previous chat history for this session so far is: {chat_history} Your response:"""
 
     def default_prompt_conv(self, chat_history, user_input, llm_response, past_chat, user_name):
         """
@@ -96,43 +164,137 @@ class chatbot:
     Here is the chat history for this session, so that your response can be aware of the context: {chat_history}
     Your response: """
 
-    def retrieve_docs(self, input, index, excluded_session_id=None, k=5):
+    def default_prompt_history_summary(self, summary, turns):
+        """
+        Generates the prompt folding older turns into the running summary of a session.
+
+        Args:
+            summary (str): The summary so far, possibly empty.
+            turns (list): The (question, answer) turns to fold in.
+
+        Returns:
+            str: The formatted prompt for the history summary.
+        """
+        conversation = "\n".join(format_turn(question, answer) for question, answer in turns)
+        return f"""Below is a summary of the start of a conversation between a user and a chatbot about the Experimenting Experiencing Reflecting (EER) Project, followed by the next part of the conversation. Update the summary so that it also covers the new part, in at most 5 sentences, keeping the user's questions and the key points of the answers.
+    Summary so far: "{summary or 'The conversation has just started.'}"
+    Next part of the conversation: {conversation}
+    Updated summary: """
+
+    def summarize_history(self, summary, turns, session_id=None):
+        """
+        Folds turns into the running summary of a session's chat history.
+
+        Args:
+            summary (str): The summary so far, possibly empty.
+            turns (list): The (question, answer) turns to fold in.
+            session_id (str, optional): The session, whose LLM queue the call waits in. Defaults to None.
+
+        Returns:
+            str: The updated summary.
+
+        Raises:
+            RuntimeError: If the LLM call failed, so the previous summary is kept.
+        """
+        response = self.get_llm_response(self.default_prompt_history_summary(summary, turns), stage="llm_history_summary", session_id=session_id)
+        if response.startswith("Error invoking LLM"):
+            raise RuntimeError(response)
+        return response.strip()
+
+    def prepare_history(self, session_id, chat_history):
+        """
+        Turns the chat history into prompt text within the history token budget.
+
+        Args:
+            session_id (str): The unique session identifier.
+            chat_history (list or str): The session's (question, answer) turns, oldest first, or an already formatted history.
+
+        Returns:
+            str: The history text followed by a blank line, or an empty string if there is no history.
         """
-        Retrieves documents from a Pinecone index, optionally excluding a specific session ID.
+        if not chat_history:
+            return ""
+        if isinstance(chat_history, str):
+            history = self.token_counter.truncate(chat_history, self.memory.history_tokens, keep_end=True)
+        else:
+            history = self.memory.history(session_id, list(chat_history))
+        return history + "\n\n"
+
+    def context_budget(self, prompt):
+        """
+        Returns the number of tokens left for retrieved context in a prompt.
+
+        Args:
+            prompt (str): The prompt rendered without any context.
+
+        Returns:
+            int: The remaining tokens of max_prompt_tokens, at least 0.
+        """
+        return max(0, self.max_prompt_tokens - self.token_counter.count(prompt))
+
+    def retrieve_docs(self, input, index, excluded_session_id=None, k=5, date_range=None, granularity=None):
+        """
+        Retrieves documents from a vector index, optionally excluding a specific session ID.
+
+        Past chats are matched either against single turns or against per-session rollups, which requires the
+        interaction store to maintain rollups (INTERACTION_SESSION_ROLLUPS=1).
 
         Args:
             input (str): The input query for retrieving documents.
-            index (str): The name of the Pinecone index to retrieve documents from.
+            index (str): The name of the vector index to retrieve documents from.
             excluded_session_id (str, optional): Session ID to exclude from retrieval (for avoiding duplicate data).
             k (int, optional): The number of documents to retrieve. Defaults to 5.
+            date_range (tuple, optional): (start, end) meeting dates in YYYY-MM-DD format to restrict transcript excerpts to, either end may be None. Defaults to None.
+            granularity (str, optional): "turn" or "session", for the interaction index. Defaults to the chatbot's granularity.
 
         Returns:
             list: A list of retrieved documents.
         """
         try:
-            docsearch = Pinecone.from_existing_index(index, self.embeddings)
-
-            if index == "eer-interaction-data":
+            if index == INTERACTION_INDEX:
+                # Turns written before per-turn storage have no kind, so turns are selected as "not a rollup"
+                kind = {"$eq": "session"} if (granularity or self.granularity) == "session" else {"$ne": "session"}
                 search_kwargs = {
                     "k": k,
                     "filter": {
-                        "session_id": {"$ne": excluded_session_id}
+                        "$and": [
+                            {"session_id": {"$ne": excluded_session_id}},
+                            {"kind": kind}
+                        ]
                     }
                 }
             else:
                 search_kwargs = {"k": k}
 
-            retriever = docsearch.as_retriever(search_kwargs=search_kwargs)
-            docs = retriever.invoke(input)
+            # Restrict to meetings in the date range, using the dates known to the summary catalog
+            if date_range is not None:
+                date_filter = get_summary_index().date_filter(*date_range)
+                search_kwargs["filter"] = {"$and": [search_kwargs["filter"], date_filter]} if "filter" in search_kwargs else date_filter
+
+            with tracing.span("retrieve_past_chats" if index == INTERACTION_INDEX else "retrieve_sources") as stage:
+                with tracing.span("embed_query"):
+                    vector = self.embeddings.embed_query(input)
+                with tracing.span("vector_search"):
+                    if date_range is None:
+                        docs = self.backend.search(index, vector, k=search_kwargs["k"], filter=search_kwargs.get("filter"))
+                    else:
+                        # Chunks without a date field pass the filter, so extra ones are fetched and checked by source
+                        start, end = date_range
+                        docs = [
+                            doc for doc in self.backend.search(index, vector, k=4 * search_kwargs["k"], filter=search_kwargs.get("filter"))
+                            if (date := meeting_date(doc.metadata)) is not None and (start is None or date >= start) and (end is None or date <= end)
+                        ][:search_kwargs["k"]]
+                stage.set(documents=len(docs))
             return docs
         except Exception as e:
             logger.error("Error retrieving documents: %s", e)
             raise
 
-    @retry(stop=stop_after_attempt(5), wait=wait_fixed(2))
     def invoke_llm_with_retry(self, prompt):
         """
-        Invokes the LLM with retry logic to handle transient connection issues.
+        Invokes the LLM, retrying rate limits, timeouts and server errors with jittered exponential backoff.
+
+        Fails fast with CircuitOpenError while the endpoint is down and no fallback is configured.
 
         Args:
             prompt (str): The prompt to send to the LLM.
@@ -140,43 +302,162 @@ class chatbot:
         Returns:
             str: The LLM's response to the prompt.
         """
-        response = self.llm.invoke(prompt)
+        response = self.resilient_llm.invoke(prompt)
         return response
 
-    def get_llm_response(self, prompt):
+    def get_llm_response(self, prompt, stage="llm", session_id=None):
         """
         Generates a response from the LLM, retrying if necessary.
 
+        Goes through the process-wide dispatcher: the call may wait for a free slot, and a caller asking for a prompt
+        that is already in flight shares its response.
+
         Args:
             prompt (str): The prompt to send to the LLM.
+            stage (str, optional): Name of the span recording the call. Defaults to "llm".
+            session_id (str, optional): The calling session, whose queue the call waits in. Defaults to the chatbot's session_id.
 
         Returns:
             str: The LLM's response or an error message if the invocation fails.
         """
-        try:
-            response = self.invoke_llm_with_retry(prompt)
+        key = hashlib.sha256(f"{os.getenv('repo_id')}\0{self.temperature}\0{prompt}".encode("utf-8")).hexdigest()
+        with tracing.span(stage, prompt_tokens=self.token_counter.count(prompt)) as llm_span:
+            try:
+                response = self.dispatcher.call(key, lambda: self.invoke_llm_with_retry(prompt), session=session_id or self.session_id)
+            except Exception as e:
+                llm_span.set(errors=1)
+                error = f"Error invoking LLM: {e}"
+                return error
+            llm_span.set(response_tokens=self.token_counter.count(response))
             return response
+
+    def stream_llm_response(self, prompt, stage="llm", session_id=None):
+        """
+        Streams the LLM's response token by token, retrying if necessary.
+
+        A failed call is only retried if no tokens have been yielded yet, so the caller never sees duplicated text.
+        A failure after that ends the stream with an error message, like get_llm_response does.
+        The stream holds one of the dispatcher's slots until it ends; streams are never shared.
+
+        Args:
+            prompt (str): The prompt to send to the LLM.
+            stage (str, optional): Name of the span recording the call. Defaults to "llm".
+            session_id (str, optional): The calling session, whose queue the call waits in. Defaults to the chatbot's session_id.
+
+        Yields:
+            str: Chunks of the LLM's response, or an error message if the invocation fails.
+        """
+        with tracing.span(stage, prompt_tokens=self.token_counter.count(prompt)) as llm_span:
+            started = time.perf_counter()
+            chunks = []
+            try:
+                with self.dispatcher.slot(session_id or self.session_id):
+                    for chunk in self.resilient_llm.stream(prompt):
+                        if not chunks:
+                            llm_span.set(first_token_seconds=time.perf_counter() - started)
+                        chunks.append(chunk)
+                        yield chunk
+            except Exception as e:
+                llm_span.set(errors=1)
+                separator = "\n\n" if chunks else ""
+                yield f"{separator}Error invoking LLM: {e}"
+                return
+            llm_span.set(response_tokens=self.token_counter.count("".join(chunks)))
+
+    def answer_is_cacheable(self, chat_history):
+        """
+        Tells whether the source data answer of a turn is served from and stored in the response cache.
+
+        Only answers to questions without chat history are cached, since the answer depends on the history. They
+        are generated without the user's name, since they may be served to other users.
+
+        Args:
+            chat_history (str): The chat history so far.
+
+        Returns:
+            bool: Whether the answer is cacheable.
+        """
+        return self.response_cache is not None and not chat_history
+
+    def lookup_cached_answer(self, user_input, chat_history):
+        """
+        Looks up the source data answer of an earlier, near-identical question.
+
+        Args:
+            user_input (str): The user's input.
+            chat_history (str): The chat history so far.
+
+        Returns:
+            dict: The cached entry (query, source_data, response, score), or None.
+        """
+        if not self.answer_is_cacheable(chat_history):
+            return None
+        try:
+            with tracing.span("response_cache") as cache_span:
+                cached = self.response_cache.lookup(self.embeddings.embed_query(user_input))
+                cache_span.set(cache_hit=cached is not None)
+        except Exception as e:
+            logger.warning("Error looking up the response cache: %s", e)
+            return None
+        if cached is not None:
+            logger.info("Response cache hit (similarity %.3f) for %r via %r", cached["score"], user_input, cached["query"])
+        return cached
+
+    def store_cached_answer(self, user_input, chat_history, source_data, sourcedata_response, seconds):
+        """
+        Caches a source data answer for later near-identical questions, unless it is an error or depends on history.
+
+        Args:
+            user_input (str): The user's input.
+            chat_history (str): The chat history so far.
+            source_data (list): The documents the answer was based on.
+            sourcedata_response (str): The answer.
+            seconds (float): Time spent retrieving the documents and generating the answer.
+        """
+        if not self.answer_is_cacheable(chat_history) or "Error invoking LLM:" in sourcedata_response:
+            return
+        try:
+            self.response_cache.store(user_input, self.embeddings.embed_query(user_input), source_data, sourcedata_response, seconds)
         except Exception as e:
-            error = f"Error invoking LLM: {e}"
-            return error
+            logger.warning("Error storing in the response cache: %s", e)
 
-    def format_context(self, documents, chat=False):
+    def collect_metrics(self):
+        """
+        Returns gauges of the shared caches and queues for the metrics export.
+
+        Returns:
+            dict: Metric name to value.
+        """
+        gauges = {"eer_write_behind_queue_size": get_write_behind_queue().qsize()}
+        if self.response_cache is not None:
+            for key, value in self.response_cache.stats().items():
+                gauges[f"eer_response_cache_{key}"] = value
+        for key, value in self.dispatcher.stats().items():
+            gauges[f"eer_llm_dispatcher_{key}"] = value
+        if hasattr(self.embeddings, "stats"):
+            for key, value in self.embeddings.stats().items():
+                gauges[f"eer_embedding_cache_{key}"] = value
+        return gauges
+
+    def format_context(self, documents, chat=False, max_tokens=None):
         """
         Formats the context from retrieved documents for use in prompts.
 
         Args:
             documents (list): List of documents retrieved from Pinecone.
             chat (bool, optional): Whether to format as chat context. Defaults to False.
+            max_tokens (int, optional): Token budget of the context. Documents are added best first until it is used up, the last one truncated to fit. Defaults to None (no limit).
 
         Returns:
             str: A formatted string representing the context.
         """
         context = ""
+        used = 0
 
         for idx, doc in enumerate(documents, start=1):
             metadata = doc.metadata
             if chat:
-                context += (
+                entry = (
                     f'User {idx}: {metadata.get("user_name", "Unknown User")}\n'
                     f'Chat session {idx}: {metadata.get("session_id", "Unknown Session ID")}\n'
                     f'User Question: "{metadata.get("user_question", "Unknown Question")}"\n'
@@ -185,127 +466,299 @@ class chatbot:
                 )
             else:
                 if metadata.get("page") is not None:
-                    context += (
+                    entry = (
                         f"Document type: PDF {idx}\n"
                         f"Page content: {doc.page_content}\n"
                         f"Source: {metadata['source']}\n"
                         f"Page: {metadata['page']}\n"
                     )
+                elif metadata.get("speakers"):
+                    # Speaker-turn windows spanning several utterances
+                    entry = (
+                        f"Document type: Meeting Transcript Exerpt {idx}\n"
+                        f"Speakers: {', '.join(metadata['speakers'])}\n"
+                        f"Date: {metadata.get('date', 'Unknown Date')}, from {metadata.get('start_time', 'Unknown Time')} to {metadata.get('end_time', 'Unknown Time')}\n"
+                        f"Content: {doc.page_content}\n\n"
+                    )
                 else:
-                    context += (
+                    entry = (
                         f"Document type: Meeting Transcript Exerpt {idx}\n"
                         f"Person {idx}: {metadata.get('speaker_name', 'Unknown Speaker')}\n"
                         f"Date: {metadata.get('date_time', 'Unknown Date')}\n"
                         f"Content: {doc.page_content}\n\n"
                     )
 
+            if max_tokens is not None:
+                tokens = self.token_counter.count(entry)
+                if used + tokens > max_tokens:
+                    context += self.token_counter.truncate(entry, max_tokens - used)
+                    break
+                used += tokens
+            context += entry
+
         return context
 
-    def upsert_vectorstore(self, user_input, ai_output, user_name, session_id):
+    def upsert_vectorstore(self, user_input, ai_output, user_name, session_id, flush=False):
         """
-        Upserts the conversation data to the Pinecone vector store, storing user input, AI output, and metadata.
+        Stores one turn of the conversation in the interaction index, as its own vector.
+
+        Turns are buffered by the interaction store and written in batches by its background flusher.
 
         Args:
             user_input (str): The user's input.
             ai_output (str): The AI's response.
             user_name (str): The name of the user.
             session_id (str): The unique session identifier.
+            flush (bool, optional): Whether to write the buffered turns before returning. Defaults to False.
+        """
+        self.interactions.add_turn(user_input, ai_output, user_name, session_id)
+        logger.info("Buffered a turn of session %s for upsert", session_id)
+        if flush:
+            self.interactions.flush()
+
+    def pipeline(self, user_input, user_name, session_id, chat_history=None, mode="standard", background_upsert=True):
+        """
+        Handles the full pipeline of receiving user input, generating responses, and storing data.
+
+        In "standard" mode past chats are retrieved with the first LLM answer, as before. In "fast" mode they are
+        retrieved with the user query instead, in parallel with source retrieval and the first LLM call.
+
+        Args:
+            user_input (str): The user's input.
+            user_name (str): The name of the user.
+            session_id (str): The unique session identifier.
+            chat_history (list, optional): The session's (question, answer) turns so far, or a formatted history string. Defaults to None.
+            mode (str, optional): "standard" or "fast". Defaults to "standard".
+            background_upsert (bool, optional): Whether to leave the exchange to the batched background writes instead of blocking on it. Defaults to True.
+
+        Returns:
+            dict: A dictionary containing the AI output, source data, past chat context, and whether the source data answer came from the response cache.
         """
+        if mode not in ("standard", "fast"):
+            raise ValueError(f"Unknown pipeline mode: {mode}")
+
+        trace = self.tracer.start("pipeline", mode=mode)
         try:
-            pinecone_instance_chat = pc(api_key=os.getenv('PINECONE_API_KEY'), embeddings=self.embeddings)
-            index_name = "eer-interaction-data"
-            environment = "gcp-starter"
-            index = pinecone_instance_chat.Index(index_name, environment=environment)
-
-            embedding = self.embeddings.embed_documents([user_input + ai_output])[0]
-
-            index.upsert(vectors=[
-                {
-                    'id': session_id,
-                    'values': embedding,
-                    'metadata': {
-                        "user_question": user_input,
-                        "ai_output": ai_output,
-                        "user_name": user_name,
-                        "session_id": session_id,
-                        "date": datetime.now(timezone.utc).isoformat(),
-                        "text": f"User input: {user_input}, AI output: {ai_output}"
-                    }
+            with tracing.activate(trace):
+                # Keep the history within its token budget, however long the session is
+                chat_history = self.prepare_history(session_id, chat_history)
+
+                # In fast mode the past chat lookup only needs the query, so start it right away
+                past_chat_future = None
+                if mode == "fast":
+                    past_chat_future = get_executor().submit(tracing.bind(self.retrieve_docs), user_input, INTERACTION_INDEX, session_id)
+
+                # Steps 1 and 2 are skipped if a near-identical question was answered before
+                cached = self.lookup_cached_answer(user_input, chat_history)
+                if cached is not None:
+                    source_data, sourcedata_response = cached["source_data"], cached["response"]
+                else:
+                    started = time.perf_counter()
+
+                    # Step 1: Retrieve source data, truncated to what is left of the prompt budget
+                    source_data = self.retrieve_docs(user_input, "eer-transcripts-pdfs")
+                    answer_user = None if self.answer_is_cacheable(chat_history) else user_name
+                    budget = self.context_budget(self.default_prompt_sourcedata(chat_history=chat_history, original_data="", user_input=user_input, user_name=answer_user))
+                    formatted_source_data = self.format_context(source_data, max_tokens=budget)
+
+                    # Step 2: Generate LLM response from source data
+                    sourcedata_response = self.get_llm_response(self.default_prompt_sourcedata(chat_history=chat_history, original_data=formatted_source_data, user_input=user_input, user_name=answer_user), stage="llm_sourcedata", session_id=session_id)
+                    self.store_cached_answer(user_input, chat_history, source_data, sourcedata_response, time.perf_counter() - started)
+
+                # Step 3: Retrieve past chat context
+                if past_chat_future is not None:
+                    past_chat_context = past_chat_future.result()
+                else:
+                    past_chat_context = self.retrieve_docs(sourcedata_response, INTERACTION_INDEX, session_id)
+                budget = self.context_budget(self.default_prompt_conv(chat_history=chat_history, user_input=user_input, llm_response=sourcedata_response, past_chat="", user_name=user_name))
+                formatted_chat_context = self.format_context(past_chat_context, chat=True, max_tokens=budget)
+
+                # Step 4: Generate LLM response for conversation context, now considering combined chat history
+                conversation_response = self.get_llm_response(self.default_prompt_conv(chat_history=chat_history, user_input=user_input, llm_response=sourcedata_response, past_chat=formatted_chat_context, user_name=user_name), stage="llm_conversation", session_id=session_id)
+
+                # Step 5: Combine the responses
+                ai_output = f"{sourcedata_response}\n\n**Related Conversations with this chatbot**\n\n{conversation_response}"
+                logger.info(f"Pipeline generated response: {ai_output}")
+
+                # Step 6: Upsert to vector store, off the response path unless asked to block
+                with tracing.span("upsert"):
+                    self.upsert_vectorstore(user_input, ai_output, user_name, session_id, flush=not background_upsert)
+
+                # Return a dictionary containing all relevant information
+                result = {
+                    "ai_output": ai_output,
+                    "source_data": source_data,
+                    "past_chat_context": past_chat_context,
+                    "cache_hit": cached is not None
                 }
-            ])
-            logger.info("Upsert to Pinecone successful for session_id: %s", session_id)
-        except Exception as e:
-            logger.error("Error upserting to Pinecone: %s", e)
-            raise
+        finally:
+            trace.finish()
+        self.log_trace(trace)
+        return result
+        
+    def log_trace(self, trace):
+        """
+        Logs the duration of each stage of a finished trace.
 
-    def pipeline(self, user_input, user_name, session_id, chat_history=None):
+        Args:
+            trace (Trace): The trace.
         """
-        Handles the full pipeline of receiving user input, generating responses, and storing data.
+        if trace.duration is not None:
+            stages = ", ".join(f"{span.name}={span.duration:.2f}s" for span in sorted(trace.spans, key=lambda span: span.offset))
+            logger.info("%s took %.2fs: %s", trace.name, trace.duration, stages)
+
+    def pipeline_stream(self, user_input, user_name, session_id, chat_history=None, mode="standard"):
+        """
+        Starts a streaming version of the pipeline.
 
         Args:
             user_input (str): The user's input.
             user_name (str): The name of the user.
             session_id (str): The unique session identifier.
-            chat_history (str, optional): The chat history for context. Defaults to None.
+            chat_history (list, optional): The session's (question, answer) turns so far, or a formatted history string. Defaults to None.
+            mode (str, optional): "standard" or "fast", as in pipeline. Defaults to "standard".
 
         Returns:
-            dict: A dictionary containing the AI output, source data, and past chat context.
+            StreamingTurn: The turn, whose two answer phases can be streamed one after the other.
         """
-        if chat_history:
-            chat_history = chat_history + "\n\n"
-        else:
-            chat_history = ""
+        return StreamingTurn(self, user_input, user_name, session_id, chat_history, mode)
+
+    @staticmethod
+    def query_summaries(timestamp):
+        """
+        Looks up the summary of the meeting held on a given date.
+
+        Args:
+            timestamp (str): The meeting date in YYYY-MM-DD format.
 
-        # Step 1: Retrieve source data
-        source_data = self.retrieve_docs(user_input, "eer-transcripts-pdfs")
-        formatted_source_data = self.format_context(source_data)
+        Returns:
+            dict: The summary metadata (date, speakers, summary), or an empty dict if there is no summary for that date.
+        """
+        return get_summary_index().get(timestamp) or {}
 
-        # Step 2: Generate LLM response from source data
-        sourcedata_response = self.get_llm_response(self.default_prompt_sourcedata(chat_history=chat_history, original_data=formatted_source_data, user_input=user_input, user_name=user_name))
 
-        # Step 3: Retrieve past chat context
-        past_chat_context = self.retrieve_docs(sourcedata_response, "eer-interaction-data", session_id)
-        formatted_chat_context = self.format_context(past_chat_context, chat=True)
+class StreamingTurn:
+    """
+    A single pipeline turn whose two LLM answers are streamed as they are generated.
 
-        # Step 4: Generate LLM response for conversation context, now considering combined chat history
-        conversation_response = self.get_llm_response(self.default_prompt_conv(chat_history=chat_history, user_input=user_input, llm_response=sourcedata_response, past_chat=formatted_chat_context, user_name=user_name))
+    Call stream_sourcedata, then stream_conversation, then finish to assemble the final output and store it.
 
-        # Step 5: Combine the responses
-        ai_output = f"{sourcedata_response}\n\n**Related Conversations with this chatbot**\n\n{conversation_response}"
-        logger.info(f"Pipeline generated response: {ai_output}")
+    Attributes:
+        source_data (list): Documents retrieved from the transcripts index, set once the first phase starts.
+        past_chat_context (list): Documents retrieved from past chats, set once the second phase starts.
+        sourcedata_response (str): The full first answer, set once its stream is exhausted.
+        cache_hit (bool): Whether the first answer came from the response cache.
+        conversation_response (str): The full second answer, set once its stream is exhausted.
+        trace (Trace): The trace of the turn, finished by finish.
+    """
+
+    def __init__(self, bot, user_input, user_name, session_id, chat_history=None, mode="standard"):
+        """
+        Initializes the turn, starting the past chat lookup right away in fast mode.
+
+        Args:
+            bot (chatbot): The chatbot running the turn.
+            user_input (str): The user's input.
+            user_name (str): The name of the user.
+            session_id (str): The unique session identifier.
+            chat_history (list, optional): The session's (question, answer) turns so far, or a formatted history string. Defaults to None.
+            mode (str, optional): "standard" or "fast". Defaults to "standard".
+        """
+        if mode not in ("standard", "fast"):
+            raise ValueError(f"Unknown pipeline mode: {mode}")
 
-        # Step 6: Upsert to vector store
-        self.upsert_vectorstore(user_input, ai_output, user_name, session_id)
+        self.bot = bot
+        self.user_input = user_input
+        self.user_name = user_name
+        self.session_id = session_id
+        self.chat_history = bot.prepare_history(session_id, chat_history)
+        self.source_data = []
+        self.past_chat_context = []
+        self.sourcedata_response = None
+        self.conversation_response = None
+        self.cache_hit = False
+        self.trace = bot.tracer.start("pipeline_stream", mode=mode)
+
+        self._past_chat_future = None
+        if mode == "fast":
+            with tracing.activate(self.trace):
+                self._past_chat_future = get_executor().submit(tracing.bind(bot.retrieve_docs), user_input, INTERACTION_INDEX, session_id)
+
+    def stream_sourcedata(self):
+        """
+        Retrieves source data and streams the answer based on it, or yields a cached answer to a near-identical question at once.
+
+        Yields:
+            str: Chunks of the source data answer.
+        """
+        with tracing.activate(self.trace):
+            cached = self.bot.lookup_cached_answer(self.user_input, self.chat_history)
+            if cached is not None:
+                self.cache_hit = True
+                self.source_data = cached["source_data"]
+                self.sourcedata_response = cached["response"]
+                yield self.sourcedata_response
+                return
+
+            started = time.perf_counter()
+            self.source_data = self.bot.retrieve_docs(self.user_input, "eer-transcripts-pdfs")
+            answer_user = None if self.bot.answer_is_cacheable(self.chat_history) else self.user_name
+            budget = self.bot.context_budget(self.bot.default_prompt_sourcedata(chat_history=self.chat_history, original_data="", user_input=self.user_input, user_name=answer_user))
+            prompt = self.bot.default_prompt_sourcedata(chat_history=self.chat_history, original_data=self.bot.format_context(self.source_data, max_tokens=budget), user_input=self.user_input, user_name=answer_user)
+
+            chunks = []
+            for chunk in self.bot.stream_llm_response(prompt, stage="llm_sourcedata", session_id=self.session_id):
+                chunks.append(chunk)
+                yield chunk
+            self.sourcedata_response = "".join(chunks)
+            self.bot.store_cached_answer(self.user_input, self.chat_history, self.source_data, self.sourcedata_response, time.perf_counter() - started)
+
+    def stream_conversation(self):
+        """
+        Retrieves past chats and streams the related conversations answer.
+
+        Yields:
+            str: Chunks of the related conversations answer.
+        """
+        if self.sourcedata_response is None:
+            for _ in self.stream_sourcedata():
+                pass
+
+        with tracing.activate(self.trace):
+            if self._past_chat_future is not None:
+                self.past_chat_context = self._past_chat_future.result()
+            else:
+                self.past_chat_context = self.bot.retrieve_docs(self.sourcedata_response, INTERACTION_INDEX, self.session_id)
+            budget = self.bot.context_budget(self.bot.default_prompt_conv(chat_history=self.chat_history, user_input=self.user_input, llm_response=self.sourcedata_response, past_chat="", user_name=self.user_name))
+            prompt = self.bot.default_prompt_conv(chat_history=self.chat_history, user_input=self.user_input, llm_response=self.sourcedata_response, past_chat=self.bot.format_context(self.past_chat_context, chat=True, max_tokens=budget), user_name=self.user_name)
+
+            chunks = []
+            for chunk in self.bot.stream_llm_response(prompt, stage="llm_conversation", session_id=self.session_id):
+                chunks.append(chunk)
+                yield chunk
+            self.conversation_response = "".join(chunks)
+
+    def finish(self):
+        """
+        Assembles the final output, queues it for upsert and returns the same dictionary as chatbot.pipeline.
+
+        Returns:
+            dict: A dictionary containing the AI output, source data, and past chat context.
+        """
+        if self.conversation_response is None:
+            for _ in self.stream_conversation():
+                pass
+
+        ai_output = f"{self.sourcedata_response}\n\n**Related Conversations with this chatbot**\n\n{self.conversation_response}"
+        logger.info(f"Pipeline generated response: {ai_output}")
+        with tracing.activate(self.trace), tracing.span("upsert"):
+            self.bot.upsert_vectorstore(self.user_input, ai_output, self.user_name, self.session_id)
+        self.trace.finish()
+        self.bot.log_trace(self.trace)
 
-        # Return a dictionary containing all relevant information
         return {
             "ai_output": ai_output,
-            "source_data": source_data,
-            "past_chat_context": past_chat_context
+            "source_data": self.source_data,
+            "past_chat_context": self.past_chat_context,
+            "cache_hit": self.cache_hit
         }
-        
-    @staticmethod
-    def query_summaries(timestamp):
-        # Set up pinecone client
-        pineclient = pinecone.Pinecone(api_key=os.environ.get("PINECONE_API_KEY"))
-        
-        # Connect to the index
-        index_name = "eer-meetings-summaries"
-        index = pineclient.Index(index_name)
-        
-        # Example vector query (should be replaced with actual vector for filtering)
-        query_vector = [1] * 768  # Replace with meaningful vector logic
-        
-        # Query the index
-        results = index.query(
-            vector=query_vector,
-            top_k=100,
-            include_metadata=True
-        )
-        
-        results_dict = results.to_dict()
-        
-        for match in results_dict["matches"]:
-            if match["metadata"]["date"] == timestamp:
-                return match["metadata"]
-        return "No match found"
\ No newline at end of file
@@ -0,0 +1,231 @@
+import os
+import threading
+import logging
+from background import get_executor
+
+# Set up logging for prompt budgeting
+logger = logging.getLogger(__name__)
+
+
+class TokenCounter:
+    """
+    Counts tokens with the LLM's own tokenizer, or estimates them (roughly four characters per token) if the
+    tokenizer cannot be loaded.
+
+    Attributes:
+        repo_id (str): The Hugging Face repo whose tokenizer is used.
+        tokenizer: The loaded tokenizer, or None when estimating.
+    """
+
+    def __init__(self, repo_id=None, api_token=None):
+        """
+        Loads the tokenizer of a Hugging Face repo.
+
+        Args:
+            repo_id (str, optional): The repo of the LLM. Defaults to None (estimate only).
+            api_token (str, optional): Token for gated repos. Defaults to None.
+        """
+        self.repo_id = repo_id
+        self.tokenizer = None
+        if repo_id:
+            try:
+                # transformers comes with sentence-transformers; imported here so estimating works without it
+                from transformers import AutoTokenizer
+                self.tokenizer = AutoTokenizer.from_pretrained(repo_id, token=api_token)
+            except Exception as e:
+                logger.warning("Could not load the tokenizer of %s, estimating token counts instead: %s", repo_id, e)
+
+    def count(self, text):
+        """
+        Returns the number of tokens in a text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            int: The token count.
+        """
+        if not text:
+            return 0
+        if self.tokenizer is None:
+            return len(text) // 4 + 1
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def truncate(self, text, max_tokens, keep_end=False):
+        """
+        Cuts a text down to at most max_tokens tokens.
+
+        Args:
+            text (str): The text.
+            max_tokens (int): The token budget.
+            keep_end (bool, optional): Whether to keep the end of the text instead of its start. Defaults to False.
+
+        Returns:
+            str: The text, shortened if it was over budget.
+        """
+        if max_tokens <= 0:
+            return ""
+        if self.tokenizer is None:
+            if len(text) // 4 + 1 <= max_tokens:
+                return text
+            return text[-max_tokens * 4:] if keep_end else text[:max_tokens * 4]
+        tokens = self.tokenizer.encode(text, add_special_tokens=False)
+        if len(tokens) <= max_tokens:
+            return text
+        return self.tokenizer.decode(tokens[-max_tokens:] if keep_end else tokens[:max_tokens])
+
+
+class ConversationMemory:
+    """
+    Keeps the chat history of each session within a token budget.
+
+    The most recent turns are kept verbatim, up to window_turns turns and history_tokens tokens. Older turns are
+    folded by the summarize callable into a running summary of at most summary_tokens tokens, in the background,
+    so no turn waits for it. Once the window is full, its oldest fold_turns turns are folded ahead of time in one
+    batch, so the summary usually already covers a turn by the time it leaves the window and the LLM is called
+    once every fold_turns turns rather than on every turn. Each summarize call gets at most fold_tokens tokens of
+    turns, so a longer backlog, e.g. after a failed call, is folded in several passes instead of one oversized
+    prompt. Every turn is counted and summarized once, so prompt size and work per turn stay flat however long
+    a session gets.
+
+    Attributes:
+        counter (TokenCounter): Token counter of the LLM.
+        summarize (callable): Called with the current summary, a list of (question, answer) turns and the session id, returns the new summary.
+        window_turns (int): Maximum number of verbatim turns.
+        history_tokens (int): Token budget of the whole history, summary included.
+        summary_tokens (int): Token budget of the summary.
+        fold_turns (int): Number of window turns folded together once the window is full.
+        fold_tokens (int): Token budget of the turns passed to one summarize call, or None for no limit.
+    """
+
+    def __init__(self, counter, summarize, window_turns=6, history_tokens=1500, summary_tokens=300, fold_turns=3, fold_tokens=None):
+        """
+        Initializes the memory.
+
+        Args:
+            counter (TokenCounter): Token counter of the LLM.
+            summarize (callable): Folds turns into a summary, see the class docstring.
+            window_turns (int, optional): Maximum number of verbatim turns. Defaults to 6.
+            history_tokens (int, optional): Token budget of the history. Defaults to 1500.
+            summary_tokens (int, optional): Token budget of the summary. Defaults to 300.
+            fold_turns (int, optional): Number of window turns folded together. Defaults to 3.
+            fold_tokens (int, optional): Token budget of the turns of one summarize call. Defaults to None (no limit).
+        """
+        self.counter = counter
+        self.summarize = summarize
+        self.window_turns = window_turns
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.fold_turns = max(1, min(fold_turns, window_turns))
+        self.fold_tokens = fold_tokens
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def history(self, session_id, turns):
+        """
+        Returns the session's history as prompt text: the summary of older turns, then the recent turns.
+
+        Args:
+            session_id (str): The unique session identifier.
+            turns (list): All (question, answer) turns of the session so far, oldest first.
+
+        Returns:
+            str: The history, within history_tokens tokens.
+        """
+        with self._lock:
+            state = self._sessions.setdefault(session_id, {"summary": "", "summarized": 0, "counts": [], "folding": None})
+            # Token counts are cached per turn, so each turn is tokenized once
+            for question, answer in turns[len(state["counts"]):]:
+                state["counts"].append(self.counter.count(format_turn(question, answer)))
+            summary, summarized = state["summary"], state["summarized"]
+
+        used = self.counter.count(summary)
+        start = len(turns)
+        while start > summarized and len(turns) - start < self.window_turns and used + state["counts"][start - 1] <= self.history_tokens:
+            start -= 1
+            used += state["counts"][start]
+
+        # Fold everything before the window, plus the oldest fold_turns window turns if the window is full
+        fold_until = min(len(turns), start + self.fold_turns) if len(turns) - start >= self.window_turns else start
+        if fold_until > summarized:
+            self._fold(session_id, state, turns, summarized, fold_until)
+
+        parts = [f"Summary of the earlier conversation: {summary}"] if summary else []
+        parts.extend(format_turn(question, answer) for question, answer in turns[start:])
+        return "\n".join(parts)
+
+    def _fold(self, session_id, state, turns, summarized, fold_until):
+        with self._lock:
+            if state["folding"] is not None:
+                return
+            state["folding"] = fold_until
+
+        def fold():
+            try:
+                done = summarized
+                while done < fold_until:
+                    batch = self._fold_batch(state, turns, done, fold_until)
+                    summary = self.counter.truncate(self.summarize(state["summary"], batch, session_id), self.summary_tokens)
+                    done += len(batch)
+                    with self._lock:
+                        state["summary"], state["summarized"] = summary, done
+            except Exception as e:
+                logger.error("Error summarizing the history of session %s: %s", session_id, e)
+            finally:
+                with self._lock:
+                    state["folding"] = None
+
+        get_executor().submit(fold)
+
+    def _fold_batch(self, state, turns, start, end):
+        """
+        Returns the turns from start on that fit in fold_tokens, at least one, shortened if it alone is over budget.
+        """
+        if self.fold_tokens is None:
+            return turns[start:end]
+        # Each turn also costs the newline joining it to the next one
+        stop, used = start, 0
+        while stop < end and (stop == start or used + state["counts"][stop] + 1 <= self.fold_tokens):
+            used += state["counts"][stop] + 1
+            stop += 1
+        if used <= self.fold_tokens:
+            return turns[start:stop]
+        question, answer = turns[start]
+        question = self.counter.truncate(question, self.fold_tokens // 2)
+        answer = self.counter.truncate(answer, self.fold_tokens - self.counter.count(format_turn(question, "")))
+        return [(question, answer)]
+
+
+def format_turn(question, answer):
+    """
+    Formats one turn of the chat history for the prompts.
+
+    Args:
+        question (str): The user's input.
+        answer (str): The AI's response.
+
+    Returns:
+        str: The formatted turn.
+    """
+    return f"User: {question}\nAI: {answer}"
+
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(repo_id=None):
+    """
+    Returns the process-wide token counter of an LLM repo, loading its tokenizer on first use.
+
+    Args:
+        repo_id (str, optional): The repo of the LLM. Defaults to the repo_id env var.
+
+    Returns:
+        TokenCounter: The shared counter.
+    """
+    repo_id = repo_id or os.getenv("repo_id")
+    with _counters_lock:
+        if repo_id not in _counters:
+            _counters[repo_id] = TokenCounter(repo_id, api_token=os.getenv("HUGGINGFACE_API_KEY"))
+        return _counters[repo_id]
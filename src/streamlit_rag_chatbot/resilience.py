@@ -0,0 +1,427 @@
+import os
+import time
+import random
+import threading
+import logging
+from collections import deque
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+import tracing
+
+# Set up logging for the LLM resilience layer
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: timeouts, rate limits and server-side errors (including a model still loading)
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an endpoint whose circuit breaker is open.
+    """
+
+
+def status_code(error):
+    """
+    Returns the HTTP status of an error raised by an HTTP client, or None.
+
+    Args:
+        error (Exception): The error.
+
+    Returns:
+        int: The status code, or None if the error carries no response.
+    """
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) or getattr(error, "status_code", None)
+
+
+def is_retryable(error):
+    """
+    Tells whether a failed call may succeed if repeated.
+
+    Rate limits, timeouts, server errors and connection failures are retryable. Client errors such as a bad
+    request, a prompt that is too long or a missing token are not, and neither is an open circuit.
+
+    Args:
+        error (Exception): The error.
+
+    Returns:
+        bool: Whether to retry.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    status = status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    # requests' connection errors and timeouts derive from OSError
+    return isinstance(error, (OSError, TimeoutError, ConnectionError))
+
+
+def retry_after(error):
+    """
+    Returns the delay requested by a Retry-After header of an error's response, in seconds, or None.
+
+    Args:
+        error (Exception): The error.
+
+    Returns:
+        float: The requested delay, or None.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker shared by every caller of one endpoint.
+
+    After failure_threshold consecutive retryable failures the circuit opens and calls fail fast for
+    recovery_timeout seconds. Then a single trial call is let through (half-open): its success closes the
+    circuit, its failure opens it again.
+
+    Attributes:
+        name (str): The endpoint the breaker protects.
+        failure_threshold (int): Consecutive failures that open the circuit.
+        recovery_timeout (float): Seconds the circuit stays open before a trial call.
+    """
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30.0):
+        """
+        Initializes a closed breaker.
+
+        Args:
+            name (str): The endpoint the breaker protects.
+            failure_threshold (int, optional): Consecutive failures that open the circuit. Defaults to 5.
+            recovery_timeout (float, optional): Seconds before a trial call. Defaults to 30.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """
+        Returns "closed", "open" or "half_open".
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self._opened_at >= self.recovery_timeout else "open"
+
+    def allow(self):
+        """
+        Tells whether a call may go to the endpoint now, reserving the trial call when half-open.
+
+        Returns:
+            bool: Whether to call the endpoint.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.recovery_timeout or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def retry_in(self):
+        """
+        Returns the seconds until the next trial call, 0 if the circuit is not open.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        """
+        Records a successful call, closing the circuit.
+        """
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("Circuit for %s closed", self.name)
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def release(self):
+        """
+        Ends a half-open trial call that finished without telling whether the endpoint is up.
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        """
+        Records a retryable failure, opening the circuit once the threshold is reached or if a trial call failed.
+        """
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or (self._opened_at is None and self._failures >= self.failure_threshold):
+                logger.warning("Circuit for %s opened after %d failures", self.name, self._failures)
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class LatencyTracker:
+    """
+    Keeps the latencies of the last window successful calls to compute percentiles.
+
+    Attributes:
+        window (int): Number of latencies kept.
+        min_samples (int): Number of latencies needed before percentiles are reported.
+    """
+
+    def __init__(self, window=200, min_samples=20):
+        self.window = window
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        """
+        Records the latency of a call.
+
+        Args:
+            seconds (float): The latency.
+        """
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def percentile(self, percent):
+        """
+        Returns a percentile of the recorded latencies, or None if there are fewer than min_samples.
+
+        Args:
+            percent (float): The percentile, e.g. 95.
+
+        Returns:
+            float: The latency in seconds, or None.
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100))]
+
+
+class ResilientLLM:
+    """
+    Calls an LLM endpoint with retries, a shared circuit breaker and optional hedging to a fallback endpoint.
+
+    Only retryable errors are retried, after an exponential backoff with full jitter, or after the delay
+    requested by a Retry-After header. While the breaker is open, calls go to the fallback if there is one and
+    fail fast with CircuitOpenError otherwise. With hedging, a call that has not answered within the latency
+    budget (the primary's recent p95 unless a fixed budget is given) is also sent to the fallback, and the first
+    answer wins. Streams are retried only before their first token and are never hedged.
+
+    Attributes:
+        primary: The LLM endpoint, with invoke and stream methods.
+        fallback: A second endpoint, e.g. a smaller model, or None.
+        breaker (CircuitBreaker): The primary's breaker, shared across sessions.
+        latency (LatencyTracker): The primary's recent latencies, shared across sessions.
+        max_attempts (int): Attempts per call, the first one included.
+        base_delay (float): Backoff before the second attempt, doubled for every further attempt.
+        max_delay (float): Upper bound of a backoff or Retry-After delay.
+        hedge (bool): Whether to hedge slow calls to the fallback.
+        latency_budget (float): Fixed hedging budget in seconds, or None to use the primary's p95.
+    """
+
+    _hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+    def __init__(self, primary, fallback=None, breaker=None, latency=None, max_attempts=4, base_delay=0.5, max_delay=20.0, hedge=False, latency_budget=None):
+        """
+        Initializes the wrapper.
+
+        Args:
+            primary: The LLM endpoint.
+            fallback (optional): The fallback endpoint. Defaults to None.
+            breaker (CircuitBreaker, optional): The primary's breaker. Defaults to a private one.
+            latency (LatencyTracker, optional): The primary's latency tracker. Defaults to a private one.
+            max_attempts (int, optional): Attempts per call. Defaults to 4.
+            base_delay (float, optional): First backoff in seconds. Defaults to 0.5.
+            max_delay (float, optional): Longest backoff in seconds. Defaults to 20.
+            hedge (bool, optional): Whether to hedge slow calls to the fallback. Defaults to False.
+            latency_budget (float, optional): Fixed hedging budget in seconds. Defaults to None (p95).
+        """
+        self.primary = primary
+        self.fallback = fallback
+        self.breaker = breaker or CircuitBreaker("llm")
+        self.latency = latency or LatencyTracker()
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge and fallback is not None
+        self.latency_budget = latency_budget
+
+    def invoke(self, prompt):
+        """
+        Returns the LLM's answer to a prompt.
+
+        Args:
+            prompt (str): The prompt.
+
+        Returns:
+            str: The answer.
+
+        Raises:
+            CircuitOpenError: If the primary is down and there is no fallback.
+            Exception: The last error if the call did not succeed.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return self._invoke_once(prompt)
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_attempts:
+                    raise
+                self._backoff(attempt, e)
+
+    def stream(self, prompt):
+        """
+        Streams the LLM's answer to a prompt, retrying only until the first token.
+
+        Args:
+            prompt (str): The prompt.
+
+        Yields:
+            str: Chunks of the answer.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            llm = self._endpoint()
+            yielded = False
+            settled = False
+            started = time.perf_counter()
+            try:
+                for chunk in llm.stream(prompt):
+                    yielded = True
+                    yield chunk
+                if llm is self.primary:
+                    self.breaker.record_success()
+                    self.latency.add(time.perf_counter() - started)
+                settled = True
+                return
+            except Exception as e:
+                if llm is self.primary:
+                    # As for invoke, a non-retryable error still means the endpoint answered
+                    if is_retryable(e):
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+                settled = True
+                if yielded or not is_retryable(e) or attempt == self.max_attempts:
+                    raise
+                self._backoff(attempt, e)
+            finally:
+                if llm is self.primary and not settled:
+                    # The consumer stopped reading, e.g. on a Streamlit rerun: free a half-open trial
+                    self.breaker.release()
+
+    def _endpoint(self):
+        if self.breaker.allow():
+            return self.primary
+        if self.fallback is not None:
+            return self.fallback
+        raise CircuitOpenError(f"LLM endpoint unavailable, retrying in {self.breaker.retry_in():.0f}s")
+
+    def _invoke_once(self, prompt):
+        llm = self._endpoint()
+        if llm is not self.primary:
+            return llm.invoke(prompt)
+
+        budget = (self.latency_budget or self.latency.percentile(95)) if self.hedge else None
+        if budget is None:
+            return self._invoke_primary(prompt)
+
+        primary = self._hedge_executor.submit(self._invoke_primary, prompt)
+        try:
+            return primary.result(timeout=budget)
+        except FutureTimeout:
+            pass
+
+        logger.info("LLM call exceeded its %.1fs latency budget, hedging to the fallback", budget)
+        hedged = self._hedge_executor.submit(self.fallback.invoke, prompt)
+        pending = {primary, hedged}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+        return primary.result()
+
+    def _invoke_primary(self, prompt):
+        started = time.perf_counter()
+        try:
+            response = self.primary.invoke(prompt)
+        except Exception as e:
+            if is_retryable(e):
+                self.breaker.record_failure()
+            else:
+                # The endpoint answered, so it is up; release a half-open trial
+                self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        self.latency.add(time.perf_counter() - started)
+        return response
+
+    def _backoff(self, attempt, error):
+        requested = retry_after(error)
+        delay = min(self.max_delay, requested) if requested is not None else random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        logger.warning("LLM call failed (attempt %d), retrying in %.2fs: %s", attempt, delay, error)
+        tracing.note_retry()
+        time.sleep(delay)
+
+
+_breakers = {}
+_trackers = {}
+_lock = threading.Lock()
+
+
+def get_circuit_breaker(name):
+    """
+    Returns the process-wide circuit breaker of an endpoint.
+
+    Configured by LLM_BREAKER_THRESHOLD and LLM_BREAKER_RECOVERY (seconds).
+
+    Args:
+        name (str): The endpoint, e.g. its repo_id.
+
+    Returns:
+        CircuitBreaker: The shared breaker.
+    """
+    with _lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+                recovery_timeout=float(os.getenv("LLM_BREAKER_RECOVERY", "30"))
+            )
+        return _breakers[name]
+
+
+def get_latency_tracker(name):
+    """
+    Returns the process-wide latency tracker of an endpoint.
+
+    Args:
+        name (str): The endpoint, e.g. its repo_id.
+
+    Returns:
+        LatencyTracker: The shared tracker.
+    """
+    with _lock:
+        if name not in _trackers:
+            _trackers[name] = LatencyTracker()
+        return _trackers[name]
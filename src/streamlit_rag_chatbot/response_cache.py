@@ -0,0 +1,190 @@
+import os
+import time
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+import numpy as np
+
+# Set up logging for the response cache
+logger = logging.getLogger(__name__)
+
+# File touched by the ingestion script whenever the transcripts index changes, so every process can drop its answers
+TRANSCRIPTS_STAMP_PATH = os.getenv("TRANSCRIPTS_STAMP_PATH", os.path.join(tempfile.gettempdir(), "eer-transcripts-pdfs.stamp"))
+
+
+class SemanticResponseCache:
+    """
+    A cache of source data answers keyed on the similarity of the question embeddings.
+
+    A question whose embedding has a cosine similarity of at least threshold with an earlier question reuses that
+    question's retrieved documents and answer. Entries expire after ttl seconds, the least recently used ones are
+    evicted beyond max_entries, and every entry is dropped when the transcripts stamp file changes.
+
+    Attributes:
+        threshold (float): Minimum cosine similarity for a hit.
+        ttl (float): Seconds an answer is served.
+        max_entries (int): Maximum number of cached answers.
+        stamp_path (str): File whose modification time signals that the transcripts index was re-ingested.
+        hits (int): Number of questions answered from the cache.
+        misses (int): Number of questions that were not.
+        saved_seconds (float): Retrieval and generation time spent originally on the answers served from the cache.
+    """
+
+    def __init__(self, threshold=0.95, ttl=86400, max_entries=1000, stamp_path=TRANSCRIPTS_STAMP_PATH):
+        """
+        Initializes the cache.
+
+        Args:
+            threshold (float, optional): Minimum cosine similarity for a hit. Defaults to 0.95.
+            ttl (float, optional): Seconds an answer is served. Defaults to 86400.
+            max_entries (int, optional): Maximum number of cached answers. Defaults to 1000.
+            stamp_path (str, optional): Path of the transcripts stamp file. Defaults to TRANSCRIPTS_STAMP_PATH.
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stamp_path = stamp_path
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+        self._entries = OrderedDict()
+        self._next_key = 0
+        self._keys = []
+        self._matrix = None
+        self._lock = threading.Lock()
+        self._stamp = self._read_stamp()
+
+    def lookup(self, vector):
+        """
+        Returns the cached answer of the most similar earlier question, if it is similar enough.
+
+        Args:
+            vector (list): The embedding of the question.
+
+        Returns:
+            dict: The entry (query, source_data, response, score), or None on a miss.
+        """
+        self._check_stamp()
+        query = _unit(vector)
+
+        with self._lock:
+            self._expire()
+            if self._entries:
+                if self._matrix is None:
+                    self._keys = list(self._entries)
+                    self._matrix = np.stack([self._entries[key]["vector"] for key in self._keys])
+                scores = self._matrix @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key = self._keys[best]
+                    entry = self._entries[key]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.saved_seconds += entry["seconds"]
+                    return {"query": entry["query"], "source_data": entry["source_data"], "response": entry["response"], "score": float(scores[best])}
+            self.misses += 1
+            return None
+
+    def store(self, query, vector, source_data, response, seconds):
+        """
+        Caches the answer to a question.
+
+        Args:
+            query (str): The question.
+            vector (list): The embedding of the question.
+            source_data (list): The documents the answer was based on.
+            response (str): The answer.
+            seconds (float): The time it took to retrieve the documents and generate the answer.
+        """
+        with self._lock:
+            self._entries[self._next_key] = {
+                "query": query,
+                "vector": _unit(vector),
+                "source_data": source_data,
+                "response": response,
+                "seconds": seconds,
+                "created": time.monotonic()
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def invalidate(self):
+        """
+        Drops every cached answer.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: Hits, misses, hit rate, seconds saved and current size.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "saved_seconds": self.saved_seconds,
+                "size": len(self._entries)
+            }
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        expired = [key for key, entry in self._entries.items() if entry["created"] < cutoff]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def _read_stamp(self):
+        try:
+            return os.stat(self.stamp_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _check_stamp(self):
+        stamp = self._read_stamp()
+        if stamp != self._stamp:
+            logger.info("Transcripts were re-ingested, invalidating the response cache")
+            self._stamp = stamp
+            self.invalidate()
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Returns the process-wide response cache, or None if RESPONSE_CACHE_SIZE is 0.
+
+    Configured by RESPONSE_CACHE_SIZE, RESPONSE_CACHE_THRESHOLD and RESPONSE_CACHE_TTL (seconds).
+
+    Returns:
+        SemanticResponseCache: The shared cache.
+    """
+    global _response_cache
+    with _response_cache_lock:
+        max_entries = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+        if _response_cache is None and max_entries > 0:
+            _response_cache = SemanticResponseCache(
+                threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95")),
+                ttl=float(os.getenv("RESPONSE_CACHE_TTL", "86400")),
+                max_entries=max_entries
+            )
+        return _response_cache
@@ -1,8 +1,11 @@
+import os
 import streamlit as st
 import logging  # Import logging
 from langchain_community.chat_message_histories import StreamlitChatMessageHistory
 import uuid
 from main import chatbot
+from embedding_service import get_embedding_service
+from summaries import get_summary_index
 import streamlit_nested_layout
 
 # Set up logging
@@ -24,11 +27,32 @@ if "messages" not in st.session_state:
 if "first_question" not in st.session_state:
     st.session_state.first_question = ""
 
+# Load the embedding model once per process and share it across all sessions
+@st.cache_resource
+def load_embeddings():
+    return get_embedding_service()
+
+# Warm the local meeting summary index once per process
+@st.cache_resource
+def load_summary_index():
+    summary_index = get_summary_index()
+    try:
+        summary_index.warm()
+    except Exception as e:
+        logger.error(f"Error warming summary index: {e}")
+    return summary_index
+
+# Pick up newly upserted summaries at most once per refresh interval
+try:
+    load_summary_index().maybe_refresh()
+except Exception as e:
+    logger.error(f"Error refreshing summary index: {e}")
+
 # Functiion to initialize the chatbot
 def initialize_bot():
     try:
         if "bot" not in st.session_state or st.session_state.bot is None:
-            st.session_state.bot = chatbot()
+            st.session_state.bot = chatbot(embeddings=load_embeddings())
     except Exception as e:
         st.error(f"Error initializing bot: {e}")
         logger.error(f"Error initializing bot: {e}")
@@ -61,28 +85,27 @@ def ask_name():
 if st.session_state.user_name is None:
     ask_name()
 
-# Function to generate a response from the AI
-def generate_response(input_text):
+# Function to collect the answered (question, answer) turns of this session; the bot keeps them within its prompt budget
+def build_chat_history():
+    turns, question = [], None
+    for msg in st.session_state.chat_data:
+        if msg.get('type') == 'user':
+            question = msg.get('input_text', '')
+        elif msg.get('type') == 'ai' and question is not None:
+            turns.append((question, msg.get('ai_output', '')))
+            question = None
+    return turns
+
+# Function to start a streamed response from the AI
+def stream_response(input_text):
     bot = st.session_state.get("bot")
-    chat_history = "\n".join([
-        f"User: {msg.get('input_text', '')}\nAI: {msg.get('ai_output', '')}"
-        for msg in st.session_state.chat_data
-        if msg.get('type') == 'ai' or msg.get('type') == 'user'
-    ])
-    try:
-        result = bot.pipeline(user_input=input_text, user_name=st.session_state.user_name, session_id=st.session_state.session_id, chat_history=chat_history)
-        logger.info(f"AI Response: {result.get('ai_output', 'No answer generated')}")
-        return result
-    except Exception as e:
-        st.error(f"Error generating response: {e}")
-        logger.error(f"Error generating response: {e}")
-        return {}
-  
+    return bot.pipeline_stream(user_input=input_text, user_name=st.session_state.user_name, session_id=st.session_state.session_id, chat_history=build_chat_history(), mode=os.getenv("PIPELINE_MODE", "standard"))
+
 def query_meeting_summary(datestamp):
     
     bot = st.session_state.get("bot")
     
-    # Query summaries from the bot
+    # Query summaries from the bot, served from the shared summary index unless stale or invalidated
     result = bot.query_summaries(datestamp)
 
     # Extract details safely from metadata
@@ -115,31 +138,15 @@ with st.expander("Fetch a meeting summary", expanded=False):
     
     datestamp = st.selectbox(
         "Select a date to fetch the meeting summary",
-        ("2024-12-10","2024-11-24", "2024-11-19", "2024-11-12", "2024-10-29", "2024-10-24",
-         "2024-10-15", "2024-10-01", "2024-09-24", "2024-09-17", "2024-09-10",
-        "2024-08-22", "2024-08-15", "2024-08-06", "2024-06-25", "2024-06-11",
-        "2024-05-28", "2024-05-21", "2024-05-07", "2024-04-30", "2024-04-23",
-        "2024-04-09", "2024-03-26", "2024-03-19", "2024-03-12", "2024-03-05",
-        "2024-02-27", "2024-01-30", "2024-01-25", "2024-01-24", "2024-01-18",
-        "2024-01-11", "2023-12-07", "2023-11-30", "2023-11-23", "2023-10-19",
-        "2023-10-05", "2023-09-28", "2023-09-21", "2023-08-31", "2023-08-24",
-        "2023-08-17", "2023-08-10", "2023-06-29", "2023-06-22", "2023-06-15",
-        "2023-06-08", "2023-06-01", "2023-05-25", "2023-05-04", "2023-04-27",
-        "2023-04-20", "2023-04-13", "2023-03-23", "2023-03-16", "2023-02-02",
-        "2023-01-19", "2023-01-05", "2022-12-16", "2022-12-08", "2022-12-01",
-        "2022-11-24", "2022-11-17", "2022-11-10", "2022-10-20", "2022-10-13",
-        "2022-09-29", "2022-09-08", "2022-09-01", "2022-08-25", "2022-06-30",
-        "2022-05-05", "2022-04-21", "2022-04-11", "2022-03-24", "2022-03-10",
-        "2022-02-24", "2022-02-10", "2022-02-02", "2022-01-20", "2022-01-13",
-        "2022-01-04", "2021-12-09", "2021-12-02", "2021-11-25", "2021-11-18",
-        "2021-11-11", "2021-11-04", "2021-09-30", "2021-09-23", "2021-09-03",
-        "2021-08-13", "2021-06-25", "2021-06-18", "2021-06-11", "2021-06-04",
-        "2021-05-28")
+        load_summary_index().dates(),
+        index=None,
+        placeholder="Choose a meeting date"
         )
 
-    # Fetch the summary
-    summary = query_meeting_summary(datestamp)
-    st.info(summary, icon="📄")
+    # Fetch the summary only once a date has been chosen
+    if datestamp:
+        summary = query_meeting_summary(datestamp)
+        st.info(summary, icon="📄")
 
 chat_container = st.container()
 
@@ -169,10 +176,11 @@ with chat_container:
                                     st.markdown(f"**Source:** {metadata.get('source', 'Unknown source')}")
                                     st.markdown(f"**Content:** {doc.page_content}")
                                     st.markdown(f"**Page:** {metadata.get('page', 'Unknown page')}")
-                            with st.expander(f"Meeting Transcript {idx} - {metadata.get('speaker_name', 'Unknown Speaker')}"):
-                                st.markdown(f"**Content:** {doc.page_content}")
-                                st.markdown(f"**Speaker Name:** {metadata.get('speaker_name', 'Unknown Speaker')}")
-                                st.markdown(f"**Date:** {metadata.get('date_time', 'Unknown date')}")
+                            else:
+                                with st.expander(f"Meeting Transcript {idx} - {metadata.get('speaker_name', 'Unknown Speaker')}"):
+                                    st.markdown(f"**Content:** {doc.page_content}")
+                                    st.markdown(f"**Speaker Name:** {metadata.get('speaker_name', 'Unknown Speaker')}")
+                                    st.markdown(f"**Date:** {metadata.get('date_time', 'Unknown date')}")
                     with st.expander("Past conversations with this chatbot related to this topic", expanded=False):
                         for idx, doc in enumerate(past_chat_context, 1):
                             with st.expander(f"User question: _\"{doc.metadata.get('user_question')}\"_", expanded=False):
@@ -195,8 +203,18 @@ if input_text:
         with chat_container.chat_message("user"):
             st.write(input_text)
 
-        with st.spinner("Thinking..."):
-            result = generate_response(input_text)
+        with chat_container.chat_message("ai"):
+            # Stream the source data answer first, then the related conversations as a second phase
+            turn = stream_response(input_text)
+            with st.spinner("Thinking..."):
+                st.write_stream(turn.stream_sourcedata())
+            st.write("**Related Conversations with this chatbot**")
+            st.write_stream(turn.stream_conversation())
+
+            result = turn.finish()
+            logger.info(f"AI Response: {result.get('ai_output', 'No answer generated')}")
+            if st.session_state.bot.response_cache is not None:
+                logger.info(f"Response cache hit: {result.get('cache_hit')}, stats: {st.session_state.bot.response_cache.stats()}")
             ai_output = result.get("ai_output", "No answer generated")
             source_data = result.get("source_data", [])
             past_chat_context = result.get("past_chat_context", [])
@@ -208,28 +226,26 @@ if input_text:
                 "past_chat_context": past_chat_context
             })
 
-            with chat_container.chat_message("ai"):
-                st.write(ai_output)
-                with st.expander("Referenced data", expanded=False):
-                    with st.expander("Transcripts and documents", expanded=False):
-                        for idx, doc in enumerate(source_data, start=1):
-                            metadata = doc.metadata
-                            if metadata.get("page") is not None:
-                                with st.expander(f"PDF Document {idx}: Page {metadata['page']}"):
-                                    st.markdown(f"**Source:** {metadata.get('source', 'Unknown source')}")
-                                    st.markdown(f"**Content:** {doc.page_content}")
-                                    st.markdown(f"**Page:** {metadata.get('page', 'Unknown page')}")
-                            else:
-                                with st.expander(f"EER Meeting: {metadata.get('date_time', 'Unknown date')}, {metadata.get('speaker_name', 'Unknown Speaker')}"):
-                                    st.markdown(f"**Content:** {doc.page_content}")
-                                    st.markdown(f"**Speaker Name:** {metadata.get('speaker_name', 'Unknown Speaker')}")
-                                    st.markdown(f"**Date:** {metadata.get('date_time', 'Unknown date')}")
-                    with st.expander("Past conversations with this chatbot related to this topic", expanded=False):
-                        for idx, doc in enumerate(past_chat_context, 1):
-                            with st.expander(f"User question: _\"{doc.metadata.get('user_question')}\"_", expanded=False):
-                                st.markdown(f"**User name:** {doc.metadata.get('user_name', 'Unknown user name')}")
-                                st.markdown(f"**AI Response:** {doc.metadata.get('ai_output')}")
-                                st.markdown(f"**Date:** {doc.metadata.get('date', 'Unknown date')}")
+            with st.expander("Referenced data", expanded=False):
+                with st.expander("Transcripts and documents", expanded=False):
+                    for idx, doc in enumerate(source_data, start=1):
+                        metadata = doc.metadata
+                        if metadata.get("page") is not None:
+                            with st.expander(f"PDF Document {idx}: Page {metadata['page']}"):
+                                st.markdown(f"**Source:** {metadata.get('source', 'Unknown source')}")
+                                st.markdown(f"**Content:** {doc.page_content}")
+                                st.markdown(f"**Page:** {metadata.get('page', 'Unknown page')}")
+                        else:
+                            with st.expander(f"EER Meeting: {metadata.get('date_time', 'Unknown date')}, {metadata.get('speaker_name', 'Unknown Speaker')}"):
+                                st.markdown(f"**Content:** {doc.page_content}")
+                                st.markdown(f"**Speaker Name:** {metadata.get('speaker_name', 'Unknown Speaker')}")
+                                st.markdown(f"**Date:** {metadata.get('date_time', 'Unknown date')}")
+                with st.expander("Past conversations with this chatbot related to this topic", expanded=False):
+                    for idx, doc in enumerate(past_chat_context, 1):
+                        with st.expander(f"User question: _\"{doc.metadata.get('user_question')}\"_", expanded=False):
+                            st.markdown(f"**User name:** {doc.metadata.get('user_name', 'Unknown user name')}")
+                            st.markdown(f"**AI Response:** {doc.metadata.get('ai_output')}")
+                            st.markdown(f"**Date:** {doc.metadata.get('date', 'Unknown date')}")
     except Exception as e:
         st.error(f"Error generating response: {e}")
         logger.error(f"Error during input handling: {e}")
\ No newline at end of file
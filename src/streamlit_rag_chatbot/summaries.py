@@ -0,0 +1,269 @@
+import os
+import re
+import time
+import tempfile
+import bisect
+import threading
+import logging
+from datetime import datetime
+from vector_backends import get_backend
+
+# Set up logging for the summary index
+logger = logging.getLogger(__name__)
+
+# File touched by TranscriptProcessor whenever it upserts summaries, so every process can invalidate its cache
+SUMMARIES_STAMP_PATH = os.getenv("SUMMARIES_STAMP_PATH", os.path.join(tempfile.gettempdir(), "eer-meetings-summaries.stamp"))
+
+
+class SummaryIndex:
+    """
+    A local date to summary index and meeting date catalog over the meeting summaries vector index.
+
+    Summaries are upserted with the meeting's unix date as vector id, so a single summary is fetched by id rather
+    than scanned for. The local index is warmed by listing all ids once and refreshed by fetching only unseen ids.
+    Entries expire after ttl seconds, and the whole index is dropped when the summaries stamp file changes.
+
+    Attributes:
+        index_name (str): The name of the summaries index.
+        backend (VectorBackend): Vector backend holding the summaries index.
+        dimension (int): Dimension of the summary vectors, used for the metadata filter fallback query.
+        refresh_interval (float): Minimum seconds between incremental refreshes triggered by maybe_refresh.
+        ttl (float): Seconds a cached summary is served before it is fetched again.
+        stamp_path (str): File whose modification time signals that summaries were upserted.
+    """
+
+    def __init__(self, index_name="eer-meetings-summaries", backend=None, dimension=768, refresh_interval=300, ttl=3600, stamp_path=SUMMARIES_STAMP_PATH):
+        """
+        Initializes an empty summary index.
+
+        Args:
+            index_name (str, optional): The name of the summaries index. Defaults to "eer-meetings-summaries".
+            backend (VectorBackend, optional): Vector backend holding the index. Defaults to the shared backend.
+            dimension (int, optional): Dimension of the summary vectors. Defaults to 768.
+            refresh_interval (float, optional): Minimum seconds between refreshes. Defaults to 300.
+            ttl (float, optional): Seconds a cached summary stays valid. Defaults to 3600.
+            stamp_path (str, optional): Path of the summaries stamp file. Defaults to SUMMARIES_STAMP_PATH.
+        """
+        self.index_name = index_name
+        self.backend = backend or get_backend()
+        self.dimension = dimension
+        self.refresh_interval = refresh_interval
+        self.ttl = ttl
+        self.stamp_path = stamp_path
+
+        self._lock = threading.RLock()
+        self._by_date = {}
+        self._sorted_dates = None
+        self._loaded_at = {}
+        self._ids = set()
+        self._last_refresh = None
+        self._stamp = self._read_stamp()
+
+    def warm(self):
+        """
+        Loads every summary into the local index.
+
+        Returns:
+            int: The number of summaries held locally.
+        """
+        self.refresh()
+        return len(self._by_date)
+
+    def refresh(self):
+        """
+        Lists the ids in the summaries index and fetches the summaries not yet held locally.
+
+        Returns:
+            int: The number of newly loaded summaries.
+        """
+        self._check_stamp()
+        try:
+            new_ids = [vector_id for vector_id in self.backend.list_ids(self.index_name) if vector_id not in self._ids]
+        except Exception as e:
+            # Listing ids is only supported on serverless indexes, so enumerate pod indexes with one wide query
+            logger.warning("Could not list summary ids, enumerating with a metadata query instead: %s", e)
+            return self._refresh_by_query()
+
+        for vector in self.backend.fetch(self.index_name, new_ids):
+            self._remember(vector["id"], vector["metadata"])
+
+        self._last_refresh = time.monotonic()
+        if new_ids:
+            logger.info("Loaded %d new meeting summaries", len(new_ids))
+        return len(new_ids)
+
+    def maybe_refresh(self):
+        """
+        Refreshes the local index if the refresh interval has passed.
+        """
+        self._check_stamp()
+        if self._last_refresh is None or time.monotonic() - self._last_refresh > self.refresh_interval:
+            self.refresh()
+
+    def get(self, date):
+        """
+        Returns the summary metadata for a meeting date.
+
+        Args:
+            date (str): The meeting date in YYYY-MM-DD format.
+
+        Returns:
+            dict: The summary metadata, or None if there is no summary for that date.
+        """
+        self._check_stamp()
+        with self._lock:
+            metadata = self._by_date.get(date)
+            fresh = time.monotonic() - self._loaded_at.get(date, 0) < self.ttl
+        if metadata is not None and fresh:
+            return metadata
+
+        vector_id, metadata = self._lookup(date)
+        if metadata is not None:
+            self._remember(vector_id, metadata)
+        return metadata
+
+    def dates(self, start=None, end=None):
+        """
+        Returns the meeting dates held locally, newest first, optionally limited to a date range.
+
+        Args:
+            start (str, optional): Earliest date to include, in YYYY-MM-DD format. Defaults to None (no lower bound).
+            end (str, optional): Latest date to include, in YYYY-MM-DD format. Defaults to None (no upper bound).
+
+        Returns:
+            list: Meeting dates in YYYY-MM-DD format.
+        """
+        with self._lock:
+            if self._sorted_dates is None:
+                self._sorted_dates = sorted(self._by_date)
+            sorted_dates = self._sorted_dates
+
+        lo = bisect.bisect_left(sorted_dates, start) if start else 0
+        hi = bisect.bisect_right(sorted_dates, end) if end else len(sorted_dates)
+        return sorted_dates[lo:hi][::-1]
+
+    def date_filter(self, start=None, end=None):
+        """
+        Builds a Pinecone metadata filter matching documents from meetings in a date range.
+
+        Chunks upserted before transcript chunks got a "date" field match too, since the filter cannot tell their
+        meeting; callers narrow those down with meeting_date.
+
+        Args:
+            start (str, optional): Earliest date to include, in YYYY-MM-DD format. Defaults to None.
+            end (str, optional): Latest date to include, in YYYY-MM-DD format. Defaults to None.
+
+        Returns:
+            dict: A filter on the "date" metadata field.
+        """
+        self.maybe_refresh()
+        return {"$or": [{"date": {"$in": self.dates(start, end)}}, {"date": {"$exists": False}}]}
+
+    def invalidate(self, date=None):
+        """
+        Drops one cached summary, or all of them so the next refresh reloads the index.
+
+        Args:
+            date (str, optional): The meeting date to drop. Defaults to None (drop everything).
+        """
+        with self._lock:
+            self._sorted_dates = None
+            if date is None:
+                self._by_date.clear()
+                self._loaded_at.clear()
+                self._ids.clear()
+                self._last_refresh = None
+            else:
+                self._by_date.pop(date, None)
+                self._loaded_at.pop(date, None)
+
+    def add(self, vector_id, metadata):
+        """
+        Adds or replaces a summary in the local index, e.g. right after it was upserted.
+
+        Args:
+            vector_id (str): The id of the summary vector.
+            metadata (dict): The summary metadata.
+        """
+        self._remember(vector_id, metadata)
+
+    def _remember(self, vector_id, metadata):
+        if not metadata or "date" not in metadata:
+            return
+        with self._lock:
+            if metadata["date"] not in self._by_date:
+                self._sorted_dates = None
+            self._by_date[metadata["date"]] = dict(metadata)
+            self._loaded_at[metadata["date"]] = time.monotonic()
+            self._ids.add(vector_id)
+
+    def _refresh_by_query(self):
+        matches = self.backend.query(self.index_name, [1.0] * self.dimension, k=1000)
+        new_matches = [(vector_id, metadata) for vector_id, _, metadata in matches if vector_id not in self._ids]
+        for vector_id, metadata in new_matches:
+            self._remember(vector_id, metadata)
+        self._last_refresh = time.monotonic()
+        return len(new_matches)
+
+    def _read_stamp(self):
+        try:
+            return os.stat(self.stamp_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _check_stamp(self):
+        stamp = self._read_stamp()
+        if stamp != self._stamp:
+            logger.info("Meeting summaries were updated, invalidating the summary cache")
+            self._stamp = stamp
+            self.invalidate()
+
+    def _lookup(self, date):
+        # Summaries are stored under their unix date, as in TranscriptProcessor.upsert_summaries_to_pinecone
+        try:
+            vector_id = str(int(time.mktime(datetime.strptime(date, "%Y-%m-%d").timetuple())))
+        except ValueError:
+            return None, None
+        for vector in self.backend.fetch(self.index_name, [vector_id]):
+            if vector["metadata"].get("date") == date:
+                return vector_id, vector["metadata"]
+
+        # The id depends on the upserting machine's timezone, so fall back to an exact metadata filter
+        for match_id, _, metadata in self.backend.query(self.index_name, [1.0] * self.dimension, k=1, filter={"date": {"$eq": date}}):
+            return match_id, metadata
+        return None, None
+
+
+def meeting_date(metadata):
+    """
+    Returns the meeting date of a document, from its "date" field or, for older transcript chunks, the date its
+    source transcript's file name starts with.
+
+    Args:
+        metadata (dict): The document's metadata.
+
+    Returns:
+        str: The meeting date in YYYY-MM-DD format, or None for documents not from a meeting, e.g. PDF pages.
+    """
+    if metadata.get("date"):
+        return metadata["date"]
+    match = re.match(r"\d{4}-\d{2}-\d{2}", os.path.basename(str(metadata.get("source", ""))))
+    return match.group(0) if match else None
+
+
+_summary_index = None
+_summary_index_lock = threading.Lock()
+
+
+def get_summary_index():
+    """
+    Returns the process-wide summary index.
+
+    Returns:
+        SummaryIndex: The shared summary index.
+    """
+    global _summary_index
+    with _summary_index_lock:
+        if _summary_index is None:
+            _summary_index = SummaryIndex()
+        return _summary_index
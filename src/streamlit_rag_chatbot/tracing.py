@@ -0,0 +1,507 @@
+import os
+import json
+import time
+import random
+import threading
+import logging
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Set up logging for tracing
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Span:
+    """
+    One timed stage of a trace.
+
+    Attributes:
+        name (str): The stage name.
+        offset (float): Seconds since the start of the trace.
+        duration (float): Seconds the stage took, set when it ends.
+        attrs (dict): Attributes such as token counts, retry counts and cache hit flags.
+    """
+
+    __slots__ = ("name", "offset", "duration", "attrs")
+
+    def __init__(self, name, offset, attrs):
+        self.name = name
+        self.offset = offset
+        self.duration = None
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        """
+        Sets attributes of the span.
+
+        Args:
+            **attrs: The attributes.
+        """
+        self.attrs.update(attrs)
+
+    def add(self, key, amount=1):
+        """
+        Increments a numeric attribute of the span.
+
+        Args:
+            key (str): The attribute.
+            amount (int, optional): The increment. Defaults to 1.
+        """
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+
+class Trace:
+    """
+    The spans of one pipeline turn.
+
+    Spans may be opened from several threads; each thread keeps its own stack of open spans, so retries are
+    attributed to the innermost span of the thread they happen in.
+
+    Attributes:
+        name (str): The trace name.
+        attrs (dict): Attributes of the whole trace.
+        spans (list): The finished spans.
+        duration (float): Seconds the trace took, set by finish.
+    """
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.spans = []
+        self.duration = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """
+        Times a block as a span.
+
+        Args:
+            name (str): The stage name.
+            **attrs: Initial attributes of the span.
+
+        Yields:
+            Span: The span, to add attributes to.
+        """
+        span = self.start_span(name, **attrs)
+        try:
+            yield span
+        finally:
+            self.end_span(span)
+
+    def start_span(self, name, **attrs):
+        """
+        Opens a span that is ended explicitly with end_span, e.g. around a stream.
+
+        Args:
+            name (str): The stage name.
+            **attrs: Initial attributes of the span.
+
+        Returns:
+            Span: The open span.
+        """
+        span = Span(name, time.perf_counter() - self._start, attrs)
+        self._stack().append(span)
+        return span
+
+    def end_span(self, span):
+        """
+        Ends a span opened with start_span.
+
+        Args:
+            span (Span): The span.
+        """
+        span.duration = time.perf_counter() - self._start - span.offset
+        stack = self._stack()
+        if span in stack:
+            stack.remove(span)
+        with self._lock:
+            self.spans.append(span)
+
+    def current_span(self):
+        """
+        Returns the innermost open span of the calling thread, or None.
+        """
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def finish(self, **attrs):
+        """
+        Ends the trace and hands it to the tracer.
+
+        Args:
+            **attrs: Final attributes of the trace.
+        """
+        self.attrs.update(attrs)
+        self.duration = time.perf_counter() - self._start
+        self.tracer.record(self)
+
+    def to_dict(self):
+        """
+        Returns the trace as a JSON-serializable dict.
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.offset)
+        return {
+            "trace": self.name,
+            "time": time.time(),
+            "duration": self.duration,
+            "attrs": self.attrs,
+            "spans": [{"name": span.name, "offset": round(span.offset, 6), "duration": round(span.duration, 6), **span.attrs} for span in spans]
+        }
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+
+class _NoopSpan:
+    def set(self, **attrs):
+        pass
+
+    def add(self, key, amount=1):
+        pass
+
+
+class _NoopTrace:
+    """
+    The trace handed out when tracing is off: every method does nothing.
+    """
+
+    _span = _NoopSpan()
+    name = None
+    duration = None
+    spans = ()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        yield self._span
+
+    def start_span(self, name, **attrs):
+        return self._span
+
+    def end_span(self, span):
+        pass
+
+    def current_span(self):
+        return None
+
+    def finish(self, **attrs):
+        pass
+
+
+NOOP_TRACE = _NoopTrace()
+
+
+class Tracer:
+    """
+    Collects pipeline traces into Prometheus-style metrics and, optionally, a JSONL file.
+
+    In "metrics" mode, the default, finished traces are only folded into in-memory counters and latency
+    histograms per stage, which costs a few dict updates per turn and is safe to leave on. "jsonl" mode also
+    appends every sampled trace with all its spans to jsonl_path. "off" hands out no-op traces.
+
+    Numeric span attributes are summed into eer_stage_<attr>_total counters and true boolean attributes are
+    counted, so token counts, retries and cache hits need no registration. Collectors add gauges computed at
+    export time, e.g. cache statistics.
+
+    Attributes:
+        mode (str): "off", "metrics" or "jsonl".
+        jsonl_path (str): File traces are appended to in "jsonl" mode.
+        sample_rate (float): Fraction of traces written to the JSONL file.
+        buckets (tuple): Upper bounds of the latency histogram buckets, in seconds.
+    """
+
+    def __init__(self, mode="metrics", jsonl_path=None, sample_rate=1.0, buckets=DEFAULT_BUCKETS):
+        """
+        Initializes the tracer.
+
+        Args:
+            mode (str, optional): "off", "metrics" or "jsonl". Defaults to "metrics".
+            jsonl_path (str, optional): File traces are appended to in "jsonl" mode. Defaults to None.
+            sample_rate (float, optional): Fraction of traces written to the JSONL file. Defaults to 1.0.
+            buckets (tuple, optional): Latency histogram bucket bounds. Defaults to DEFAULT_BUCKETS.
+        """
+        if mode not in ("off", "metrics", "jsonl"):
+            raise ValueError(f"Unknown tracing mode: {mode}")
+        self.mode = mode
+        self.jsonl_path = jsonl_path
+        self.sample_rate = sample_rate
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._counters = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+
+    def start(self, name, **attrs):
+        """
+        Starts a trace.
+
+        Args:
+            name (str): The trace name, e.g. "pipeline".
+            **attrs: Attributes of the trace.
+
+        Returns:
+            Trace: The trace, or a no-op trace when tracing is off.
+        """
+        if self.mode == "off":
+            return NOOP_TRACE
+        return Trace(self, name, attrs)
+
+    def record(self, trace):
+        """
+        Folds a finished trace into the metrics and writes it to the JSONL file if sampled.
+
+        Args:
+            trace (Trace): The finished trace.
+        """
+        with self._lock:
+            self._observe("eer_trace_duration_seconds", {"trace": trace.name}, trace.duration)
+            for span in trace.spans:
+                self._observe_span(span.name, span.duration, span.attrs)
+
+        if self.mode == "jsonl" and self.jsonl_path and random.random() < self.sample_rate:
+            line = json.dumps(trace.to_dict(), default=str)
+            with self._file_lock:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+
+    def observe(self, stage, seconds, **attrs):
+        """
+        Records a stage timed outside any trace, e.g. background writes.
+
+        Args:
+            stage (str): The stage name.
+            seconds (float): Seconds the stage took.
+            **attrs: Numeric or boolean attributes, as for spans.
+        """
+        if self.mode == "off":
+            return
+        with self._lock:
+            self._observe_span(stage, seconds, attrs)
+
+    def register_collector(self, name, collect):
+        """
+        Registers a callable returning {metric name: value} gauges, evaluated at every export.
+
+        Args:
+            name (str): Key of the collector; registering the same name again replaces it.
+            collect (callable): Returns a dict of gauge values.
+        """
+        with self._lock:
+            self._collectors[name] = collect
+
+    def prometheus_text(self):
+        """
+        Renders every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics.
+        """
+        lines = []
+        with self._lock:
+            histograms = {key: (list(value[0]), value[1], value[2]) for key, value in self._histograms.items()}
+            counters = dict(self._counters)
+            collectors = list(self._collectors.values())
+
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {total}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+
+        for collect in collectors:
+            try:
+                gauges = collect()
+            except Exception as e:
+                logger.warning("Metrics collector failed: %s", e)
+                continue
+            for name, value in sorted(gauges.items()):
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="0.0.0.0"):
+        """
+        Serves prometheus_text at /metrics from a background thread.
+
+        Args:
+            port (int): The port to listen on.
+            host (str, optional): The address to bind. Defaults to all interfaces.
+
+        Returns:
+            ThreadingHTTPServer: The running server.
+        """
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info("Serving metrics on %s:%d/metrics", host, port)
+        return server
+
+    def _observe_span(self, stage, seconds, attrs):
+        labels = (("stage", stage),)
+        self._observe("eer_stage_duration_seconds", labels, seconds)
+        for key, value in attrs.items():
+            if isinstance(value, bool):
+                value = int(value)
+            elif not isinstance(value, (int, float)):
+                continue
+            counter = (f"eer_stage_{key}_total", labels)
+            self._counters[counter] = self._counters.get(counter, 0) + value
+
+    def _observe(self, name, labels, seconds):
+        if isinstance(labels, dict):
+            labels = tuple(sorted(labels.items()))
+        histogram = self._histograms.get((name, labels))
+        if histogram is None:
+            histogram = self._histograms[(name, labels)] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        counts = histogram[0]
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+_active = threading.local()
+
+
+@contextmanager
+def activate(trace):
+    """
+    Makes a trace the current one of the calling thread for the duration of a block.
+
+    Args:
+        trace (Trace): The trace.
+    """
+    previous = getattr(_active, "trace", None)
+    _active.trace = trace
+    try:
+        yield trace
+    finally:
+        _active.trace = previous
+
+
+def current_trace():
+    """
+    Returns the current trace of the calling thread, or a no-op trace.
+    """
+    return getattr(_active, "trace", None) or NOOP_TRACE
+
+
+def span(name, **attrs):
+    """
+    Times a block as a span of the current trace, if there is one.
+
+    Args:
+        name (str): The stage name.
+        **attrs: Initial attributes of the span.
+
+    Returns:
+        contextmanager: Yields the span.
+    """
+    return current_trace().span(name, **attrs)
+
+
+def note_retry():
+    """
+    Counts a retry on the innermost open span of the current trace.
+    """
+    current = current_trace().current_span()
+    if current is not None:
+        current.add("retries")
+
+
+def bind(fn):
+    """
+    Wraps a callable so that it runs with the caller's current trace, e.g. on an executor thread.
+
+    Args:
+        fn (callable): The callable.
+
+    Returns:
+        callable: The wrapped callable.
+    """
+    trace = current_trace()
+
+    def bound(*args, **kwargs):
+        with activate(trace):
+            return fn(*args, **kwargs)
+    return bound
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """
+    Returns the process-wide tracer.
+
+    Configured by TRACING ("off", "metrics" or "jsonl"; defaults to "metrics"), TRACE_JSONL_PATH (defaults to
+    traces.jsonl) and TRACE_SAMPLE_RATE. If METRICS_PORT is set, the metrics are served there at /metrics.
+
+    Returns:
+        Tracer: The shared tracer.
+    """
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(
+                mode=os.getenv("TRACING", "metrics"),
+                jsonl_path=os.getenv("TRACE_JSONL_PATH", "traces.jsonl"),
+                sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+            )
+            if os.getenv("METRICS_PORT"):
+                try:
+                    _tracer.serve(int(os.getenv("METRICS_PORT")))
+                except OSError as e:
+                    logger.error("Could not serve metrics: %s", e)
+        return _tracer
@@ -0,0 +1,727 @@
+import os
+import json
+import argparse
+import threading
+import logging
+import numpy as np
+from langchain_core.documents import Document
+from connections import get_registry
+
+# Set up logging for the vector backends
+logger = logging.getLogger(__name__)
+
+
+class VectorBackend:
+    """
+    Interface of the vector stores the chatbot retrieves from and writes to.
+
+    Vectors are dicts with "id", "values" and "metadata" keys, as accepted by Pinecone's upsert. Filters use
+    Pinecone's metadata filter syntax. Search results are LangChain Documents whose page_content is the
+    metadata's text_key field.
+    """
+
+    text_key = "text"
+
+    def search(self, index_name, vector, k=5, filter=None):
+        """
+        Returns the k documents most similar to a query vector.
+
+        Args:
+            index_name (str): The name of the index to search.
+            vector (list): The query embedding.
+            k (int, optional): The number of documents to return. Defaults to 5.
+            filter (dict, optional): A metadata filter. Defaults to None.
+
+        Returns:
+            list: The matching documents, most similar first.
+        """
+        return [self._to_document(metadata) for _, _, metadata in self.query(index_name, vector, k=k, filter=filter)]
+
+    def query(self, index_name, vector, k=5, filter=None):
+        """
+        Returns the k matches most similar to a query vector, with their ids.
+
+        Args:
+            index_name (str): The name of the index to search.
+            vector (list): The query embedding.
+            k (int, optional): The number of matches to return. Defaults to 5.
+            filter (dict, optional): A metadata filter. Defaults to None.
+
+        Returns:
+            list: (id, score, metadata) tuples, most similar first.
+        """
+        raise NotImplementedError
+
+    def list_ids(self, index_name, prefix=""):
+        """
+        Returns the ids of the vectors whose id starts with a prefix.
+
+        Args:
+            index_name (str): The name of the index to read from.
+            prefix (str, optional): The id prefix. Defaults to "" (every vector).
+
+        Returns:
+            list: The ids.
+        """
+        raise NotImplementedError
+
+    def fetch(self, index_name, ids):
+        """
+        Returns stored vectors by id, skipping unknown ids.
+
+        Args:
+            index_name (str): The name of the index to read from.
+            ids (list): The ids to fetch.
+
+        Returns:
+            list: The vectors, as dicts with "id", "values" and "metadata" keys.
+        """
+        raise NotImplementedError
+
+    def upsert(self, index_name, vectors):
+        """
+        Inserts or replaces vectors.
+
+        Args:
+            index_name (str): The name of the index to write to.
+            vectors (list): The vectors to upsert.
+        """
+        raise NotImplementedError
+
+    def delete(self, index_name, ids):
+        """
+        Deletes vectors by id.
+
+        Args:
+            index_name (str): The name of the index to delete from.
+            ids (list): The ids to delete.
+        """
+        raise NotImplementedError
+
+    def delete_where(self, index_name, filter):
+        """
+        Deletes every vector whose metadata matches a filter.
+
+        Args:
+            index_name (str): The name of the index to delete from.
+            filter (dict): A metadata filter.
+        """
+        raise NotImplementedError
+
+    def fetch_prefix(self, index_name, prefix, filter=None):
+        """
+        Returns every vector whose id starts with a prefix.
+
+        Args:
+            index_name (str): The name of the index to read from.
+            prefix (str): The id prefix.
+            filter (dict, optional): A metadata filter every such vector matches, used to find them where ids cannot
+                be listed. Defaults to None.
+
+        Returns:
+            list: The vectors, as dicts with "id", "values" and "metadata" keys.
+        """
+        raise NotImplementedError
+
+    def _to_document(self, metadata):
+        metadata = dict(metadata or {})
+        return Document(page_content=metadata.pop(self.text_key, ""), metadata=metadata)
+
+
+class PineconeBackend(VectorBackend):
+    """
+    Vector backend that talks to Pinecone through the shared connection registry.
+    """
+
+    def __init__(self, registry=None):
+        """
+        Initializes the backend.
+
+        Args:
+            registry (PineconeRegistry, optional): Registry providing index handles. Defaults to the shared registry.
+        """
+        self.registry = registry or get_registry()
+
+    def query(self, index_name, vector, k=5, filter=None):
+        results = self.registry.get_index(index_name).query(vector=vector, top_k=k, filter=filter, include_metadata=True)
+        return [(match.id, match.score, match.metadata) for match in results.matches]
+
+    def list_ids(self, index_name, prefix=""):
+        return [vector_id for ids in self.registry.get_index(index_name).list(prefix=prefix or None) for vector_id in ids]
+
+    def fetch(self, index_name, ids, batch_size=100):
+        index = self.registry.get_index(index_name)
+        vectors = []
+        for start in range(0, len(ids), batch_size):
+            response = index.fetch(ids=ids[start:start + batch_size])
+            vectors.extend(
+                {"id": vector_id, "values": list(vector.values), "metadata": dict(vector.metadata or {})}
+                for vector_id, vector in response.vectors.items()
+            )
+        return vectors
+
+    def upsert(self, index_name, vectors):
+        self.registry.get_index(index_name).upsert(vectors=vectors)
+
+    def delete(self, index_name, ids):
+        self.registry.get_index(index_name).delete(ids=list(ids))
+
+    def delete_where(self, index_name, filter, batch_size=100):
+        index = self.registry.get_index(index_name)
+        try:
+            index.delete(filter=filter)
+            return
+        except Exception as e:
+            # Serverless indexes cannot delete by metadata, so matching ids are collected by listing and fetching
+            logger.info("Delete by filter not supported on %s (%s), scanning the index instead", index_name, e)
+
+        stale_ids = []
+        for ids in index.list():
+            for start in range(0, len(ids), batch_size):
+                response = index.fetch(ids=ids[start:start + batch_size])
+                stale_ids.extend(vector_id for vector_id, vector in response.vectors.items() if matches_filter(vector.metadata or {}, filter))
+        for start in range(0, len(stale_ids), 1000):
+            index.delete(ids=stale_ids[start:start + 1000])
+
+    def fetch_prefix(self, index_name, prefix, filter=None, batch_size=100):
+        try:
+            ids = self.list_ids(index_name, prefix)
+        except Exception as e:
+            if filter is None:
+                raise
+            # Listing ids is only supported on serverless indexes, so pod indexes are searched with the filter
+            logger.warning("Could not list ids with prefix %s in %s, querying by metadata instead: %s", prefix, index_name, e)
+            dimension = self.registry.get_index(index_name).describe_index_stats().dimension
+            ids = [vector_id for vector_id, _, _ in self.query(index_name, [1.0] * dimension, k=10000, filter=filter) if vector_id.startswith(prefix)]
+        return self.fetch(index_name, ids, batch_size=batch_size)
+
+
+class LocalIndex:
+    """
+    An in-process index holding vectors in a memory-mapped float32 matrix, searched exactly by matrix product.
+
+    Vectors are L2-normalized on insert, so scores are cosine similarities. Rows are kept dense: deleting a vector
+    moves the last row into its slot. Ids and metadata are persisted next to the matrix as JSON by save(). Between
+    saves, persist() appends just the changes to a log that is replayed on open, and compacts the log into a full
+    save once it holds as many vectors as the index, so persisting after each write costs O(batch) amortized.
+    Equality filters on the indexed_fields are answered from an integer column instead of scanning metadata.
+
+    Attributes:
+        path (str): Directory holding the index files.
+        dimension (int): Dimension of the vectors, fixed by the first upsert.
+        indexed_fields (tuple): Metadata fields kept as columns for fast $eq/$ne pre-filtering.
+    """
+
+    def __init__(self, path, dimension=None, indexed_fields=("session_id", "kind")):
+        """
+        Opens the index stored in path, or prepares an empty one.
+
+        Args:
+            path (str): Directory holding the index files.
+            dimension (int, optional): Dimension of the vectors. Defaults to the stored one or the first upsert's.
+            indexed_fields (tuple, optional): Metadata fields to keep as filter columns. Defaults to ("session_id", "kind").
+        """
+        self.path = path
+        self.dimension = dimension
+        self.indexed_fields = tuple(indexed_fields)
+        self._ids = []
+        self._metadata = []
+        self._positions = {}
+        self._matrix = None
+        self._codes = {field: {} for field in self.indexed_fields}
+        self._columns = {field: np.zeros(0, dtype=np.int32) for field in self.indexed_fields}
+        self._lock = threading.RLock()
+        self._pending = []
+        self._logged = 0
+        self._stale = False
+        self._replayed = 0
+
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            self.dimension = stored["dimension"]
+            self._ids = stored["ids"]
+            self._metadata = stored["metadata"]
+            self._positions = {vector_id: row for row, vector_id in enumerate(self._ids)}
+            # The matrix may have grown after the last save
+            capacity = os.path.getsize(self._matrix_path()) // (4 * self.dimension)
+            self._matrix = np.memmap(self._matrix_path(), dtype=np.float32, mode="r+", shape=(capacity, self.dimension))
+            self._grow_columns(self._matrix.shape[0])
+            for row, metadata in enumerate(self._metadata):
+                self._set_columns(row, metadata)
+            self._replay()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def upsert(self, vectors):
+        """
+        Inserts or replaces vectors.
+
+        Args:
+            vectors (list): Dicts with "id", "values" and "metadata" keys.
+        """
+        if not vectors:
+            return
+        values = normalize(np.asarray([vector["values"] for vector in vectors], dtype=np.float32))
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = values.shape[1]
+            self._reserve(len(self._ids) + len(vectors))
+            rows = []
+            for vector, row_values in zip(vectors, values):
+                row = self._positions.get(vector["id"])
+                if row is None:
+                    row = len(self._ids)
+                    self._ids.append(vector["id"])
+                    self._metadata.append(None)
+                    self._positions[vector["id"]] = row
+                self._matrix[row] = row_values
+                self._metadata[row] = dict(vector.get("metadata") or {})
+                self._set_columns(row, self._metadata[row])
+                rows.append(row)
+            self._pending.append({"upsert": [[vector["id"], self._metadata[row]] for vector, row in zip(vectors, rows)]})
+            self._on_rows_set(np.asarray(rows), values)
+
+    def delete(self, ids):
+        """
+        Deletes vectors by id.
+
+        Args:
+            ids (list): The ids to delete.
+        """
+        with self._lock:
+            deleted = [vector_id for vector_id in ids if self._delete_row(vector_id)]
+            if deleted:
+                self._pending.append({"delete": deleted})
+
+    def ids_where(self, filter):
+        """
+        Returns the ids of the vectors whose metadata matches a filter.
+
+        Args:
+            filter (dict): A Pinecone-style metadata filter.
+
+        Returns:
+            list: The matching ids.
+        """
+        with self._lock:
+            rows = self._filter_rows(filter)
+            return list(self._ids) if rows is None else [self._ids[row] for row in rows]
+
+    def fetch(self, ids):
+        """
+        Returns stored vectors by id, skipping unknown ids.
+
+        Args:
+            ids (list): The ids to fetch.
+
+        Returns:
+            list: The vectors, as dicts with "id", "values" and "metadata" keys.
+        """
+        with self._lock:
+            rows = [(vector_id, self._positions.get(vector_id)) for vector_id in ids]
+            return [
+                {"id": vector_id, "values": self._matrix[row].tolist(), "metadata": dict(self._metadata[row])}
+                for vector_id, row in rows if row is not None
+            ]
+
+    def query(self, vectors, k=5, filter=None):
+        """
+        Returns the exact top-k matches for one or more query vectors.
+
+        Args:
+            vectors (list): One query vector, or a list of query vectors answered with a single matrix product.
+            k (int, optional): The number of matches per query. Defaults to 5.
+            filter (dict, optional): A Pinecone-style metadata filter applied before ranking. Defaults to None.
+
+        Returns:
+            list: Per query, a list of (id, score, metadata) tuples, best first.
+        """
+        queries = normalize(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+
+        with self._lock:
+            count = len(self._ids)
+            if count == 0:
+                return [[] for _ in queries]
+            candidates = self._filter_rows(filter)
+            if candidates is None:
+                candidates = np.arange(count)
+                matrix = self._matrix[:count]
+            else:
+                matrix = self._matrix[candidates]
+            if len(candidates) == 0:
+                return [[] for _ in queries]
+
+            scores = queries @ np.asarray(matrix).T
+            return [self._top_k(query_scores, candidates, k) for query_scores in scores]
+
+    def save(self):
+        """
+        Flushes the matrix and writes ids and metadata to disk, emptying the log.
+        """
+        with self._lock:
+            if self._matrix is None:
+                return
+            self._matrix.flush()
+            tmp_path = os.path.join(self.path, "meta.json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"dimension": self.dimension, "capacity": self._matrix.shape[0], "ids": self._ids, "metadata": self._metadata}, f)
+            os.replace(tmp_path, os.path.join(self.path, "meta.json"))
+            if os.path.exists(self._log_path()):
+                os.remove(self._log_path())
+            self._pending, self._logged, self._stale = [], 0, False
+
+    def persist(self):
+        """
+        Persists the changes since the last call, appending them to the log or compacting the log into a save.
+        """
+        with self._lock:
+            if not self._pending or self._matrix is None:
+                return
+            logged = self._logged + sum(len(next(iter(entry.values()))) for entry in self._pending)
+            if self._stale or logged > len(self._ids) or not os.path.exists(os.path.join(self.path, "meta.json")):
+                self.save()
+                return
+            self._matrix.flush()
+            with open(self._log_path(), "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(entry) + "\n" for entry in self._pending)
+            self._pending, self._logged = [], logged
+
+    def _replay(self):
+        """
+        Applies the logged changes to the ids and metadata; the matrix on disk already holds their vectors.
+        """
+        if not os.path.exists(self._log_path()):
+            return
+        with open(self._log_path(), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-append
+                    logger.warning("Ignoring a truncated entry in %s", self._log_path())
+                    break
+                for vector_id, metadata in entry.get("upsert", []):
+                    row = self._positions.get(vector_id)
+                    if row is None:
+                        row = len(self._ids)
+                        self._ids.append(vector_id)
+                        self._metadata.append(None)
+                        self._positions[vector_id] = row
+                    self._metadata[row] = metadata
+                    self._set_columns(row, metadata)
+                for vector_id in entry.get("delete", []):
+                    self._delete_row(vector_id, replay=True)
+                self._logged += len(entry.get("upsert", entry.get("delete", [])))
+                self._replayed += 1
+
+    def _delete_row(self, vector_id, replay=False):
+        """
+        Deletes one vector by moving the last row into its slot, returns whether it existed. A replayed delete
+        leaves the matrix, which already reflects it, and the subclass hooks alone.
+        """
+        row = self._positions.pop(vector_id, None)
+        if row is None:
+            return False
+        if not replay:
+            self._on_row_deleted(row)
+        last = len(self._ids) - 1
+        if row != last:
+            if not replay:
+                self._matrix[row] = self._matrix[last]
+            self._ids[row] = self._ids[last]
+            self._metadata[row] = self._metadata[last]
+            self._positions[self._ids[row]] = row
+            for column in self._columns.values():
+                column[row] = column[last]
+            if not replay:
+                self._on_row_moved(last, row)
+        self._ids.pop()
+        self._metadata.pop()
+        return True
+
+    def _top_k(self, scores, rows, k):
+        top = min(k, len(rows))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        return [(self._ids[rows[i]], float(scores[i]), self._metadata[rows[i]]) for i in best]
+
+    def _filter_rows(self, filter, rows=None):
+        """
+        Returns the rows (among rows, or all rows if None) matching a filter, or None if there is no filter.
+        """
+        if not filter:
+            return rows
+        count = len(self._ids)
+        if rows is None:
+            rows = np.arange(count)
+
+        if len(filter) == 1:
+            field, condition = next(iter(filter.items()))
+            if field == "$and":
+                # Narrow the rows one condition at a time, so indexed conditions skip the metadata scan
+                for sub in condition:
+                    rows = self._filter_rows(sub, rows)
+                return rows
+            if field in self._columns and isinstance(condition, dict) and len(condition) == 1:
+                operator, operand = next(iter(condition.items()))
+                if operator in ("$eq", "$ne"):
+                    code = self._codes[field].get(operand, -2)
+                    column = self._columns[field][rows]
+                    return rows[column == code] if operator == "$eq" else rows[column != code]
+
+        return np.fromiter((row for row in rows if matches_filter(self._metadata[row], filter)), dtype=np.int64)
+
+    def _set_columns(self, row, metadata):
+        for field, column in self._columns.items():
+            value = metadata.get(field)
+            column[row] = -1 if value is None else self._codes[field].setdefault(value, len(self._codes[field]))
+
+    def _grow_columns(self, capacity):
+        for field, column in self._columns.items():
+            grown = np.full(capacity, -1, dtype=np.int32)
+            grown[:len(column)] = column[:capacity]
+            self._columns[field] = grown
+
+    def _on_rows_set(self, rows, values):
+        """Hook called after rows were written, for subclasses maintaining extra structures."""
+
+    def _on_row_deleted(self, row):
+        """Hook called before a row's vector is deleted."""
+
+    def _on_row_moved(self, source, target):
+        """Hook called after a row was moved into a deleted row's slot."""
+
+    def _matrix_path(self):
+        return os.path.join(self.path, "vectors.f32")
+
+    def _log_path(self):
+        return os.path.join(self.path, "meta.log")
+
+    def _reserve(self, size):
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if size <= capacity:
+            return
+        new_capacity = max(1024, capacity * 2, size)
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = self._matrix_path() + ".tmp"
+        matrix = np.memmap(tmp_path, dtype=np.float32, mode="w+", shape=(new_capacity, self.dimension))
+        if self._matrix is not None:
+            matrix[:len(self._ids)] = self._matrix[:len(self._ids)]
+            del self._matrix
+        matrix.flush()
+        del matrix
+        os.replace(tmp_path, self._matrix_path())
+        self._matrix = np.memmap(self._matrix_path(), dtype=np.float32, mode="r+", shape=(new_capacity, self.dimension))
+        self._grow_columns(new_capacity)
+
+
+def normalize(vectors):
+    """
+    L2-normalizes the rows of a matrix, leaving all-zero rows unchanged.
+
+    Args:
+        vectors (np.ndarray): The matrix.
+
+    Returns:
+        np.ndarray: The normalized matrix.
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def matches_filter(metadata, filter):
+    """
+    Evaluates a Pinecone-style metadata filter against one metadata dict.
+
+    Supports $eq, $ne, $gt, $gte, $lt, $lte, $in, $nin, $exists, $and, $or and implicit equality.
+
+    Args:
+        metadata (dict): The metadata of a vector.
+        filter (dict): The filter.
+
+    Returns:
+        bool: Whether the metadata matches.
+    """
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+        else:
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if not _compare(value, operator, operand):
+                    return False
+    return True
+
+
+def _compare(value, operator, operand):
+    if operator == "$eq":
+        return value == operand or (isinstance(value, list) and operand in value)
+    if operator == "$ne":
+        return value != operand
+    if operator == "$in":
+        return value in operand
+    if operator == "$nin":
+        return value not in operand
+    if operator == "$exists":
+        return (value is not None) == operand
+    if value is None:
+        return False
+    if operator == "$gt":
+        return value > operand
+    if operator == "$gte":
+        return value >= operand
+    if operator == "$lt":
+        return value < operand
+    if operator == "$lte":
+        return value <= operand
+    raise ValueError(f"Unsupported filter operator: {operator}")
+
+
+class LocalBackend(VectorBackend):
+    """
+    Vector backend keeping every index in process as a LocalIndex under one directory.
+
+    Attributes:
+        directory (str): Directory holding one subdirectory per index.
+        ann_indexes (tuple): Names of the indexes searched approximately with an IVFIndex.
+        nprobe (int): Inverted lists scanned per query in the approximate indexes.
+    """
+
+    def __init__(self, directory, ann_indexes=(), nprobe=8):
+        """
+        Initializes the backend.
+
+        Args:
+            directory (str): Directory holding one subdirectory per index.
+            ann_indexes (tuple, optional): Names of the indexes to search approximately. Defaults to none.
+            nprobe (int, optional): Inverted lists scanned per approximate query. Defaults to 8.
+        """
+        self.directory = directory
+        self.ann_indexes = tuple(ann_indexes)
+        self.nprobe = nprobe
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def index(self, index_name):
+        """
+        Returns the local index with the given name, opening it on first use.
+
+        Args:
+            index_name (str): The name of the index.
+
+        Returns:
+            LocalIndex: The index.
+        """
+        with self._lock:
+            if index_name not in self._indexes:
+                path = os.path.join(self.directory, index_name)
+                if index_name in self.ann_indexes:
+                    # Imported here because ann_index builds on this module
+                    from ann_index import IVFIndex
+                    self._indexes[index_name] = IVFIndex(path, nprobe=self.nprobe)
+                else:
+                    self._indexes[index_name] = LocalIndex(path)
+            return self._indexes[index_name]
+
+    def query(self, index_name, vector, k=5, filter=None):
+        return self.index(index_name).query(vector, k=k, filter=filter)[0]
+
+    def list_ids(self, index_name, prefix=""):
+        return [vector_id for vector_id in self.index(index_name).ids_where(None) if vector_id.startswith(prefix)]
+
+    def fetch(self, index_name, ids):
+        return self.index(index_name).fetch(ids)
+
+    def upsert(self, index_name, vectors):
+        index = self.index(index_name)
+        index.upsert(vectors)
+        index.persist()
+
+    def delete(self, index_name, ids):
+        index = self.index(index_name)
+        index.delete(ids)
+        index.persist()
+
+    def delete_where(self, index_name, filter):
+        index = self.index(index_name)
+        index.delete(index.ids_where(filter))
+        index.persist()
+
+    def fetch_prefix(self, index_name, prefix, filter=None):
+        index = self.index(index_name)
+        return index.fetch([vector_id for vector_id in index.ids_where(filter) if vector_id.startswith(prefix)])
+
+    def import_from_pinecone(self, index_name, registry=None, batch_size=100):
+        """
+        Copies every vector of a Pinecone index into the local index of the same name.
+
+        Args:
+            index_name (str): The name of the index.
+            registry (PineconeRegistry, optional): Registry providing the Pinecone index. Defaults to the shared registry.
+            batch_size (int, optional): Number of vectors fetched per request. Defaults to 100.
+
+        Returns:
+            int: The number of vectors imported.
+        """
+        source = (registry or get_registry()).get_index(index_name)
+        index = self.index(index_name)
+        imported = 0
+        for ids in source.list():
+            for start in range(0, len(ids), batch_size):
+                response = source.fetch(ids=ids[start:start + batch_size])
+                index.upsert([
+                    {"id": vector_id, "values": vector.values, "metadata": vector.metadata}
+                    for vector_id, vector in response.vectors.items()
+                ])
+                imported += len(response.vectors)
+        index.save()
+        logger.info("Imported %d vectors from Pinecone index %s", imported, index_name)
+        return imported
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Returns the process-wide vector backend selected by the VECTOR_BACKEND env var ("pinecone" or "local").
+
+    The local backend stores its indexes under LOCAL_VECTOR_DIR (defaults to data/vector_indexes). Indexes listed
+    in LOCAL_VECTOR_ANN_INDEXES (comma separated) are searched approximately, scanning LOCAL_VECTOR_NPROBE lists.
+
+    Returns:
+        VectorBackend: The shared backend.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if os.getenv("VECTOR_BACKEND", "pinecone") == "local":
+                _backend = LocalBackend(
+                    os.getenv("LOCAL_VECTOR_DIR", os.path.join("data", "vector_indexes")),
+                    ann_indexes=[name for name in os.getenv("LOCAL_VECTOR_ANN_INDEXES", "eer-interaction-data").split(",") if name],
+                    nprobe=int(os.getenv("LOCAL_VECTOR_NPROBE", "8"))
+                )
+            else:
+                _backend = PineconeBackend()
+        return _backend
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy Pinecone indexes into the local vector backend.")
+    parser.add_argument("indexes", nargs="+", help="Names of the indexes to copy")
+    parser.add_argument("--directory", default=os.getenv("LOCAL_VECTOR_DIR", os.path.join("data", "vector_indexes")), help="Directory of the local backend")
+    args = parser.parse_args()
+    backend = LocalBackend(args.directory)
+    for name in args.indexes:
+        print(f"{name}: {backend.import_from_pinecone(name)} vectors")
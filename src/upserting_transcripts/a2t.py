@@ -3,26 +3,57 @@ import pandas as pd
 from datetime import datetime
 import time
 import re
+import hashlib
+import tempfile
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tenacity import retry, stop_after_attempt, wait_exponential
 from dotenv import load_dotenv
 from langchain_huggingface import HuggingFaceEmbeddings, HuggingFaceEndpoint as HuggingFaceHub
 from langchain_community.vectorstores.pinecone import Pinecone
 from pinecone import Pinecone as pc
 import pinecone
+from rate_limiter import TokenBucket
+from summary_cache import SummaryCache
 
 load_dotenv()
 
+# File touched after every summary upsert; the chatbot app watches it to invalidate its cached summaries
+SUMMARIES_STAMP_PATH = os.getenv("SUMMARIES_STAMP_PATH", os.path.join(tempfile.gettempdir(), "eer-meetings-summaries.stamp"))
+
 class TranscriptProcessor:
-    def __init__(self, model_repo="meta-llama/Llama-3.1-70B-Instruct", temperature=1.0, api_token=None):
+    def __init__(self, model_repo="meta-llama/Llama-3.1-70B-Instruct", temperature=1.0, api_token=None, embeddings=None,
+                 max_concurrency=4, requests_per_minute=30, max_retries=3, chunk_token_budget=3000, summary_cache_path=None):
+        # Summarization concurrency, LLM rate limit and per-file retry budget
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = TokenBucket(requests_per_minute / 60, capacity=max_concurrency) if requests_per_minute else None
+        self.max_retries = max_retries
+
+        # Map-reduce summarization: chunk size in tokens, per-chunk summary cache and the pool the chunks run on
+        self.chunk_token_budget = chunk_token_budget
+        self.summary_cache = SummaryCache(summary_cache_path or os.getenv("SUMMARY_CACHE_PATH"))
+        self.chunk_executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="chunk-summary")
+
         self.llm = HuggingFaceHub(
             repo_id=model_repo,
             temperature=temperature,
             huggingfacehub_api_token=api_token or os.getenv('HUGGINGFACE_API_KEY')
         )
-        self.embeddings = HuggingFaceEmbeddings()
+        self.embeddings = embeddings or HuggingFaceEmbeddings()
         self.pinecone_instance_chat = pc(api_key=os.getenv('PINECONE_API_KEY_2'), embeddings=self.embeddings)
     
     def summary_prompt(self, text):
         return f"Please identify the main discussion points, decisions, and action items from my meeting notes below and provide a concise bulleted summary. Here is the meeting transcript: '{text}'. Your notes and summary:"
+
+    def chunk_summary_prompt(self, text, part, total):
+        return f"Below is part {part} of {total} of a meeting transcript. Please identify the main discussion points, decisions, and action items in this part and provide a concise bulleted summary. Here is the transcript part: '{text}'. Your notes and summary:"
+
+    def reduce_prompt(self, summaries):
+        return f"Below are bulleted summaries of consecutive parts of one meeting. Please combine them into a single concise bulleted summary of the main discussion points, decisions, and action items of the whole meeting, removing repetition. Here are the partial summaries: '{summaries}'. Your notes and summary:"
+
+    def count_tokens(self, text):
+        """Estimate the number of tokens in a text (roughly four characters per token)."""
+        return len(text) // 4 + 1
     
     def extract_unique_speakers(self, file):
         """Extract unique speakers from an uploaded CSV file."""
@@ -43,46 +74,170 @@ class TranscriptProcessor:
             print(f"Error loading file content: {e}")
             return ""
 
-    def process_transcripts(self, files):
-        """Process a single uploaded file or multiple uploaded files and return a dictionary of transcript data."""
-        transcript_data = {}
-
-        if isinstance(files, list):
-            for file in files:
-                if file.name.endswith('.csv'):
-                    speakers = self.extract_unique_speakers(file)
-                    transcript_text = self.load_csv_content(file)
-                    summary = self.llm.invoke(self.summary_prompt(transcript_text))
-                    transcript_data[file.name] = {
-                        "speakers": speakers,
-                        "summary": summary
-                    }
-        
-        else:
-            if files.name.endswith('.csv'):
-                speakers = self.extract_unique_speakers(files)
-                transcript_text = self.load_csv_content(files)
-                summary = self.llm.invoke(self.summary_prompt(transcript_text))
-                transcript_data[files.name] = {
-                    "speakers": speakers,
-                    "summary": summary
-                }
+    def invoke_llm(self, prompt):
+        """Invoke the LLM, respecting the rate limit and retrying with exponential backoff."""
+        @retry(stop=stop_after_attempt(self.max_retries), wait=wait_exponential(multiplier=2, max=30), reraise=True)
+        def invoke():
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            return self.llm.invoke(prompt)
 
-        return transcript_data
+        return invoke()
 
-    def upsert_summaries_to_pinecone(self, data):
-        """Upsert processed summaries to Pinecone."""
-        index_name = "eer-meetings-summaries"
-        environment = "gcp-starter"
-        index = self.pinecone_instance_chat.Index(index_name, environment=environment)
+    def cached_llm(self, prompt, *key_parts):
+        """
+        Invoke the LLM, reusing the cached answer if the same content was summarized before.
+
+        The cache key is the hash of key_parts, e.g. a step name and the text being summarized, or of the prompt
+        if none are given. Keying on the content rather than the prompt keeps a chunk's summary valid when only
+        its position in the transcript ("part 3 of 8") changes.
+        """
+        key = SummaryCache.key(*(key_parts or (prompt,)))
+        summary = self.summary_cache.get(key)
+        if summary is None:
+            summary = self.invoke_llm(prompt)
+            self.summary_cache.put(key, summary)
+        return summary
+
+    def summarize(self, text):
+        """Summarize a transcript in a single LLM call."""
+        return self.invoke_llm(self.summary_prompt(text))
 
-        for i, (meeting_id, meeting_data) in enumerate(data.items(), start=1):
+    def parse_turns(self, file):
+        """Parse an uploaded CSV file into a list of "speaker: text" turns and the list of unique speakers."""
+        file.seek(0)
+        df = pd.read_csv(file, delimiter=";", encoding="ISO-8859-1")
+        df = df.dropna(subset=['transcript_text'])
+        turns = (df['speaker_name'].fillna("Unknown").astype(str) + ": " + df['transcript_text'].astype(str).str.strip()).tolist()
+        return turns, df['speaker_name'].dropna().unique().tolist()
+
+    def pack_chunks(self, turns):
+        """Pack consecutive turns into chunks of at most chunk_token_budget tokens (a longer single turn gets its own chunk)."""
+        chunks, current, current_tokens = [], [], 0
+        for turn in turns:
+            tokens = self.count_tokens(turn)
+            if current and current_tokens + tokens > self.chunk_token_budget:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(turn)
+            current_tokens += tokens
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+
+    def is_anchor(self, turn, tokens):
+        """
+        Tell whether a chunk may end after this turn, judging by the turn alone.
+
+        A turn is an anchor with a probability proportional to its length, decided by the hash of its text, so
+        chunks average half the chunk_token_budget.
+        """
+        draw = int.from_bytes(hashlib.sha1(turn.encode("utf-8")).digest()[:8], "big") / 2 ** 64
+        return draw < tokens / (self.chunk_token_budget / 2)
+
+    def anchor_chunks(self, turns):
+        """
+        Pack consecutive turns into chunks of at most chunk_token_budget tokens, ending chunks after anchor turns.
+
+        Since anchors depend only on each turn's own text, chunk boundaries follow the content instead of the
+        position in the transcript: editing, inserting or removing a turn only changes the chunk around it, and
+        every other chunk keeps its text, and with it its cached summary. Chunks are also cut when the budget is
+        reached, but not before they hold an eighth of it, and a longer single turn gets its own chunk.
+        """
+        chunks, current, current_tokens = [], [], 0
+        for turn in turns:
+            tokens = self.count_tokens(turn)
+            if current and current_tokens + tokens > self.chunk_token_budget:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(turn)
+            current_tokens += tokens
+            if current_tokens >= self.chunk_token_budget / 8 and self.is_anchor(turn, tokens):
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+
+    def summarize_turns(self, turns):
+        """
+        Summarize a transcript with map-reduce: summarize content-anchored chunks in parallel, then combine them.
+
+        Chunk summaries are cached by the hash of the chunk's text, so re-uploading an edited transcript only
+        re-summarizes the chunks that changed.
+        """
+        if sum(self.count_tokens(turn) for turn in turns) <= self.chunk_token_budget:
+            text = "\n".join(turns)
+            return self.cached_llm(self.summary_prompt(text), "summary", text) if text else ""
+        chunks = self.anchor_chunks(turns)
+
+        summaries = list(self.chunk_executor.map(
+            lambda numbered: self.cached_llm(self.chunk_summary_prompt(numbered[1], numbered[0], len(chunks)), "chunk", numbered[1]),
+            enumerate(chunks, start=1)
+        ))
+
+        # Reduce the partial summaries, in several rounds if they do not fit in one prompt
+        while True:
+            groups = self.pack_chunks([f"Part {part}:\n{summary}" for part, summary in enumerate(summaries, start=1)])
+            if len(groups) == 1 or len(groups) == len(summaries):
+                return self.cached_llm(self.reduce_prompt("\n\n".join(groups)))
+            summaries = list(self.chunk_executor.map(self.cached_llm, [self.reduce_prompt(group) for group in groups]))
+
+    def process_file(self, file):
+        """Extract speakers from and summarize a single uploaded CSV file."""
+        try:
+            turns, speakers = self.parse_turns(file)
+        except Exception as e:
+            # Fall back to summarizing the raw file if it cannot be parsed into speaker turns
+            print(f"Error parsing turns from file '{file.name}', summarizing raw content: {e}")
+            file.seek(0)
+            return {
+                "speakers": self.extract_unique_speakers(file),
+                "summary": self.summarize(self.load_csv_content(file))
+            }
+        return {
+            "speakers": speakers,
+            "summary": self.summarize_turns(turns)
+        }
+
+    def process_transcripts(self, files, progress_callback=None):
+        """
+        Process a single uploaded file or multiple uploaded files concurrently and return a dictionary of transcript data.
+
+        Results keep the upload order. A file that still fails after its retries gets a None summary and an "error"
+        entry instead of aborting the batch. progress_callback, if given, is called as
+        progress_callback(filename, error, completed, total) after each file finishes, with error None on success.
+        """
+        files = files if isinstance(files, list) else [files]
+        files = [file for file in files if file.name.endswith('.csv')]
+        results = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_concurrency)) as executor:
+            futures = {executor.submit(self.process_file, file): file.name for file in files}
+            for completed, future in enumerate(as_completed(futures), start=1):
+                name = futures[future]
+                error = None
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"Error summarizing file '{name}': {e}")
+                    error = str(e)
+                    results[name] = {"speakers": [], "summary": None, "error": error}
+                if progress_callback is not None:
+                    progress_callback(name, error, completed, len(files))
+
+        return {file.name: results[file.name] for file in files}
+
+    def build_summary_vectors(self, data, embed_batch_size=32):
+        """Build Pinecone vectors for processed summaries, embedding them in batches instead of one call per meeting."""
+        records = []
+        for meeting_id, meeting_data in data.items():
             summary = meeting_data['summary']
+            if summary is None:
+                print(f"Skipping '{meeting_id}', it has no summary")
+                continue
             speakers = meeting_data['speakers']
 
-            # Create embedding for the summary
-            embedding = self.embeddings.embed_documents([summary])[0]
-
             # Use regex to find the date at the beginning of the filename
             match = re.match(r"(\d{4}-\d{2}-\d{2})", meeting_id)
             if match:
@@ -97,17 +252,64 @@ class TranscriptProcessor:
                 print(f"No valid date found in filename '{meeting_id}'")
                 continue
 
-            # Upsert to Pinecone
-            index.upsert(vectors=[
-                {
-                    'id': f"{unix_timestamp}",
-                    'values': embedding,
-                    'metadata': {
-                        "date": date_str,
-                        "summary": summary,
-                        "speakers": speakers,
-                        "date_unix": unix_timestamp,
-                        "text": summary
-                    }
+            records.append((unix_timestamp, date_str, summary, speakers))
+
+        # Create embeddings for all summaries in batched forward passes
+        summaries = [record[2] for record in records]
+        embeddings = []
+        for start in range(0, len(summaries), embed_batch_size):
+            embeddings.extend(self.embeddings.embed_documents(summaries[start:start + embed_batch_size]))
+
+        return [
+            {
+                'id': f"{unix_timestamp}",
+                'values': embedding,
+                'metadata': {
+                    "date": date_str,
+                    "summary": summary,
+                    "speakers": speakers,
+                    "date_unix": unix_timestamp,
+                    "text": summary
                 }
-            ])
+            }
+            for (unix_timestamp, date_str, summary, speakers), embedding in zip(records, embeddings)
+        ]
+
+    def upsert_vectors(self, vectors, batch_size=100, parallel=True):
+        """
+        Upsert vectors to the summaries index in chunks of batch_size, optionally sending the chunks in parallel.
+
+        Returns a list of failed batches, each a dict with the batch number, its error and its vectors, so the
+        caller can pass the vectors straight back in to retry them.
+        """
+        index_name = "eer-meetings-summaries"
+        index = self.pinecone_instance_chat.Index(index_name, pool_threads=self.max_concurrency)
+        batches = [vectors[start:start + batch_size] for start in range(0, len(vectors), batch_size)]
+        failures = []
+
+        if parallel and len(batches) > 1:
+            pending = [(number, batch, index.upsert(vectors=batch, async_req=True)) for number, batch in enumerate(batches, start=1)]
+            for number, batch, request in pending:
+                try:
+                    request.get()
+                except Exception as e:
+                    failures.append({"batch": number, "error": str(e), "vectors": batch})
+        else:
+            for number, batch in enumerate(batches, start=1):
+                try:
+                    index.upsert(vectors=batch)
+                except Exception as e:
+                    failures.append({"batch": number, "error": str(e), "vectors": batch})
+
+        for failure in failures:
+            print(f"Error upserting batch {failure['batch']} of {len(batches)}: {failure['error']}")
+        return failures
+
+    def upsert_summaries_to_pinecone(self, data, embed_batch_size=32, upsert_batch_size=100, parallel=True):
+        """Upsert processed summaries to Pinecone in bulk and return the batches that failed."""
+        vectors = self.build_summary_vectors(data, embed_batch_size=embed_batch_size)
+        failures = self.upsert_vectors(vectors, batch_size=upsert_batch_size, parallel=parallel)
+
+        # Let every chatbot process know its cached summaries are stale
+        Path(SUMMARIES_STAMP_PATH).touch()
+        return failures
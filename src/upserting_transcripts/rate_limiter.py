@@ -0,0 +1,44 @@
+import time
+import threading
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket rate limiter.
+
+    Attributes:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum number of tokens the bucket holds, i.e. the largest allowed burst.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Initializes a full bucket.
+
+        Args:
+            rate (float): Tokens added per second.
+            capacity (float, optional): Maximum burst size. Defaults to max(1, rate).
+        """
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """
+        Blocks until the requested number of tokens is available and takes them.
+
+        Args:
+            tokens (float, optional): Number of tokens to take. Defaults to 1.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
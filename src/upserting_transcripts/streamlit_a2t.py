@@ -3,8 +3,12 @@ from datetime import datetime
 import pandas as pd
 from a2t import TranscriptProcessor  
 
-# Initialize the TranscriptProcessor
-processor = TranscriptProcessor()
+# Initialize the TranscriptProcessor once per process so the embedding model is not reloaded on every rerun
+@st.cache_resource
+def load_processor():
+    return TranscriptProcessor()
+
+processor = load_processor()
 
 st.title("Transcript Upsert Demo")
 st.write("Upload one or multiple transcript CSV files to process and upsert summaries into Pinecone.")
@@ -15,17 +19,33 @@ uploaded_files = st.file_uploader("Choose CSV files", accept_multiple_files=True
 # Process and upsert when the user clicks the button
 if uploaded_files and st.button("Process and Upsert to Pinecone"):
     with st.spinner("Processing transcripts..."):
+        # Show per-file progress while the transcripts are summarized concurrently
+        progress_bar = st.progress(0.0, text="Summarizing transcripts...")
+        status = st.empty()
+        finished = []
+
+        def report_progress(filename, error, completed, total):
+            finished.append(f"{'Failed' if error else 'Done'}: {filename}" + (f" ({error})" if error else ""))
+            progress_bar.progress(completed / total, text=f"Summarized {completed} of {total} transcripts")
+            status.write("\n\n".join(finished))
+
         # Process the transcripts
-        transcript_data = processor.process_transcripts(uploaded_files)
+        transcript_data = processor.process_transcripts(uploaded_files, progress_callback=report_progress)
         
         # Display summaries to the user
         st.subheader("Generated Summaries")
         for filename, data in transcript_data.items():
             st.write(f"**File:** {filename}")
+            if data.get("error"):
+                st.error(f"Summarization failed: {data['error']}")
+                continue
             st.write(f"**Speakers:** {', '.join(data['speakers'])}")
             st.write(f"**Summary:** {data['summary']}")
         
         # Upsert the summaries to Pinecone
-        processor.upsert_summaries_to_pinecone(transcript_data)
+        failures = processor.upsert_summaries_to_pinecone(transcript_data)
         
-        st.success("Summaries have been upserted to Pinecone!")
+        if failures:
+            st.error(f"{len(failures)} upsert batch(es) failed: " + "; ".join(failure["error"] for failure in failures))
+        else:
+            st.success("Summaries have been upserted to Pinecone!")
@@ -0,0 +1,93 @@
+import os
+import json
+import hashlib
+import threading
+
+
+class SummaryCache:
+    """
+    A content-hash keyed cache of LLM summaries, optionally persisted to a JSON file.
+
+    New summaries are appended to a log next to the file (path + ".log"), so a put costs one line, not a rewrite of
+    every cached summary. The log is read on load and folded into the JSON file once it holds as many entries as
+    the file (and at least 64), keeping the cost of a put constant on average.
+
+    Attributes:
+        path (str): Path of the JSON file backing the cache, or None for an in-memory cache.
+        hits (int): Number of lookups answered from the cache.
+        misses (int): Number of lookups that were not cached.
+    """
+
+    def __init__(self, path=None):
+        """
+        Initializes the cache, loading previously saved summaries from path if it exists.
+
+        Args:
+            path (str, optional): Path of the JSON backing file. Defaults to None.
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._saved = 0
+        self._logged = 0
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+                self._saved = len(self._entries)
+            except (OSError, ValueError) as e:
+                print(f"Error loading summary cache '{path}': {e}")
+        if path and os.path.exists(self._log_path()):
+            with open(self._log_path(), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        key, summary = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash while appending; compacted away so later appends stay readable
+                        self._compact()
+                        break
+                    self._entries[key] = summary
+                    self._logged += 1
+
+    @staticmethod
+    def key(*parts):
+        """Return the content hash used as cache key for the given text parts."""
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached summary for key, or None."""
+        with self._lock:
+            summary = self._entries.get(key)
+            if summary is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return summary
+
+    def put(self, key, summary):
+        """Store a summary and persist the cache if it is file backed."""
+        with self._lock:
+            self._entries[key] = summary
+            if not self.path:
+                return
+            if self._logged >= max(self._saved, 64):
+                self._compact()
+                return
+            with open(self._log_path(), "a", encoding="utf-8") as f:
+                f.write(json.dumps([key, summary]) + "\n")
+            self._logged += 1
+
+    def _compact(self):
+        """Write every summary to the JSON file and empty the log."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+        if os.path.exists(self._log_path()):
+            os.remove(self._log_path())
+        self._saved, self._logged = len(self._entries), 0
+
+    def _log_path(self):
+        return f"{self.path}.log"
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+# The apps import their modules as top-level modules, like streamlit does when running them
+src = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+for package in ("streamlit_rag_chatbot", "upserting_transcripts", "preprocessing", "benchmarks"):
+    sys.path.insert(0, os.path.join(src, package))
+
+# No tokenizer download: token counts are estimated
+os.environ["repo_id"] = ""
+
+
+@pytest.fixture
+def make_bot(tmp_path, monkeypatch):
+    """
+    Returns a factory of chatbots wired to an LLM stand-in, hashed bag-of-words embeddings and a local vector
+    backend, with fresh process-wide stores. Keyword arguments are passed to the chatbot.
+    """
+    import main
+    import dispatcher
+    import interactions
+    import response_cache
+    from fakes import FakeLLM, FakeEmbeddings
+    from vector_backends import LocalBackend
+
+    monkeypatch.setenv("RESPONSE_CACHE_SIZE", "0")
+    monkeypatch.setenv("TRANSCRIPTS_STAMP_PATH", str(tmp_path / "transcripts.stamp"))
+    monkeypatch.setattr(dispatcher, "_dispatcher", None)
+    monkeypatch.setattr(interactions, "_store", None)
+    monkeypatch.setattr(response_cache, "_response_cache", None)
+
+    llm = FakeLLM(response_tokens=5)
+    monkeypatch.setattr(main, "HuggingFaceHub", lambda **kwargs: llm)
+    embeddings = FakeEmbeddings(dimension=32)
+    backend = LocalBackend(str(tmp_path / "indexes"))
+
+    def make_bot(**kwargs):
+        bot = main.chatbot(embeddings=embeddings, backend=backend, **kwargs)
+        bot.fake_llm = llm
+        return bot
+
+    yield make_bot
+    interactions._store and interactions._store.flush()
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+import a2t
+from corpus import utterance
+from fakes import FakeLLM, FakeEmbeddings
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    llm = FakeLLM(response_tokens=5)
+    monkeypatch.setattr(a2t, "HuggingFaceHub", lambda **kwargs: llm)
+    monkeypatch.setattr(a2t, "pc", lambda **kwargs: None)
+    processor = a2t.TranscriptProcessor(embeddings=FakeEmbeddings(dimension=8), requests_per_minute=0, chunk_token_budget=1000)
+    processor.prompts = []
+    invoke_llm = processor.invoke_llm
+    processor.invoke_llm = lambda prompt: processor.prompts.append(prompt) or invoke_llm(prompt)
+    return processor
+
+
+def transcript(turns=400, seed=0):
+    rng = random.Random(seed)
+    return [f"Speaker {rng.randint(1, 4)}: {utterance(rng, 'art')}" for _ in range(turns)]
+
+
+def map_calls(processor, turns):
+    """Summarizes a transcript and returns the number of chunks the LLM was asked to summarize."""
+    processor.prompts.clear()
+    processor.summarize_turns(turns)
+    return sum(1 for prompt in processor.prompts if prompt.startswith("Below is part"))
+
+
+def test_chunks_respect_the_budget(processor):
+    turns = transcript()
+    chunks = processor.anchor_chunks(turns)
+    assert "\n".join(chunks) == "\n".join(turns)
+    assert len(chunks) > 10
+    assert all(processor.count_tokens(chunk) <= processor.chunk_token_budget + 1 for chunk in chunks)
+
+
+def test_edit_only_resummarizes_the_chunks_it_touches(processor):
+    turns = transcript()
+    chunks = len(processor.anchor_chunks(turns))
+    assert map_calls(processor, turns) == chunks
+    assert map_calls(processor, turns) == 0
+
+    # An inserted turn changes the chunk count, and an edited turn shifts nothing after it
+    edited = turns[:100] + ["Speaker 9: a brand new remark about the installation"] + turns[100:]
+    edited[300] = edited[300] + " and the sound"
+    assert map_calls(processor, edited) <= 4
@@ -0,0 +1,40 @@
+import pytest
+
+import pipeline_bench
+
+tiny = [
+    "--turns", "2", "--sessions", "2", "--history", "8", "--meetings", "2", "--meeting-turns", "12",
+    "--dimension", "16", "--repeat", "2", "--response-tokens", "5", "--llm-latency", "0", "--llm-jitter", "0",
+    "--pinecone-latency", "0", "--pinecone-jitter", "0", "--embedding-latency", "0",
+]
+
+
+@pytest.fixture
+def bench_env(tmp_path, monkeypatch):
+    """Isolates the process-wide stores and the constructors a benchmark run swaps for its stand-ins."""
+    import main
+    import a2t
+    import dispatcher
+    import interactions
+    import response_cache
+
+    monkeypatch.setenv("RESPONSE_CACHE_SIZE", "0")
+    monkeypatch.setenv("SUMMARIES_STAMP_PATH", str(tmp_path / "summaries.stamp"))
+    monkeypatch.setenv("TRANSCRIPTS_STAMP_PATH", str(tmp_path / "transcripts.stamp"))
+    monkeypatch.setattr(dispatcher, "_dispatcher", None)
+    monkeypatch.setattr(interactions, "_store", None)
+    monkeypatch.setattr(response_cache, "_response_cache", None)
+    monkeypatch.setattr(main, "HuggingFaceHub", main.HuggingFaceHub)
+    monkeypatch.setattr(a2t, "HuggingFaceHub", a2t.HuggingFaceHub)
+    monkeypatch.setattr(a2t, "pc", a2t.pc)
+    yield
+    interactions._store and interactions._store.flush()
+
+
+@pytest.mark.parametrize("scenario", pipeline_bench.scenarios)
+def test_scenario_runs(bench_env, scenario):
+    args = pipeline_bench.build_parser().parse_args(["--scenarios", scenario, *tiny])
+    results = list(pipeline_bench.run(args))
+    assert [result["scenario"] for result in results] == [scenario]
+    assert results[0]["seconds"] >= 0
+    assert not results[0].get("failed_files") and not results[0].get("failed_batches")
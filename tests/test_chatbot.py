@@ -0,0 +1,68 @@
+def test_llm_calls_queue_under_the_pipeline_session(make_bot):
+    bot = make_bot()
+    sessions = []
+    call = bot.dispatcher.call
+    bot.dispatcher.call = lambda key, fn, session=None: sessions.append(session) or call(key, fn, session=session)
+
+    bot.pipeline("What did the group say about art?", "ada", "session-a")
+    bot.pipeline("What did the group say about science?", "bob", "session-b")
+    assert sessions == ["session-a", "session-a", "session-b", "session-b"]
+
+
+def test_streamed_calls_queue_under_the_turn_session(make_bot):
+    bot = make_bot()
+    sessions = []
+    slot = bot.dispatcher.slot
+    bot.dispatcher.slot = lambda session=None: sessions.append(session) or slot(session)
+
+    turn = bot.pipeline_stream("What did the group say about art?", "ada", "session-a")
+    "".join(turn.stream_sourcedata())
+    "".join(turn.stream_conversation())
+    turn.finish()
+    assert sessions == ["session-a", "session-a"]
+
+
+class EchoLLM:
+    """Answers with the sentence of the prompt that says whom the answer is for."""
+
+    def invoke(self, prompt):
+        return next(line.strip().split(" with their query")[0] for line in prompt.splitlines() if "You are now assisting" in line or "asked:" in line)
+
+
+def test_cached_answers_are_not_addressed_to_another_user(make_bot, monkeypatch):
+    import main
+    monkeypatch.setenv("RESPONSE_CACHE_SIZE", "10")
+    monkeypatch.setattr(main, "HuggingFaceHub", lambda **kwargs: EchoLLM())
+    bot = make_bot()
+
+    first = bot.pipeline("What did the group say about art?", "ada", "session-a")
+    second = bot.pipeline("What did the group say about art?", "bob", "session-b")
+    assert not first["cache_hit"] and second["cache_hit"]
+    answer = second["ai_output"].split("**Related Conversations")[0]
+    assert "ada" not in answer and answer.startswith("You are now assisting a user")
+
+    # With history the answer is not cached, and addresses its user
+    third = bot.pipeline("What did the group say about art?", "bob", "session-b", chat_history=[("Hi", "Hello")])
+    assert not third["cache_hit"] and '"bob"' in third["ai_output"].split("**Related Conversations")[0]
+
+
+def test_date_range_keeps_chunks_without_a_date_field(make_bot, monkeypatch):
+    import summaries
+    bot = make_bot()
+    bot.backend.upsert("eer-meetings-summaries", [
+        {"id": date, "values": [1.0] * 32, "metadata": {"date": date, "summary": "...", "text": date}}
+        for date in ("2024-01-02", "2024-02-03", "2024-03-04")
+    ])
+    monkeypatch.setattr(summaries, "_summary_index", summaries.SummaryIndex(backend=bot.backend, dimension=32))
+    chunks = {
+        "dated": {"date": "2024-02-03", "source": "2024-02-03_meeting.csv"},
+        "legacy": {"source": "2024-02-03_meeting.csv", "speaker_name": "Speaker 1"},
+        "legacy-outside": {"source": "2024-03-04_meeting.csv", "speaker_name": "Speaker 1"},
+        "dated-outside": {"date": "2024-01-02", "source": "2024-01-02_meeting.csv"},
+        "pdf": {"source": "data/EER-site-pages-pdf/about.pdf", "page": 1},
+    }
+    vector = bot.embeddings.embed_query("art")
+    bot.backend.upsert("eer-transcripts-pdfs", [{"id": name, "values": vector, "metadata": {**metadata, "text": name}} for name, metadata in chunks.items()])
+
+    docs = bot.retrieve_docs("art", "eer-transcripts-pdfs", k=5, date_range=("2024-02-01", "2024-02-28"))
+    assert sorted(doc.page_content for doc in docs) == ["dated", "legacy"]
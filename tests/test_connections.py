@@ -0,0 +1,52 @@
+import threading
+
+from connections import PineconeRegistry
+
+
+class SlowIndex:
+    def __init__(self, name, pinging, release):
+        self.name = name
+        self.pinging = pinging
+        self.release = release
+
+    def describe_index_stats(self):
+        self.pinging.set()
+        assert self.release.wait(5)
+        return {}
+
+
+class Client:
+    def __init__(self, pinging, release):
+        self.pinging = pinging
+        self.release = release
+
+    def Index(self, name, **kwargs):
+        return SlowIndex(name, self.pinging, self.release)
+
+
+def test_health_check_does_not_block_other_indexes():
+    pinging, release = threading.Event(), threading.Event()
+    registry = PineconeRegistry(pool_threads=1, connection_pool_maxsize=1, health_check_interval=60)
+    registry._clients["key"] = Client(pinging, release)
+    stale = registry.get_index("stale", api_key="key")
+    registry._last_checked[("key", "stale")] = -60.0
+
+    checker = threading.Thread(target=registry.get_index, args=("stale", "key"))
+    checker.start()
+    try:
+        assert pinging.wait(5)
+        # Opening and reusing handles proceeds while the ping is outstanding
+        assert registry.get_index("other", api_key="key").name == "other"
+        assert registry.get_index("stale", api_key="key") is stale
+    finally:
+        release.set()
+        checker.join(5)
+
+
+def test_index_handles_use_the_configured_pool_size():
+    registry = PineconeRegistry(pool_threads=1, connection_pool_maxsize=3)
+    client = registry.get_client("key")
+    # Skips the describe_index round trip that resolves the host
+    client.index_host_store.set_host(client.config, "pooled", "https://pooled-abc.svc.pinecone.io")
+    index = registry.get_index("pooled", api_key="key")
+    assert index._vector_api.api_client.rest_client.pool_manager.connection_pool_kw["maxsize"] == 3
@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+from dispatcher import DispatcherOverloaded, LLMDispatcher
+
+
+def queue_calls(dispatcher, calls, order):
+    """Starts one thread per (session, label) call, each queued before the next one starts."""
+    def run(session, label):
+        try:
+            dispatcher.call(label, lambda: order.append(label), session=session)
+        except DispatcherOverloaded:
+            order.append("shed")
+
+    threads = []
+    for session, label in calls:
+        thread = threading.Thread(target=run, args=(session, label))
+        thread.start()
+        threads.append(thread)
+        while dispatcher.stats()["queue_depth"] < len(threads):
+            time.sleep(0.001)
+    return threads
+
+
+def test_sessions_interleave():
+    dispatcher = LLMDispatcher(max_in_flight=1)
+    order = []
+    with dispatcher.slot("busy"):
+        threads = queue_calls(dispatcher, [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1"), ("b", "b2")], order)
+    for thread in threads:
+        thread.join()
+    assert order == ["a1", "b1", "a2", "b2", "a3"]
+
+
+def test_identical_calls_share_one_result():
+    dispatcher = LLMDispatcher(max_in_flight=4)
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def call():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return "answer"
+
+    leader = threading.Thread(target=lambda: results.append(dispatcher.call("prompt", call)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(dispatcher.call("prompt", call))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while dispatcher.stats()["shared"] < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join()
+    assert results == ["answer"] * 4 and len(calls) == 1
+
+
+def test_sheds_calls_over_the_queue_limit():
+    dispatcher = LLMDispatcher(max_in_flight=1, max_queue=1, max_wait=0.05)
+    order = []
+    with dispatcher.slot():
+        threads = queue_calls(dispatcher, [(None, "queued")], order)
+        with pytest.raises(DispatcherOverloaded):
+            dispatcher.call("shed", lambda: None)
+        for thread in threads:
+            thread.join()
+    assert order == ["shed"] and dispatcher.stats()["shed"] == 2
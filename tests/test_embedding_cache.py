@@ -0,0 +1,41 @@
+import sqlite3
+
+from embedding_cache import CachedEmbeddings
+from fakes import FakeEmbeddings
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    def __init__(self):
+        super().__init__(dimension=8)
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return super().embed_documents(texts)
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = CachedEmbeddings(CountingEmbeddings(), max_entries=1, path=path, namespace="test", max_disk_entries=10)
+    cache.embed_documents([f"text {i}" for i in range(10)])
+    # A disk hit marks text 0 as recently used once the next batch is written
+    cache.embed_query("text 9")
+    cache.embed_query("text 0")
+    cache.embed_documents([f"text {i}" for i in range(10, 15)])
+
+    rows = sqlite3.connect(path).execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    assert rows <= 10
+    reopened = CachedEmbeddings(CountingEmbeddings(), max_entries=1, path=path, namespace="test", max_disk_entries=10)
+    reopened.embed_documents(["text 0", "text 14", "text 1"])
+    assert reopened.embeddings.texts == ["text 1"]
+
+
+def test_disk_tier_opens_caches_without_last_use_times(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+    db.commit()
+    db.close()
+    cache = CachedEmbeddings(CountingEmbeddings(), path=path, namespace="test")
+    vector = cache.embed_query("art")
+    assert CachedEmbeddings(CountingEmbeddings(), path=path, namespace="test").embed_query("art") == vector
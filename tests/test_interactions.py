@@ -0,0 +1,90 @@
+import numpy as np
+
+from fakes import FakeEmbeddings, FakeIndex, FakeRegistry
+from interactions import InteractionStore
+from vector_backends import LocalBackend, PineconeBackend, normalize
+
+
+def make_store(tmp_path, **kwargs):
+    backend = LocalBackend(str(tmp_path))
+    return InteractionStore(FakeEmbeddings(dimension=16), backend, flush_interval=3600, **kwargs), backend
+
+
+def stored_ids(backend, store):
+    return sorted(backend.index(store.index_name).ids_where(None))
+
+
+def test_session_state_is_bounded_and_reloaded(tmp_path):
+    store, backend = make_store(tmp_path, max_sessions=1, session_rollups=True)
+    for question in ("art?", "science?"):
+        store.add_turn(question, "answer", "ada", "a")
+    store.flush()
+    store.add_turn("music?", "answer", "bob", "b")
+    store.flush()
+    assert list(store._sessions) == ["b"]
+
+    store.add_turn("dance?", "answer", "ada", "a")
+    store.flush()
+    assert list(store._sessions) == ["a"]
+    assert stored_ids(backend, store) == ["a#0001", "a#0002", "a#0003", "a#session", "b#0001", "b#session"]
+
+    # The reloaded rollup covers every turn of the session, not only the one flushed after the reload
+    vectors = {vector["id"]: vector for vector in backend.fetch_prefix(store.index_name, "a#")}
+    expected = normalize(np.mean([vectors[f"a#000{turn}"]["values"] for turn in (1, 2, 3)], axis=0, keepdims=True))[0]
+    assert np.allclose(vectors["a#session"]["values"], expected, atol=1e-5)
+    assert vectors["a#session"]["metadata"]["user_question"] == "art? | science? | dance?"
+
+
+def test_idle_sessions_are_evicted(tmp_path):
+    store, backend = make_store(tmp_path, session_ttl=0)
+    store.add_turn("art?", "answer", "ada", "a")
+    store.flush()
+    assert not store._sessions
+    store.add_turn("science?", "answer", "ada", "a")
+    store.flush()
+    assert stored_ids(backend, store) == ["a#0001", "a#0002"]
+
+
+def test_turns_numbered_by_a_failed_flush_keep_their_ids(tmp_path):
+    store, backend = make_store(tmp_path, max_sessions=1)
+    upsert = backend.upsert
+    backend.upsert = lambda index_name, vectors: (_ for _ in ()).throw(ConnectionError("down"))
+    store.add_turn("art?", "answer", "ada", "a")
+    store.flush()
+    backend.upsert = upsert
+    store.add_turn("science?", "answer", "ada", "a")
+    store.flush()
+    assert stored_ids(backend, store) == ["a#0001", "a#0002"]
+
+
+class UnlistableIndex(FakeIndex):
+    """A pod index: listing ids is not supported."""
+
+    def list(self, prefix=None, limit=100, **kwargs):
+        raise RuntimeError("Listing ids is only supported on serverless indexes")
+
+
+def unlistable_backend(tmp_path):
+    registry = FakeRegistry(directory=str(tmp_path))
+    registry._indexes["eer-interaction-data"] = UnlistableIndex(str(tmp_path / "eer-interaction-data"))
+    return PineconeBackend(registry)
+
+
+def test_sessions_reload_from_indexes_without_listing(tmp_path):
+    backend = unlistable_backend(tmp_path)
+    store = InteractionStore(FakeEmbeddings(dimension=16), backend, flush_interval=3600, max_sessions=1)
+    for session_id in ("a", "b", "a"):
+        store.add_turn("art?", "answer", "ada", session_id)
+        store.flush()
+    index = backend.registry.get_index(store.index_name).index
+    assert sorted(index.ids_where(None)) == ["a#0001", "a#0002", "b#0001"]
+
+
+def test_turns_are_stored_when_the_session_cannot_be_loaded(tmp_path):
+    backend = unlistable_backend(tmp_path)
+    backend.fetch_prefix = lambda *args, **kwargs: (_ for _ in ()).throw(ConnectionError("down"))
+    store = InteractionStore(FakeEmbeddings(dimension=16), backend, flush_interval=3600)
+    store.add_turn("art?", "answer", "ada", "a")
+    store.flush()
+    assert not store._pending
+    assert backend.registry.get_index(store.index_name).index.ids_where(None) == ["a#0001"]
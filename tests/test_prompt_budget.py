@@ -0,0 +1,54 @@
+import time
+
+from prompt_budget import ConversationMemory, TokenCounter, format_turn
+
+
+class Summarizer:
+    """Records the token size of the turns of each call; fails the calls listed in failures."""
+
+    def __init__(self, counter, failures=()):
+        self.counter = counter
+        self.failures = set(failures)
+        self.sizes = []
+
+    def __call__(self, summary, turns, session_id):
+        self.sizes.append(self.counter.count("\n".join(format_turn(question, answer) for question, answer in turns)))
+        if len(self.sizes) in self.failures:
+            raise RuntimeError("Error invoking LLM")
+        return f"summary of {len(turns)} turns"
+
+
+def settle(memory, session_id="s"):
+    while memory._sessions.get(session_id, {}).get("folding") is not None:
+        time.sleep(0.001)
+
+
+def turn(i, words=20):
+    return (f"question {i}", " ".join(["answer"] * words))
+
+
+def test_folds_in_batches():
+    counter = TokenCounter()
+    summarize = Summarizer(counter)
+    memory = ConversationMemory(counter, summarize, window_turns=6, history_tokens=10000, fold_turns=3)
+    turns = []
+    for i in range(30):
+        turns.append(turn(i))
+        memory.history("s", turns)
+        settle(memory)
+    # One summarize call per three turns once the window is full, instead of one per turn
+    assert len(summarize.sizes) == (30 - 6) // 3 + 1
+
+
+def test_fold_prompts_stay_within_budget_after_failures():
+    counter = TokenCounter()
+    summarize = Summarizer(counter, failures=range(1, 6))
+    memory = ConversationMemory(counter, summarize, window_turns=4, history_tokens=400, fold_turns=2, fold_tokens=300)
+    turns = []
+    for i in range(60):
+        turns.append(turn(i, words=30 if i != 40 else 2000))
+        history = memory.history("s", turns)
+        settle(memory)
+        assert counter.count(history) <= 400
+    assert summarize.sizes and max(summarize.sizes) <= 300
+    assert memory._sessions["s"]["summarized"] > 40
@@ -0,0 +1,103 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpenError, ResilientLLM, is_retryable, retry_after
+
+
+class HTTPError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(status)
+        self.response = SimpleNamespace(status_code=status, headers=headers or {})
+
+
+class ScriptedLLM:
+    """Raises the scripted errors in turn, then answers "ok"."""
+
+    def __init__(self, errors=(), chunks=("o", "k"), delay=0.0):
+        self.errors = list(errors)
+        self.chunks = chunks
+        self.delay = delay
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return "".join(self.chunks)
+
+    def stream(self, prompt):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        yield from self.chunks
+
+
+def open_breaker(recovery_timeout=0.05):
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=recovery_timeout)
+    breaker.record_failure()
+    time.sleep(recovery_timeout * 1.5)
+    assert breaker.state == "half_open"
+    return breaker
+
+
+def test_retryable_errors():
+    assert is_retryable(HTTPError(429))
+    assert is_retryable(HTTPError(503))
+    assert is_retryable(ConnectionError())
+    assert not is_retryable(HTTPError(400))
+    assert not is_retryable(ValueError())
+    assert not is_retryable(CircuitOpenError())
+    assert retry_after(HTTPError(429, {"Retry-After": "3"})) == 3.0
+
+
+def test_invoke_retries_only_retryable_errors():
+    llm = ScriptedLLM([HTTPError(429, {"Retry-After": "0"}), ConnectionError()])
+    assert ResilientLLM(llm, base_delay=0.001).invoke("p") == "ok"
+    assert llm.calls == 3
+
+    llm = ScriptedLLM([HTTPError(400)])
+    with pytest.raises(HTTPError):
+        ResilientLLM(llm, base_delay=0.001).invoke("p")
+    assert llm.calls == 1
+
+
+def test_open_circuit_fails_fast_or_falls_back():
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60)
+    llm = ScriptedLLM([HTTPError(503)] * 10)
+    with pytest.raises(CircuitOpenError):
+        ResilientLLM(llm, breaker=breaker, max_attempts=5, base_delay=0.001).invoke("p")
+    assert llm.calls == 2
+    assert ResilientLLM(ScriptedLLM(), fallback=ScriptedLLM(chunks=("fb",)), breaker=breaker).invoke("p") == "fb"
+
+
+def test_hedges_slow_calls_to_the_fallback():
+    resilient = ResilientLLM(ScriptedLLM(delay=1.0), fallback=ScriptedLLM(chunks=("fb",)), hedge=True, latency_budget=0.01)
+    started = time.perf_counter()
+    assert resilient.invoke("p") == "fb"
+    assert time.perf_counter() - started < 0.5
+
+
+def test_stream_trial_released_when_consumer_stops():
+    breaker = open_breaker()
+    stream = ResilientLLM(ScriptedLLM(), breaker=breaker).stream("p")
+    assert next(stream) == "o"
+    assert not breaker.allow()
+    stream.close()
+    assert breaker.allow()
+
+
+def test_stream_trial_settled_by_non_retryable_error():
+    breaker = open_breaker()
+    with pytest.raises(HTTPError):
+        list(ResilientLLM(ScriptedLLM([HTTPError(400)]), breaker=breaker).stream("p"))
+    assert breaker.state == "closed"
+
+
+def test_stream_retries_before_first_token():
+    breaker = CircuitBreaker("test")
+    llm = ScriptedLLM([ConnectionError()])
+    assert "".join(ResilientLLM(llm, breaker=breaker, base_delay=0.001).stream("p")) == "ok"
+    assert llm.calls == 2 and breaker.state == "closed"
@@ -0,0 +1,22 @@
+from summaries import SummaryIndex
+from vector_backends import LocalBackend
+
+
+def summary(date):
+    return {"date": date, "summary": f"Summary of {date}.", "speakers": ["Speaker 1"], "text": date}
+
+
+def test_summaries_are_read_through_the_local_backend(tmp_path):
+    backend = LocalBackend(str(tmp_path / "indexes"))
+    backend.upsert("eer-meetings-summaries", [
+        {"id": f"id-{date}", "values": [1.0, 0.0, 0.0, 0.0], "metadata": summary(date)}
+        for date in ("2024-01-02", "2024-02-03", "2024-03-04")
+    ])
+    index = SummaryIndex(backend=backend, dimension=4, stamp_path=str(tmp_path / "stamp"))
+
+    assert index.warm() == 3
+    assert index.dates(start="2024-02-01") == ["2024-03-04", "2024-02-03"]
+    # Not under its unix date id, so found with the metadata filter
+    index.invalidate()
+    assert index.get("2024-02-03")["summary"] == "Summary of 2024-02-03."
+    assert index.get("2024-05-06") is None
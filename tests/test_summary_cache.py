@@ -0,0 +1,29 @@
+import os
+
+from summary_cache import SummaryCache
+
+
+def test_puts_are_logged_and_compacted(tmp_path):
+    path = str(tmp_path / "summaries.json")
+    cache = SummaryCache(path)
+    for i in range(64):
+        cache.put(f"key-{i}", f"summary {i}")
+    assert not os.path.exists(path) and os.path.exists(path + ".log")
+    assert SummaryCache(path).get("key-63") == "summary 63"
+
+    cache.put("key-64", "summary 64")
+    assert os.path.exists(path) and not os.path.exists(path + ".log")
+    cache.put("key-0", "replaced")
+    reopened = SummaryCache(path)
+    assert reopened.get("key-64") == "summary 64" and reopened.get("key-0") == "replaced"
+
+
+def test_a_torn_log_line_is_ignored(tmp_path):
+    path = str(tmp_path / "summaries.json")
+    SummaryCache(path).put("key", "summary")
+    with open(path + ".log", "a", encoding="utf-8") as f:
+        f.write('["other", "summ')
+    assert SummaryCache(path).get("key") == "summary"
+    cache = SummaryCache(path)
+    cache.put("later", "summary")
+    assert SummaryCache(path).get("later") == "summary"
@@ -0,0 +1,94 @@
+import numpy as np
+
+from vector_backends import LocalBackend, LocalIndex
+from ann_index import IVFIndex
+
+
+def test_query_empty_index_with_filter(tmp_path):
+    index = LocalIndex(str(tmp_path / "empty"))
+    filter = {"$and": [{"session_id": {"$ne": "a"}}, {"kind": {"$ne": "session"}}]}
+    assert index.query([1.0, 0.0], k=3, filter=filter) == [[]]
+    assert index.query([[1.0, 0.0], [0.0, 1.0]], k=3) == [[], []]
+
+
+def test_query_empty_ivf_index_with_filter(tmp_path):
+    index = IVFIndex(str(tmp_path / "empty"))
+    assert index.query([1.0, 0.0], k=3, filter={"session_id": {"$ne": "a"}}) == [[]]
+
+
+def test_query_after_deleting_every_vector(tmp_path):
+    index = LocalIndex(str(tmp_path / "index"))
+    index.upsert([{"id": "a", "values": [1.0, 0.0], "metadata": {"session_id": "a"}}])
+    index.delete(["a"])
+    assert index.query([1.0, 0.0], k=3, filter={"session_id": {"$ne": "b"}}) == [[]]
+
+
+def test_filtered_query(tmp_path):
+    index = LocalIndex(str(tmp_path / "index"))
+    index.upsert([
+        {"id": f"s{i % 2}#{i}", "values": np.eye(4)[i % 4].tolist(), "metadata": {"session_id": f"s{i % 2}", "kind": "turn"}}
+        for i in range(8)
+    ])
+    matches = index.query(np.eye(4)[0].tolist(), k=10, filter={"session_id": {"$ne": "s0"}})[0]
+    assert matches and all(metadata["session_id"] == "s1" for _, _, metadata in matches)
+
+
+def test_local_backend_search_fresh_interaction_index(tmp_path):
+    backend = LocalBackend(str(tmp_path), ann_indexes=["eer-interaction-data"])
+    assert backend.search("eer-interaction-data", [1.0, 0.0], k=5, filter={"session_id": {"$ne": "a"}}) == []
+
+
+def test_reopened_index_replays_the_log(tmp_path):
+    backend = LocalBackend(str(tmp_path))
+    backend.upsert("index", [{"id": f"v{i}", "values": np.eye(4)[i % 4].tolist(), "metadata": {"session_id": f"s{i % 2}"}} for i in range(8)])
+    backend.upsert("index", [{"id": "v8", "values": [0.0, 1.0, 0.0, 0.0], "metadata": {"session_id": "s0"}}])
+    backend.delete("index", ["v0", "v3"])
+    assert (tmp_path / "index" / "meta.log").exists()
+
+    reopened = LocalIndex(str(tmp_path / "index"))
+    original = backend.index("index")
+    assert reopened._ids == original._ids
+    for query in np.eye(4):
+        assert reopened.query(query.tolist(), k=8, filter={"session_id": {"$eq": "s0"}}) == original.query(query.tolist(), k=8, filter={"session_id": {"$eq": "s0"}})
+
+
+def test_log_is_compacted_once_it_outgrows_the_index(tmp_path):
+    backend = LocalBackend(str(tmp_path))
+    backend.upsert("index", [{"id": f"v{i}", "values": [1.0, float(i)], "metadata": {}} for i in range(4)])
+    for i in range(4):
+        backend.upsert("index", [{"id": f"v{i}", "values": [float(i), 1.0], "metadata": {"turn": i}}])
+    assert (tmp_path / "index" / "meta.log").exists()
+    backend.upsert("index", [{"id": "v0", "values": [0.0, 1.0], "metadata": {"turn": 4}}])
+    assert not (tmp_path / "index" / "meta.log").exists()
+    assert LocalIndex(str(tmp_path / "index")).fetch(["v0"])[0]["metadata"] == {"turn": 4}
+
+
+def test_reopened_ivf_index_reassigns_logged_rows(tmp_path):
+    path = str(tmp_path / "index")
+    rng = np.random.default_rng(0)
+    index = IVFIndex(path, nprobe=4, min_train_size=50)
+    index.upsert([{"id": f"v{i}", "values": rng.normal(size=8).tolist(), "metadata": {}} for i in range(100)])
+    index.persist()
+    index.upsert([{"id": f"w{i}", "values": rng.normal(size=8).tolist(), "metadata": {}} for i in range(10)])
+    index.delete(["v1", "v2"])
+    index.persist()
+
+    reopened = IVFIndex(path, nprobe=4, min_train_size=50)
+    assert reopened._ids == index._ids
+    assert np.array_equal(reopened._assignments[:len(index)], index._assignments[:len(index)])
+
+
+def test_ivf_lists_follow_upserts_and_deletes(tmp_path):
+    rng = np.random.default_rng(1)
+    index = IVFIndex(str(tmp_path / "index"), nprobe=2, nlist=8, min_train_size=50)
+    index.upsert([{"id": f"v{i}", "values": rng.normal(size=8).tolist(), "metadata": {}} for i in range(120)])
+    index.upsert([{"id": f"v{i}", "values": rng.normal(size=8).tolist(), "metadata": {}} for i in range(0, 120, 7)])
+    index.delete([f"v{i}" for i in range(0, 120, 5)] + ["v119"])
+
+    count = len(index)
+    assert sorted(row for rows in index._lists for row in rows) == list(range(count))
+    for assignment, rows in enumerate(index._lists):
+        assert all(index._assignments[row] == assignment and index._lists[assignment][index._slots[row]] == row for row in rows)
+    # Probing every list is an exact search
+    query = rng.normal(size=8).tolist()
+    assert [match[0] for match in index.query(query, k=10, nprobe=8)[0]] == [match[0] for match in LocalIndex.query(index, query, k=10)[0]]